@@ -0,0 +1,129 @@
+"""Micro-benchmark for the per-call cost of Object3D transform operations.
+
+Run from the root of the repository with:
+
+    python -m benchmarks.transform_ops
+
+The "before" column rebuilds each transformation the way the framework originally did,
+converting a tuple of tuples with np.array(...).astype(float) and multiplying it into a
+new transform array. The "after" column calls the current in-place Object3D methods.
+"""
+from math import sin, cos
+import timeit
+
+import numpy as np
+
+from graphics.core.matrix import Matrix
+from graphics.core.scene_graph import Group
+
+CALLS = 5000
+REPEATS = 20
+
+
+def legacy_translation(x, y, z):
+    return np.array((
+        (1, 0, 0, x),
+        (0, 1, 0, y),
+        (0, 0, 1, z),
+        (0, 0, 0, 1)
+    )).astype(float)
+
+
+def legacy_rotation_x(angle):
+    c = cos(angle)
+    s = sin(angle)
+    return np.array((
+        (1, 0,  0, 0),
+        (0, c, -s, 0),
+        (0, s,  c, 0),
+        (0, 0,  0, 1)
+    )).astype(float)
+
+
+def legacy_rotation_y(angle):
+    c = cos(angle)
+    s = sin(angle)
+    return np.array((
+        ( c, 0, s, 0),
+        ( 0, 1, 0, 0),
+        (-s, 0, c, 0),
+        ( 0, 0, 0, 1)
+    )).astype(float)
+
+
+def legacy_rotation_z(angle):
+    c = cos(angle)
+    s = sin(angle)
+    return np.array((
+        (c, -s, 0, 0),
+        (s,  c, 0, 0),
+        (0,  0, 1, 0),
+        (0,  0, 0, 1)
+    )).astype(float)
+
+
+def legacy_scale(r, s, t):
+    return np.array((
+        (r, 0, 0, 0),
+        (0, s, 0, 0),
+        (0, 0, t, 0),
+        (0, 0, 0, 1)
+    )).astype(float)
+
+
+class LegacyNode:
+    """Reproduces the original allocation-heavy transform operations."""
+    def __init__(self):
+        self.transform = Matrix.identity()
+
+    def apply_matrix(self, matrix, local=True):
+        if local:
+            self.transform = self.transform @ matrix
+        else:
+            self.transform = matrix @ self.transform
+
+
+def per_call_microseconds(statement):
+    best = min(timeit.repeat(statement, number=CALLS, repeat=REPEATS))
+    return best / CALLS * 1e6
+
+
+def main():
+    legacy = LegacyNode()
+    node = Group()
+    out = np.empty((4, 4))
+
+    cases = (
+        ("translate (local)",
+            lambda: legacy.apply_matrix(legacy_translation(0.1, 0.2, 0.3)),
+            lambda: node.translate(0.1, 0.2, 0.3)),
+        ("translate (global)",
+            lambda: legacy.apply_matrix(legacy_translation(0.1, 0.2, 0.3), False),
+            lambda: node.translate(0.1, 0.2, 0.3, False)),
+        ("rotate_x",
+            lambda: legacy.apply_matrix(legacy_rotation_x(0.01)),
+            lambda: node.rotate_x(0.01)),
+        ("rotate_y",
+            lambda: legacy.apply_matrix(legacy_rotation_y(0.01)),
+            lambda: node.rotate_y(0.01)),
+        ("rotate_z",
+            lambda: legacy.apply_matrix(legacy_rotation_z(0.01)),
+            lambda: node.rotate_z(0.01)),
+        ("scale_uniform",
+            lambda: legacy.apply_matrix(legacy_scale(1.0, 1.0, 1.0)),
+            lambda: node.scale_uniform(1.0)),
+        ("Matrix.rotation_y (out=)",
+            lambda: legacy_rotation_y(0.01),
+            lambda: Matrix.rotation_y(0.01, out=out)),
+    )
+
+    print(f"{'operation':<26}{'before (us)':>12}{'after (us)':>12}{'speedup':>10}")
+    for name, before, after in cases:
+        before_time = per_call_microseconds(before)
+        after_time = per_call_microseconds(after)
+        print(f"{name:<26}{before_time:>12.2f}{after_time:>12.2f}"
+              f"{before_time / after_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,16 @@
 Modules exported by this package:
 
 - `app`
+- `batching`
+- `bounds`
+- `bvh`
 - `matrix`
+- `multidraw`
 - `openGL`
 - `openGLUtils`
+- `raycast`
 - `renderer`
 - `scene_graph`
 - `texture`
+- `transform_store`
 """
\ No newline at end of file
@@ -0,0 +1,143 @@
+import numpy as np
+import OpenGL.GL as GL
+
+from graphics.core.scene_graph import Mesh, InstancedMesh
+from graphics.geometries import Geometry
+
+# primitives that still draw correctly when the vertices of several meshes are joined
+_BATCHABLE_STYLES = (GL.GL_TRIANGLES, GL.GL_LINES, GL.GL_POINTS)
+
+
+class _Batch:
+    """The merged mesh of one group along with the source meshes it was built from."""
+    def __init__(self, mesh, sources, geometry_versions, matrices, offsets):
+        self.mesh = mesh
+        self.sources = sources
+        # each source's geometry and its version when it was merged
+        self.geometry_versions = geometry_versions
+        self.matrices = matrices
+        self.offsets = offsets
+
+
+class StaticBatch:
+    """Merges the static meshes of a subtree into one mesh for each material.
+
+    Each mesh's transformation relative to the root of the subtree is baked into its vertex
+    positions, and the vertex data of meshes sharing a material is joined into one geometry,
+    so each group is drawn with a single call. The merged meshes are added as children of the
+    root, so moving the root still moves them, and the source meshes are hidden.
+
+    The batch remembers which source meshes each merged mesh came from. After moving a source
+    mesh or changing its geometry, update() rebuilds only the groups that changed. After adding
+    or removing meshes, rebuild() groups the subtree again. release() shows the source meshes again.
+
+    Only visible meshes drawn as separate triangles, lines or points can be merged, and only with
+    meshes whose geometries have the same attributes. Groups of a single mesh are left alone.
+
+    Attributes:
+        root (core.scene_graph.Object3D): The root of the batched subtree.
+        batched_meshes (list): The merged meshes added to the root.
+    """
+    def __init__(self, root):
+        """Merge the meshes of a subtree.
+
+        Args:
+            root (core.scene_graph.Object3D): The root of the subtree of static meshes.
+        """
+        self._root = root
+        self._batches = []
+        self.rebuild()
+
+    @property
+    def root(self):
+        return self._root
+
+    @property
+    def batched_meshes(self):
+        return [batch.mesh for batch in self._batches]
+
+    def rebuild(self):
+        """Group the visible meshes of the subtree by material and merge each group."""
+        self.release()
+
+        groups = {}
+        for mesh in self._root.iter_visible_meshes():
+            if isinstance(mesh, InstancedMesh):
+                continue
+            material = mesh.material
+            if material.get_setting("drawStyle") not in _BATCHABLE_STYLES:
+                continue
+            attributes = tuple(sorted((name, attribute.data_type)
+                                      for name, attribute in mesh.geometry.attributes.items()))
+            groups.setdefault((material, attributes), []).append(mesh)
+
+        for (material, _), sources in groups.items():
+            if len(sources) > 1:
+                self._batches.append(self._merge(material, sources))
+
+    def update(self):
+        """Rebuild the merged mesh of every group with a source mesh that moved or changed geometry.
+
+        Returns:
+            int: The number of merged meshes that were rebuilt.
+        """
+        rebuilt = 0
+        for index, batch in enumerate(self._batches):
+            if (all(mesh.geometry is geometry and geometry.version == version
+                    for mesh, (geometry, version) in zip(batch.sources, batch.geometry_versions))
+                    and np.array_equal(self._relative_matrices(batch.sources), batch.matrices)):
+                continue
+            self._discard(batch)
+            self._batches[index] = self._merge(batch.mesh.material, batch.sources)
+            rebuilt += 1
+        return rebuilt
+
+    def release(self):
+        """Remove the merged meshes and show the source meshes again."""
+        for batch in self._batches:
+            self._discard(batch)
+            for mesh in batch.sources:
+                mesh.visible = True
+        self._batches = []
+
+    def source_mesh(self, mesh, vertex_index):
+        """Find the source mesh that a vertex of a merged mesh came from.
+
+        For a ray cast hit on a merged mesh, any of hit.vertices can be used as the vertex index.
+
+        Args:
+            mesh (core.scene_graph.Mesh): One of the merged meshes.
+            vertex_index (int): The index of a vertex in the merged mesh's geometry.
+
+        Returns:
+            core.scene_graph.Mesh: The source mesh, or None if the mesh is not a merged mesh.
+        """
+        for batch in self._batches:
+            if batch.mesh is mesh:
+                index = np.searchsorted(batch.offsets, vertex_index, side="right") - 1
+                return batch.sources[index]
+        return None
+
+    def _merge(self, material, sources):
+        """Build, attach and return the merged mesh of a group and hide its source meshes."""
+        matrices = self._relative_matrices(sources)
+        geometries = [mesh.geometry for mesh in sources]
+        offsets = np.cumsum([0] + [geometry.vertex_count for geometry in geometries[:-1]])
+
+        mesh = Mesh(Geometry.combine(geometries, matrices), material)
+        self._root.add(mesh)
+        for source in sources:
+            source.visible = False
+        geometry_versions = [(geometry, geometry.version) for geometry in geometries]
+        return _Batch(mesh, sources, geometry_versions, matrices, offsets)
+
+    def _discard(self, batch):
+        """Remove a merged mesh from the root and delete its GPU resources."""
+        self._root.remove(batch.mesh)
+        batch.mesh.release()
+        batch.mesh.geometry.release()
+
+    def _relative_matrices(self, meshes):
+        """Get the transformations of meshes relative to the root of the subtree."""
+        world_matrices = np.array([mesh.world_matrix for mesh in meshes])
+        return np.linalg.inv(self._root.world_matrix) @ world_matrices
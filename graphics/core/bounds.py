@@ -0,0 +1,133 @@
+import numpy as np
+
+def frustum_planes(view_projection_matrix):
+    """Extracts the six clipping planes of a view frustum from a view-projection matrix.
+
+    Each plane is stored as a row (a, b, c, d) normalized so that ax + by + cz + d is the
+    signed distance of the point (x, y, z) from the plane, which is positive on the inside.
+    The planes are in the order left, right, bottom, top, near, far.
+
+    Args:
+        view_projection_matrix (NDArray): The projection matrix multiplied by the view matrix.
+
+    Returns:
+        NDArray: A (6, 4) array of plane coefficients in world space.
+    """
+    m = view_projection_matrix
+    planes = np.array((
+        m[3] + m[0],
+        m[3] - m[0],
+        m[3] + m[1],
+        m[3] - m[1],
+        m[3] + m[2],
+        m[3] - m[2]
+    ))
+    planes /= np.linalg.norm(planes[:, :3], axis=1)[:, np.newaxis]
+    return planes
+
+
+def transform_spheres(world_matrices, centers, radii):
+    """Transforms bounding spheres from local space into world space.
+
+    The radii are scaled by the largest scaling factor of each matrix so
+    the transformed spheres still contain everything they contained before.
+
+    Args:
+        world_matrices (NDArray): An (N, 4, 4) array of world transformations.
+        centers (NDArray): An (N, 3) array of sphere centers in local space.
+        radii (NDArray): An (N,) array of sphere radii in local space.
+
+    Returns:
+        tuple: The (N, 3) array of world space centers and the (N,) array of world space radii.
+    """
+    linear = world_matrices[:, :3, :3]
+    world_centers = np.einsum("nij,nj->ni", linear, centers) + world_matrices[:, :3, 3]
+    scales = np.sqrt((linear * linear).sum(axis=1).max(axis=1))
+    return world_centers, radii * scales
+
+
+def spheres_in_frustum(planes, centers, radii):
+    """Tests which spheres are at least partly inside a view frustum.
+
+    Args:
+        planes (NDArray): The (6, 4) array of frustum planes from frustum_planes().
+        centers (NDArray): An (N, 3) array of sphere centers in world space.
+        radii (NDArray): An (N,) array of sphere radii in world space.
+
+    Returns:
+        NDArray: An (N,) boolean array that is False for spheres entirely outside the frustum.
+    """
+    distances = centers @ planes[:, :3].T + planes[:, 3]
+    return np.all(distances >= -radii[:, np.newaxis], axis=1)
+
+
+def transform_boxes(world_matrices, mins, maxs):
+    """Transforms axis-aligned bounding boxes from local space into world space.
+
+    The result is the smallest axis-aligned box containing each transformed box,
+    found by transforming the box center and summing the absolute contributions
+    of the box extents along each world axis.
+
+    Args:
+        world_matrices (NDArray): An (N, 4, 4) array of world transformations.
+        mins (NDArray): An (N, 3) array of minimum box corners in local space.
+        maxs (NDArray): An (N, 3) array of maximum box corners in local space.
+
+    Returns:
+        tuple: The (N, 3) arrays of minimum and maximum box corners in world space.
+    """
+    linear = world_matrices[:, :3, :3]
+    centers = (mins + maxs) / 2
+    extents = (maxs - mins) / 2
+    world_centers = np.einsum("nij,nj->ni", linear, centers) + world_matrices[:, :3, 3]
+    world_extents = np.einsum("nij,nj->ni", np.abs(linear), extents)
+    return world_centers - world_extents, world_centers + world_extents
+
+
+def frustum_box_test(planes, mins, maxs):
+    """Tests axis-aligned boxes against a view frustum.
+
+    Args:
+        planes (NDArray): The (6, 4) array of frustum planes from frustum_planes().
+        mins (NDArray): An (N, 3) array of minimum box corners in world space.
+        maxs (NDArray): An (N, 3) array of maximum box corners in world space.
+
+    Returns:
+        tuple: Two (N,) boolean arrays. The first is False for boxes entirely outside 
+            the frustum and the second is True for boxes entirely inside it.
+    """
+    normals = planes[:, :3]
+    positive = normals >= 0
+    # the corners farthest along and farthest against each plane normal
+    far_corners = np.where(positive, maxs[:, np.newaxis], mins[:, np.newaxis])
+    near_corners = np.where(positive, mins[:, np.newaxis], maxs[:, np.newaxis])
+    far_distances = (far_corners * normals).sum(axis=2) + planes[:, 3]
+    near_distances = (near_corners * normals).sum(axis=2) + planes[:, 3]
+    intersects = np.all(far_distances >= 0, axis=1)
+    contained = np.all(near_distances >= 0, axis=1)
+    return intersects, contained
+
+
+def ray_box_distances(origin, direction, mins, maxs):
+    """Finds where a ray enters and leaves axis-aligned boxes with the slab method.
+
+    Args:
+        origin (NDArray): The (3,) starting point of the ray.
+        direction (NDArray): The (3,) direction of the ray.
+        mins (NDArray): An (N, 3) array of minimum box corners.
+        maxs (NDArray): An (N, 3) array of maximum box corners.
+
+    Returns:
+        tuple: The (N,) arrays of distances along the ray where it enters and leaves each box.
+            The ray misses a box when its entering distance is greater than its leaving distance.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inverse = 1 / direction
+        near = (mins - origin) * inverse
+        far = (maxs - origin) * inverse
+    lower = np.minimum(near, far)
+    upper = np.maximum(near, far)
+    # a ray parallel to a slab gives nan when its origin lies on the boundary, so it never leaves
+    lower[np.isnan(lower)] = -np.inf
+    upper[np.isnan(upper)] = np.inf
+    return lower.max(axis=1), upper.min(axis=1)
@@ -0,0 +1,449 @@
+import heapq
+
+import numpy as np
+
+from graphics.core.bounds import transform_boxes, frustum_box_test, ray_box_distances
+
+class SceneBVH:
+    """A bounding volume hierarchy over the world space bounding boxes of the meshes in a scene.
+
+    Creating a SceneBVH attaches it to the given scene as its spatial index. The renderer then
+    uses it for frustum culling, and it can also answer box, sphere, ray and nearest-object queries
+    without testing every mesh in the scene.
+
+    The hierarchy is rebuilt when meshes are added to or removed from the scene. When meshes
+    move, only their boxes and the boxes of the nodes above them are refitted. Meshes without
+    vertex positions have no bounds, so they are returned by every frustum query.
+    If a geometry's vertex positions change, call mark_moved() with the meshes that use it.
+
+    Nodes of the hierarchy are stored in flat arrays and each node covers a contiguous range
+    of items, so whole subtrees can be accepted at once and each query tests one level
+    of the tree at a time in a single vectorized pass.
+    """
+
+    # the greatest number of meshes stored in a leaf node
+    LEAF_SIZE = 4
+
+    def __init__(self, scene):
+        self._scene = scene
+        self._tree_version = None
+        self._store_version = None
+
+        # every mesh of the scene in scene graph order
+        self._meshes = []
+        # meshes without bounds, which are never culled
+        self._unbounded = []
+
+        # the bounded meshes (items) as indices into self._meshes and their boxes
+        self._item_meshes = np.zeros(0, dtype=np.intp)
+        self._item_slots = {}
+        self._local_min = np.zeros((0, 3))
+        self._local_max = np.zeros((0, 3))
+        self._item_min = np.zeros((0, 3))
+        self._item_max = np.zeros((0, 3))
+
+        # items that have moved since the last refit
+        self._moved = set()
+
+        self._clear_nodes()
+
+        scene.spatial_index = self
+
+    def __len__(self):
+        return len(self._meshes)
+
+    def mark_moved(self, mesh):
+        """Flag a mesh whose world space bounding box must be recalculated."""
+        self._moved.add(mesh)
+
+    def mark_bounds_changed(self, mesh):
+        """Flag a mesh whose local bounding box changed, such as an InstancedMesh with new instances."""
+        slot = self._item_slots.get(mesh)
+        box = mesh.bounding_box
+        if slot is None or box is None:
+            # the mesh moves between the bounded and unbounded meshes, so rebuild instead
+            self._tree_version = None
+            return
+        self._local_min[slot], self._local_max[slot] = box
+        self._moved.add(mesh)
+
+    def update(self):
+        """Rebuild the hierarchy if the scene's structure changed, or refit any moved meshes."""
+        scene = self._scene
+        if scene.tree_version != self._tree_version:
+            self.rebuild()
+            return
+
+        store = scene.transform_store
+        if store is not None:
+            # a transform store does not report which nodes moved, so refit everything
+            store.update()
+            if store.version != self._store_version:
+                self._store_version = store.version
+                self._refit_all()
+                return
+
+        if self._moved:
+            self._refit(self._moved)
+
+    def rebuild(self):
+        """Collect the meshes of the scene and build a new hierarchy over their bounds."""
+        for mesh in self._meshes:
+            mesh._move_listener = None
+
+        self._meshes = self._scene.mesh_list
+        item_meshes = []
+        local_min = []
+        local_max = []
+        self._unbounded = []
+        for index, mesh in enumerate(self._meshes):
+            mesh._move_listener = self
+            box = mesh.bounding_box
+            if box is None:
+                self._unbounded.append(index)
+            else:
+                item_meshes.append(index)
+                local_min.append(box[0])
+                local_max.append(box[1])
+
+        self._item_meshes = np.array(item_meshes, dtype=np.intp)
+        self._item_slots = {self._meshes[index]: slot
+                            for slot, index in enumerate(item_meshes)}
+        self._local_min = np.array(local_min).reshape(-1, 3)
+        self._local_max = np.array(local_max).reshape(-1, 3)
+        self._item_min, self._item_max = self._world_boxes(np.arange(len(item_meshes)))
+
+        self._build_nodes()
+
+        self._moved.clear()
+        self._tree_version = self._scene.tree_version
+        store = self._scene.transform_store
+        self._store_version = store.version if store is not None else None
+
+    def query_frustum(self, planes, visible_only=True):
+        """Find the meshes whose bounding boxes are at least partly inside a view frustum.
+
+        Args:
+            planes (NDArray): The (6, 4) array of planes from core.bounds.frustum_planes().
+            visible_only (bool, optional): Whether to leave out invisible meshes. Defaults to True.
+
+        Returns:
+            list: The meshes found, in scene graph order.
+        """
+        items = self._query(lambda mins, maxs: frustum_box_test(planes, mins, maxs))
+        return self._collect(items, self._unbounded, visible_only)
+
+    def query_box(self, low, high, visible_only=False):
+        """Find the meshes whose bounding boxes overlap an axis-aligned box.
+
+        Args:
+            low (Iterable): The minimum corner of the box as (x, y, z).
+            high (Iterable): The maximum corner of the box as (x, y, z).
+            visible_only (bool, optional): Whether to leave out invisible meshes. Defaults to False.
+
+        Returns:
+            list: The meshes found, in scene graph order.
+        """
+        low = np.asarray(low, dtype=float)
+        high = np.asarray(high, dtype=float)
+
+        def test(mins, maxs):
+            intersects = np.all((mins <= high) & (maxs >= low), axis=1)
+            contained = np.all((mins >= low) & (maxs <= high), axis=1)
+            return intersects, contained
+
+        return self._collect(self._query(test), [], visible_only)
+
+    def query_sphere(self, center, radius, visible_only=False):
+        """Find the meshes whose bounding boxes overlap a sphere.
+
+        Args:
+            center (Iterable): The center of the sphere as (x, y, z).
+            radius (float): The radius of the sphere.
+            visible_only (bool, optional): Whether to leave out invisible meshes. Defaults to False.
+
+        Returns:
+            list: The meshes found, in scene graph order.
+        """
+        center = np.asarray(center, dtype=float)
+        radius_squared = radius * radius
+
+        def test(mins, maxs):
+            closest = np.clip(center, mins, maxs)
+            intersects = ((closest - center) ** 2).sum(axis=1) <= radius_squared
+            farthest = np.maximum(np.abs(mins - center), np.abs(maxs - center))
+            contained = (farthest ** 2).sum(axis=1) <= radius_squared
+            return intersects, contained
+
+        return self._collect(self._query(test), [], visible_only)
+
+    def query_ray(self, origin, direction, max_distance=np.inf, visible_only=False):
+        """Find the meshes whose bounding boxes are crossed by a ray.
+
+        Args:
+            origin (Iterable): The starting point of the ray as (x, y, z).
+            direction (Iterable): The direction of the ray as (x, y, z).
+            max_distance (float, optional): Ignore boxes farther than this. Defaults to infinity.
+            visible_only (bool, optional): Whether to leave out invisible meshes. Defaults to False.
+
+        Returns:
+            list: The meshes found, in scene graph order.
+        """
+        origin = np.asarray(origin, dtype=float)
+        direction = np.asarray(direction, dtype=float)
+
+        def test(mins, maxs):
+            near, far = ray_box_distances(origin, direction, mins, maxs)
+            intersects = (near <= far) & (far >= 0) & (near <= max_distance)
+            return intersects, np.zeros(len(intersects), dtype=bool)
+
+        return self._collect(self._query(test), [], visible_only)
+
+    def nearest(self, point, max_distance=np.inf, visible_only=False):
+        """Find the mesh with the bounding box closest to a point.
+
+        Nodes are visited in order of their distance from the point,
+        so most of the hierarchy is never visited.
+
+        Args:
+            point (Iterable): The point as (x, y, z).
+            max_distance (float, optional): Ignore meshes farther than this. Defaults to infinity.
+            visible_only (bool, optional): Whether to leave out invisible meshes. Defaults to False.
+
+        Returns:
+            tuple: The nearest mesh and its distance, or None if no mesh was found.
+        """
+        self.update()
+        if len(self._node_min) == 0:
+            return None
+        point = np.asarray(point, dtype=float)
+
+        def distances(mins, maxs):
+            closest = np.clip(point, mins, maxs)
+            return np.sqrt(((closest - point) ** 2).sum(axis=-1))
+
+        # the heap holds (distance, is_item, index) for both nodes and items
+        heap = [(float(distances(self._node_min[0], self._node_max[0])), False, 0)]
+        while heap:
+            distance, is_item, index = heapq.heappop(heap)
+            if distance > max_distance:
+                return None
+            if is_item:
+                return self._meshes[self._item_meshes[index]], distance
+
+            start = self._node_start[index]
+            count = self._node_count[index]
+            if self._node_left[index] < 0:
+                items = self._order[start:start + count]
+                if visible_only:
+                    items = [item for item in items
+                             if self._meshes[self._item_meshes[item]]._visible]
+                    items = np.array(items, dtype=np.intp)
+                item_distances = distances(self._item_min[items], self._item_max[items])
+                for item, item_distance in zip(items.tolist(), item_distances.tolist()):
+                    heapq.heappush(heap, (item_distance, True, item))
+            else:
+                children = (self._node_left[index], self._node_right[index])
+                for child in children:
+                    child_distance = distances(self._node_min[child], self._node_max[child])
+                    heapq.heappush(heap, (float(child_distance), False, int(child)))
+        return None
+
+    def _query(self, test):
+        """Walk the hierarchy one level at a time with a vectorized box test.
+
+        Args:
+            test (function): Takes (N, 3) arrays of minimum and maximum corners and returns
+                boolean arrays of the boxes that intersect the query and those fully inside it.
+
+        Returns:
+            NDArray: The items whose boxes intersect the query.
+        """
+        self.update()
+        if len(self._node_min) == 0:
+            return np.zeros(0, dtype=np.intp)
+
+        found = []
+        frontier = np.zeros(1, dtype=np.intp)
+        while len(frontier):
+            intersects, contained = test(self._node_min[frontier], self._node_max[frontier])
+
+            # accept every item below a node that is entirely inside the query
+            inside = frontier[contained]
+            found.append(self._order[self._expand(inside)])
+
+            partial = frontier[intersects & ~contained]
+            is_leaf = self._node_left[partial] < 0
+
+            # test the items of leaves individually
+            items = self._order[self._expand(partial[is_leaf])]
+            item_intersects, _ = test(self._item_min[items], self._item_max[items])
+            found.append(items[item_intersects])
+
+            branches = partial[~is_leaf]
+            frontier = np.concatenate((self._node_left[branches], self._node_right[branches]))
+
+        return np.concatenate(found)
+
+    def _expand(self, nodes):
+        """Get the positions in the item order covered by the given nodes."""
+        counts = self._node_count[nodes]
+        total = counts.sum()
+        if total == 0:
+            return np.zeros(0, dtype=np.intp)
+        # offsets restart at the start of each node's range
+        ends = np.cumsum(counts)
+        offsets = np.arange(total) - np.repeat(ends - counts, counts)
+        return np.repeat(self._node_start[nodes], counts) + offsets
+
+    def _collect(self, items, extra, visible_only):
+        """Turn found items and extra mesh indices into a list of meshes in scene graph order."""
+        indices = np.sort(np.concatenate((self._item_meshes[items],
+                                          np.array(extra, dtype=np.intp))))
+        meshes = self._meshes
+        if visible_only:
+            return [meshes[i] for i in indices.tolist() if meshes[i]._visible]
+        return [meshes[i] for i in indices.tolist()]
+
+    def _world_boxes(self, items):
+        """Calculate the world space boxes of the given items from their world matrices."""
+        if len(items) == 0:
+            return np.zeros((0, 3)), np.zeros((0, 3))
+        meshes = self._meshes
+        world_matrices = np.array([meshes[index].world_matrix
+                                   for index in self._item_meshes[items].tolist()])
+        return transform_boxes(world_matrices, self._local_min[items], self._local_max[items])
+
+    def _refit(self, moved):
+        """Recalculate the boxes of moved meshes and every node above them."""
+        slots = [self._item_slots[mesh] for mesh in moved if mesh in self._item_slots]
+        moved.clear()
+        if not slots:
+            return
+        if len(slots) > len(self._item_slots) // 4:
+            self._refit_all()
+            return
+
+        items = np.array(slots, dtype=np.intp)
+        self._item_min[items], self._item_max[items] = self._world_boxes(items)
+
+        # leaves holding the moved items, then all of their ancestors
+        leaves = np.unique(self._leaf_of_position[self._position_of_item[items]])
+        for leaf in leaves.tolist():
+            start = self._node_start[leaf]
+            leaf_items = self._order[start:start + self._node_count[leaf]]
+            self._node_min[leaf] = self._item_min[leaf_items].min(axis=0)
+            self._node_max[leaf] = self._item_max[leaf_items].max(axis=0)
+
+        ancestors = set()
+        nodes = self._node_parent[leaves]
+        while len(nodes):
+            nodes = nodes[nodes >= 0]
+            nodes = np.unique(nodes)
+            ancestors.update(nodes.tolist())
+            nodes = self._node_parent[nodes]
+        ancestors = np.array(sorted(ancestors), dtype=np.intp)
+        self._refit_branches(ancestors)
+
+    def _refit_all(self):
+        """Recalculate the boxes of all meshes and all nodes."""
+        self._moved.clear()
+        items = np.arange(len(self._item_meshes))
+        self._item_min, self._item_max = self._world_boxes(items)
+        self._refit_nodes()
+
+    def _refit_nodes(self):
+        """Recalculate the boxes of all nodes from the current item boxes."""
+        if len(self._node_min) == 0:
+            return
+
+        # leaves cover the whole item order without overlapping, so reduce them together
+        leaves = np.flatnonzero(self._node_left < 0)
+        leaves = leaves[np.argsort(self._node_start[leaves])]
+        ordered_min = self._item_min[self._order]
+        ordered_max = self._item_max[self._order]
+        self._node_min[leaves] = np.minimum.reduceat(ordered_min, self._node_start[leaves])
+        self._node_max[leaves] = np.maximum.reduceat(ordered_max, self._node_start[leaves])
+
+        self._refit_branches(np.flatnonzero(self._node_left >= 0))
+
+    def _refit_branches(self, branches):
+        """Recalculate the boxes of the given interior nodes from the deepest level up."""
+        if len(branches) == 0:
+            return
+        depths = self._node_depth[branches]
+        for depth in np.unique(depths)[::-1]:
+            nodes = branches[depths == depth]
+            left = self._node_left[nodes]
+            right = self._node_right[nodes]
+            self._node_min[nodes] = np.minimum(self._node_min[left], self._node_min[right])
+            self._node_max[nodes] = np.maximum(self._node_max[left], self._node_max[right])
+
+    def _clear_nodes(self):
+        self._order = np.zeros(0, dtype=np.intp)
+        self._position_of_item = np.zeros(0, dtype=np.intp)
+        self._leaf_of_position = np.zeros(0, dtype=np.intp)
+        self._node_min = np.zeros((0, 3))
+        self._node_max = np.zeros((0, 3))
+        self._node_start = np.zeros(0, dtype=np.intp)
+        self._node_count = np.zeros(0, dtype=np.intp)
+        self._node_left = np.zeros(0, dtype=np.intp)
+        self._node_right = np.zeros(0, dtype=np.intp)
+        self._node_parent = np.zeros(0, dtype=np.intp)
+        self._node_depth = np.zeros(0, dtype=np.intp)
+
+    def _build_nodes(self):
+        """Split the items top-down at the median of their box centers along the widest axis."""
+        count = len(self._item_meshes)
+        if count == 0:
+            self._clear_nodes()
+            return
+
+        order = np.arange(count)
+        centers = (self._item_min + self._item_max) / 2
+        starts, counts, lefts, rights, parents, depths = [], [], [], [], [], []
+
+        stack = [(0, count, -1, 0)]
+        while stack:
+            start, size, parent, depth = stack.pop()
+            node = len(starts)
+            starts.append(start)
+            counts.append(size)
+            lefts.append(-1)
+            rights.append(-1)
+            parents.append(parent)
+            depths.append(depth)
+            if parent >= 0:
+                if lefts[parent] < 0:
+                    lefts[parent] = node
+                else:
+                    rights[parent] = node
+            if size <= self.LEAF_SIZE:
+                continue
+
+            items = order[start:start + size]
+            item_centers = centers[items]
+            axis = np.argmax(item_centers.max(axis=0) - item_centers.min(axis=0))
+            half = size // 2
+            order[start:start + size] = items[np.argpartition(item_centers[:, axis], half)]
+
+            # push the right half first so the left child is created first
+            stack.append((start + half, size - half, node, depth + 1))
+            stack.append((start, half, node, depth + 1))
+
+        self._order = order
+        self._position_of_item = np.argsort(order)
+        self._node_start = np.array(starts, dtype=np.intp)
+        self._node_count = np.array(counts, dtype=np.intp)
+        self._node_left = np.array(lefts, dtype=np.intp)
+        self._node_right = np.array(rights, dtype=np.intp)
+        self._node_parent = np.array(parents, dtype=np.intp)
+        self._node_depth = np.array(depths, dtype=np.intp)
+        self._node_min = np.zeros((len(starts), 3))
+        self._node_max = np.zeros((len(starts), 3))
+
+        leaves = np.flatnonzero(self._node_left < 0)
+        leaves = leaves[np.argsort(self._node_start[leaves])]
+        self._leaf_of_position = np.repeat(leaves, self._node_count[leaves])
+
+        self._refit_nodes()
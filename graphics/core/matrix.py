@@ -5,7 +5,11 @@ import numpy as np
 import numpy.typing as npt
 
 class Matrix:
-    """ Provides four-dimensional matrices for various geometric transformations """
+    """ Provides four-dimensional matrices for various geometric transformations 
+    
+    Each factory method returns a new float64 array unless an existing 4x4 array
+    is given as `out`, in which case the matrix is written into it and returned.
+    """
 
     # the 4D identity matrix
     __identity = np.array((
@@ -16,72 +20,91 @@ class Matrix:
     )).astype(float)
 
     @classmethod
-    def identity(cls) -> npt.NDArray[np.float64]:
-        """ A copy of the 4D identity matrix """
-        return cls.__identity.copy()
+    def identity(cls, out=None) -> npt.NDArray[np.float64]:
+        """ A copy of the 4D identity matrix, written into `out` if it is given """
+        if out is None:
+            return cls.__identity.copy()
+        out[...] = cls.__identity
+        return out
 
-    @staticmethod
-    def translation(x, y, z) -> npt.NDArray[np.float64]:
+    @classmethod
+    def translation(cls, x, y, z, out=None) -> npt.NDArray[np.float64]:
         """ 4D matrix for the translating along vector <x, y, z> """
-        return np.array((
-            (1, 0, 0, x),
-            (0, 1, 0, y),
-            (0, 0, 1, z),
-            (0, 0, 0, 1)
-        )).astype(float)
+        m = cls.identity(out)
+        m[0, 3] = x
+        m[1, 3] = y
+        m[2, 3] = z
+        return m
 
-    @staticmethod
-    def rotation_x(angle) -> npt.NDArray[np.float64]:
+    @classmethod
+    def rotation_x(cls, angle, out=None) -> npt.NDArray[np.float64]:
         """ 4D matrix for rotating around the x-axis by the given angle in radians """
         c = cos(angle)
         s = sin(angle)
-        return np.array((
-            (1, 0,  0, 0),
-            (0, c, -s, 0),
-            (0, s,  c, 0),
-            (0, 0,  0, 1)
-        )).astype(float)
+        m = cls.identity(out)
+        m[1, 1] = c
+        m[1, 2] = -s
+        m[2, 1] = s
+        m[2, 2] = c
+        return m
 
-    @staticmethod
-    def rotation_y(angle) -> npt.NDArray[np.float64]:
+    @classmethod
+    def rotation_y(cls, angle, out=None) -> npt.NDArray[np.float64]:
         """ 4D matrix for rotating around the y-axis by the given angle in radians """
         c = cos(angle)
         s = sin(angle)
-        return np.array((
-            ( c, 0, s, 0),
-            ( 0, 1, 0, 0),
-            (-s, 0, c, 0),
-            ( 0, 0, 0, 1)
-        )).astype(float)
+        m = cls.identity(out)
+        m[0, 0] = c
+        m[0, 2] = s
+        m[2, 0] = -s
+        m[2, 2] = c
+        return m
 
-    @staticmethod
-    def rotation_z(angle) -> npt.NDArray[np.float64]:
+    @classmethod
+    def rotation_z(cls, angle, out=None) -> npt.NDArray[np.float64]:
         """ 4D matrix for rotating around the z-axis by the given angle in radians """
         c = cos(angle)
         s = sin(angle)
-        return np.array((
-            (c, -s, 0, 0),
-            (s,  c, 0, 0),
-            (0,  0, 1, 0),
-            (0,  0, 0, 1)
-        )).astype(float)
+        m = cls.identity(out)
+        m[0, 0] = c
+        m[0, 1] = -s
+        m[1, 0] = s
+        m[1, 1] = c
+        return m
 
-    @staticmethod
-    def scale(r, s, t) -> npt.NDArray[np.float64]:
+    @classmethod
+    def scale(cls, r, s, t, out=None) -> npt.NDArray[np.float64]:
         """ 4D matrix for scaling dimensions x, y, and z by magnitudes r, s, and t respectively """
-        return np.array((
-            (r, 0, 0, 0),
-            (0, s, 0, 0),
-            (0, 0, t, 0),
-            (0, 0, 0, 1)
-        )).astype(float)
+        m = cls.identity(out)
+        m[0, 0] = r
+        m[1, 1] = s
+        m[2, 2] = t
+        return m
+
+    @classmethod
+    def rigid_inverse(cls, matrix, out=None) -> npt.NDArray[np.float64]:
+        """ Inverse of a 4D matrix made only of rotations, translations and uniform scaling 
+        
+        The inverse of the rotation is its transpose and the inverse translation is the
+        original translation rotated back and negated, so no general inversion is needed.
+        A uniform scale is undone by dividing by its square.
+        """
+        linear = matrix[:3, :3]
+        scale_squared = np.dot(linear[:, 0], linear[:, 0])
+        m = cls.identity(out)
+        np.divide(linear.T, scale_squared, out=m[:3, :3])
+        np.matmul(m[:3, :3], matrix[:3, 3], out=m[:3, 3])
+        np.negative(m[:3, 3], out=m[:3, 3])
+        return m
 
-    @staticmethod
+    @classmethod
     def perspective(
+            cls,
             angle_of_view=60,
             aspect_ratio=1,
             near=0.1,
-            far=1000
+            far=1000,
+            out=None
     ) -> npt.NDArray[np.float64]:
         """ 4D matrix for a projection transformation to the given perspective """
         a = angle_of_view * pi / 180.0
@@ -89,9 +112,11 @@ class Matrix:
         r = aspect_ratio
         b = (near + far) / (near - far)
         c = 2 * near * far / (near - far)
-        return np.array((
-            (d/r, 0,  0, 0),
-            (0,   d,  0, 0),
-            (0,   0,  b, c),
-            (0,   0, -1, 0)
-        )).astype(float)
\ No newline at end of file
+        m = cls.identity(out)
+        m[0, 0] = d/r
+        m[1, 1] = d
+        m[2, 2] = b
+        m[2, 3] = c
+        m[3, 2] = -1
+        m[3, 3] = 0
+        return m
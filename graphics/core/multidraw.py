@@ -0,0 +1,238 @@
+import ctypes
+
+import numpy as np
+import OpenGL.GL as GL
+
+from graphics.core.scene_graph import Mesh
+from graphics.geometries import Geometry
+
+# primitives that still draw correctly when the vertices of several meshes share a buffer
+_PACKABLE_STYLES = (GL.GL_TRIANGLES, GL.GL_LINES, GL.GL_POINTS)
+
+# the uniforms and settings of a pack's material that are not copied from the meshes' material
+_OWN_PROPERTIES = frozenset(("modelMatrix", "viewMatrix", "projectionMatrix", "useMultiDraw"))
+
+# whether the driver supports glMultiDrawArraysIndirect, or None until first checked
+_indirect_supported = None
+
+
+def _supports_indirect():
+    """Check whether draw commands can be read from a buffer with glMultiDrawArraysIndirect."""
+    global _indirect_supported
+    if _indirect_supported is None:
+        version = (GL.glGetIntegerv(GL.GL_MAJOR_VERSION), GL.glGetIntegerv(GL.GL_MINOR_VERSION))
+        extensions = {GL.glGetStringi(GL.GL_EXTENSIONS, index)
+                      for index in range(GL.glGetIntegerv(GL.GL_NUM_EXTENSIONS))}
+        _indirect_supported = version >= (4, 3) or b"GL_ARB_multi_draw_indirect" in extensions
+    return _indirect_supported
+
+
+class MeshPack(Mesh):
+    """Draws many meshes that share a material and vertex layout with a single multi-draw call.
+
+    The geometries of the meshes are packed one after another into shared vertex buffers, along
+    with a vertexDrawIndex attribute holding the position of each vertex's mesh in the pack.
+    The world matrices of the meshes are stored in a buffer texture that the shader reads by
+    draw index, so no uniforms are uploaded for each mesh. Any subset of the meshes, such as the
+    ones left after frustum culling, is drawn with one glMultiDrawArrays call, or with
+    glMultiDrawArraysIndirect where it is supported. If any of the geometries has indices, the
+    packed geometry is indexed and the elements versions of these calls are used instead.
+
+    The material must have the useMultiDraw setting, as the built-in materials do. The pack
+    draws with a clone of the material that has the setting turned on, and copies the uniform
+    data and settings of the material into it before each draw, so the material itself is left
+    unchanged for meshes drawn on their own. Custom shaders can read the matrices by prepending
+    core.openGL.MODEL_MATRIX_SOURCE. Renderer builds and draws packs automatically when its
+    multi_draw option is set.
+
+    The packed geometry is a copy, so a pack must be built again once the geometry of any
+    of its meshes changes, which the outdated property tells. The renderer does this itself.
+
+    Attributes:
+        meshes (list): The meshes drawn by this pack.
+        outdated (bool): Whether the geometry of any of the meshes changed after it was packed.
+    """
+
+    # the texture unit where the world matrices of the meshes are bound
+    MATRIX_TEXTURE_UNIT = 15
+
+    def __init__(self, meshes):
+        """Pack the geometries of meshes that share the same material.
+
+        Args:
+            meshes (list): The meshes to draw, whose geometries must have the same attributes.
+
+        Raises:
+            ValueError: when the meshes do not all share the same material
+        """
+        material = meshes[0].material
+        if any(mesh.material is not material for mesh in meshes):
+            raise ValueError("Only meshes with the same material can be packed together.")
+
+        geometries = [mesh.geometry for mesh in meshes]
+        vertex_counts = [geometry.vertex_count for geometry in geometries]
+        geometry = Geometry.combine(geometries)
+        geometry.set_attribute("vertexDrawIndex",
+                               np.repeat(np.arange(len(meshes), dtype=float), vertex_counts),
+                               "float")
+        # the pack's own variant of the material, kept in step with it for each draw
+        self._source_material = material
+        variant = material.clone()
+        variant.set_properties({"useMultiDraw": True})
+        super().__init__(geometry, variant)
+
+        # the range of each mesh counts indices if the packed geometry is indexed
+        counts = np.array([geometry.draw_count for geometry in geometries], dtype=np.int32)
+        self._meshes = list(meshes)
+        # the version of each distinct geometry when it was packed
+        distinct = {id(geometry): geometry for geometry in geometries}.values()
+        self._geometry_versions = [(geometry, geometry.version) for geometry in distinct]
+        self._counts = counts
+        self._firsts = (np.cumsum(counts) - counts).astype(np.int32)
+        self._selected = np.arange(len(meshes))
+
+        # the world matrix columns of every mesh, read in the shader as a buffer texture
+        self._matrix_buffer = GL.glGenBuffers(1)
+        GL.glBindBuffer(GL.GL_TEXTURE_BUFFER, self._matrix_buffer)
+        GL.glBufferData(GL.GL_TEXTURE_BUFFER, 64 * len(meshes), None, GL.GL_DYNAMIC_DRAW)
+        self._matrix_texture = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_BUFFER, self._matrix_texture)
+        GL.glTexBuffer(GL.GL_TEXTURE_BUFFER, GL.GL_RGBA32F, self._matrix_buffer)
+        GL.glBindTexture(GL.GL_TEXTURE_BUFFER, 0)
+        GL.glBindBuffer(GL.GL_TEXTURE_BUFFER, 0)
+        self._matrix_versions = None
+
+        # a draw command for every mesh, of which the selected ones are filled in for each draw
+        self._command_buffer = None
+        if _supports_indirect():
+            # each command holds a count, an instance count and a first vertex or index,
+            # followed by a base instance, or by a base vertex and base instance for indices
+            indexed = geometry.index_buffer is not None
+            self._commands = np.zeros((len(meshes), 5 if indexed else 4), dtype=np.uint32)
+            self._commands[:, 1] = 1
+            self._command_buffer = GL.glGenBuffers(1)
+            GL.glBindBuffer(GL.GL_DRAW_INDIRECT_BUFFER, self._command_buffer)
+            GL.glBufferData(GL.GL_DRAW_INDIRECT_BUFFER, self._commands.nbytes, None,
+                            GL.GL_STREAM_DRAW)
+            GL.glBindBuffer(GL.GL_DRAW_INDIRECT_BUFFER, 0)
+
+    @property
+    def meshes(self):
+        return self._meshes
+
+    @property
+    def outdated(self):
+        return any(geometry.version != version for geometry, version in self._geometry_versions)
+
+    def select(self, indices):
+        """Choose which of the meshes to draw and in what order.
+
+        Args:
+            indices (Iterable): The positions of the meshes in this pack to draw.
+        """
+        self._selected = np.asarray(indices, dtype=np.intp)
+
+    def render(self, view_matrix, projection_matrix, state=None, camera=None):
+        """Draw the selected meshes after uploading any world matrices that changed."""
+        self._material.copy_properties(self._source_material, skip=_OWN_PROPERTIES)
+        self._update_matrices()
+        matrices = (self._matrix_texture, self.MATRIX_TEXTURE_UNIT)
+        self._material.set_uniform("modelMatrices", matrices, "samplerBuffer", source=matrices)
+        super().render(view_matrix, projection_matrix, state, camera)
+
+    def release(self):
+        """Delete the GPU resources of this pack and release its material."""
+        super().release()
+        self._geometry.release()
+        GL.glDeleteTextures(1, [self._matrix_texture])
+        GL.glDeleteBuffers(1, [self._matrix_buffer])
+        if self._command_buffer is not None:
+            GL.glDeleteBuffers(1, [self._command_buffer])
+        self._material.release()
+
+    def _update_matrices(self):
+        """Upload the world matrices of all the meshes in one call if any of them moved."""
+        versions = [mesh.world_version for mesh in self._meshes]
+        if versions == self._matrix_versions:
+            return
+        self._matrix_versions = versions
+
+        # the shader reads each matrix one column at a time
+        matrices = np.array([mesh.world_matrix for mesh in self._meshes], dtype=np.float32)
+        columns = np.ascontiguousarray(matrices.transpose(0, 2, 1))
+        GL.glBindBuffer(GL.GL_TEXTURE_BUFFER, self._matrix_buffer)
+        GL.glBufferSubData(GL.GL_TEXTURE_BUFFER, 0, columns.nbytes, columns)
+        GL.glBindBuffer(GL.GL_TEXTURE_BUFFER, 0)
+
+    def _draw(self, draw_style):
+        """Issue one draw call for the vertex or index ranges of all the selected meshes."""
+        selected = self._selected
+        if len(selected) == 0:
+            return
+        firsts = self._firsts[selected]
+        counts = self._counts[selected]
+
+        indexed = self._geometry.index_buffer is not None
+
+        if self._command_buffer is None:
+            if indexed:
+                # the byte offset of the first index of each range
+                offsets = (ctypes.c_void_p * len(selected))(*(firsts * 4).tolist())
+                GL.glMultiDrawElements(draw_style, counts, GL.GL_UNSIGNED_INT, offsets,
+                                       len(selected))
+            else:
+                GL.glMultiDrawArrays(draw_style, firsts, counts, len(selected))
+            return
+
+        # the buffer keeps its storage and only the commands of the selected meshes are written
+        GL.glBindBuffer(GL.GL_DRAW_INDIRECT_BUFFER, self._command_buffer)
+        if len(selected) > len(self._commands):
+            # a selection can only have more commands than meshes if it repeats some of them
+            self._commands = np.zeros((len(selected), self._commands.shape[1]), dtype=np.uint32)
+            self._commands[:, 1] = 1
+            GL.glBufferData(GL.GL_DRAW_INDIRECT_BUFFER, self._commands.nbytes, None,
+                            GL.GL_STREAM_DRAW)
+        commands = self._commands[:len(selected)]
+        commands[:, 0] = counts
+        commands[:, 2] = firsts
+        GL.glBufferSubData(GL.GL_DRAW_INDIRECT_BUFFER, 0, commands.nbytes, commands)
+        if indexed:
+            GL.glMultiDrawElementsIndirect(draw_style, GL.GL_UNSIGNED_INT, None, len(selected), 0)
+        else:
+            GL.glMultiDrawArraysIndirect(draw_style, None, len(selected), 0)
+
+
+def pack_meshes(meshes):
+    """Build a MeshPack for each group of meshes that can be drawn together.
+
+    The meshes of a material are packed only if the material has the useMultiDraw setting,
+    is opaque, draws separate triangles, lines or points, and is used by more than one of the
+    meshes, all of which are ordinary Mesh objects. Its meshes are then split into one pack for
+    each set of geometry attributes.
+
+    Args:
+        meshes (Iterable): Every mesh that will be drawn, such as the mesh_list of a scene.
+
+    Returns:
+        list: The packs that were built.
+    """
+    materials = {}
+    for mesh in meshes:
+        materials.setdefault(mesh.material, []).append(mesh)
+
+    packs = []
+    for material, group in materials.items():
+        if (material.get_setting("useMultiDraw") is None
+                or material.get_setting("transparent")
+                or material.get_setting("drawStyle") not in _PACKABLE_STYLES
+                or len(group) < 2
+                or any(type(mesh) is not Mesh for mesh in group)):
+            continue
+
+        layouts = {}
+        for mesh in group:
+            layout = tuple(sorted((name, attribute.data_type)
+                                  for name, attribute in mesh.geometry.attributes.items()))
+            layouts.setdefault(layout, []).append(mesh)
+        packs.extend(MeshPack(members) for members in layouts.values())
+    return packs
@@ -1,10 +1,32 @@
+import ctypes
+import itertools
 from typing import Iterable
 
 import OpenGL.GL as GL
+# the unwrapped functions skip PyOpenGL's array conversion when given a ready ctypes pointer
+from OpenGL.raw.GL.VERSION.GL_2_0 import glUniformMatrix4fv, glUniform3fv
 import numpy as np
 
 class Attribute:
     """Manages attribute data to be stored in a single vertex buffer.
+
+    The data is converted once into a contiguous numpy array with a row for each element,
+    holding 32-bit integers for int attributes and 32-bit floats otherwise, and uploaded 
+    directly from that array. Arrays that are already in this form are stored without copying.
+
+    A mat4 attribute stores one 4x4 matrix per element and takes up four consecutive
+    attribute locations in the shader, one for each column. Its rows hold the 16 values of
+    each matrix one column at a time, as the shader reads them.
+
+    An attribute normally owns its buffer. Attributes packed into an InterleavedBuffer read
+    from the shared buffer instead, at their offset within each vertex, and their data is
+    uploaded by the InterleavedBuffer.
+
+    The usage hint tells the driver how often the data changes. Static data is stored once and
+    drawn many times. Dynamic data is changed now and then, so updates are written into the
+    existing buffer storage, and a range of elements can be updated on its own. Stream data is
+    replaced before nearly every draw, so each full update orphans the old storage and the CPU
+    never waits for the GPU to finish reading the previous data.
     """
 
     # maps data types to their associated vertex size and component data type
@@ -14,38 +36,153 @@ class Attribute:
         'vec2':     (2, GL.GL_FLOAT),
         'vec3':     (3, GL.GL_FLOAT),
         'vec4':     (4, GL.GL_FLOAT),
+        'mat4':     (16, GL.GL_FLOAT),
+    }
+
+    # maps usage hints to the OpenGL usage of the buffer storage
+    _USAGES = {
+        'static':   GL.GL_STATIC_DRAW,
+        'dynamic':  GL.GL_DYNAMIC_DRAW,
+        'stream':   GL.GL_STREAM_DRAW,
     }
 
-    def __init__(self, data_type: str, data: Iterable) -> None:
+    def __init__(self, data_type: str, data: Iterable, divisor: int=0, 
+                 usage: str='static') -> None:
         """Stores the data type, data, and a reference to the buffer before sending the data to the buffer.
 
         Args:
-            data_type: the type of the data being stored (int, float, vec2, vec3, vec4)
+            data_type: the type of the data being stored (int, float, vec2, vec3, vec4, mat4)
             data: the data to send to a vertex buffer
+            divisor: 0 to advance through the data once per vertex, or N to advance once
+                every N instances when drawing instanced. Defaults to 0.
+            usage: how often the data changes (static, dynamic, stream). Defaults to static.
         """
         if data_type not in self._ATTRIB_SIZE_TYPE.keys():
             raise ValueError(data_type, "Unsupported data type")
 
         self.data_type = data_type
         self.data = data
+        self.divisor = divisor
+        self.usage = usage
         self.buffer_ref = GL.glGenBuffers(1)
 
+        # the size and usage of the buffer storage, which is allocated again when either changes
+        self._allocation = None
+
+        # the bytes between consecutive vertices and before this attribute's first value,
+        # which are only set when the buffer is shared with other attributes
+        self._stride = 0
+        self._offset = 0
+        self._owns_buffer = True
+
         # send the data to the GPU buffer
         self.upload_data()
 
-    def upload_data(self) -> None:
+    @property
+    def data(self) -> np.ndarray:
+        """The data as an (N, size) array of 32-bit values, ready to send to the buffer."""
+        return self._data
+
+    @data.setter
+    def data(self, data: Iterable) -> None:
+        self._data = self._convert(data)
+
+    @property
+    def usage(self) -> str:
+        return self._usage
+
+    @usage.setter
+    def usage(self, usage: str) -> None:
+        if usage not in self._USAGES:
+            raise ValueError(usage, "Unsupported usage hint")
+        self._usage = usage
+
+    @property
+    def gl_usage(self) -> int:
+        """The OpenGL usage of the buffer storage for this attribute's usage hint."""
+        return self._USAGES[self._usage]
+
+    @property
+    def size(self) -> int:
+        """The number of components of each element."""
+        return self._ATTRIB_SIZE_TYPE[self.data_type][0]
+
+    @property
+    def interleaved(self) -> bool:
+        """Whether this attribute reads from a buffer shared with other attributes."""
+        return not self._owns_buffer
+
+    def set_elements(self, start: int, data: Iterable) -> int:
+        """Overwrites a range of elements with new data without uploading them.
+
+        If the current data was stored without copying, the caller's array changes as well.
+
+        Args:
+            start: the index of the first element to overwrite
+            data: the new data of each element from start onward
+
+        Returns:
+            The index after the last element that was overwritten.
+
+        Raises:
+            ValueError: The range does not fit within the current data.
+        """
+        elements = self._convert(data)
+        stop = start + len(elements)
+        if start < 0 or stop > len(self._data):
+            raise ValueError(f"Elements {start} to {stop} do not fit in an attribute "
+                             f"of {len(self._data)} elements.")
+        self._data[start:stop] = elements
+        return stop
+
+    def upload_data(self, start: int=0, stop: int=None) -> None:
         """Sends this attribute data to a GPU buffer.
+
+        Args:
+            start: the index of the first element to send. Defaults to 0.
+            stop: the index after the last element to send. Defaults to None for all of them.
+
+        Raises:
+            RuntimeError: The attribute is interleaved, so its InterleavedBuffer must upload it.
         """
+        if not self._owns_buffer:
+            raise RuntimeError("An interleaved attribute is uploaded by its InterleavedBuffer.")
 
-        # convert data to numpy array format
-        # using 32-bit floating point numbers
-        data = np.array(self.data).astype(np.float32)
+        self._allocation = _upload_array_buffer(self.buffer_ref, self._data, self.gl_usage,
+                                                self._allocation, start, stop)
 
-        # select buffer used by the following functions
-        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.buffer_ref)
+    def share_buffer(self, buffer_ref: int, stride: int, offset: int) -> None:
+        """Reads this attribute from a buffer holding the data of several attributes.
 
-        # store data in currently bound buffer as a 1D array
-        GL.glBufferData(GL.GL_ARRAY_BUFFER, data.ravel(), GL.GL_STATIC_DRAW)
+        The attribute's own buffer is deleted, and the shared buffer is not deleted by release().
+
+        Args:
+            buffer_ref: An OpenGL reference to the shared buffer
+            stride: The number of bytes from the start of one vertex to the next
+            offset: The number of bytes from the start of a vertex to this attribute's data
+        """
+        self.release()
+        self.buffer_ref = buffer_ref
+        self._stride = stride
+        self._offset = offset
+        self._owns_buffer = False
+
+    def separate_buffer(self) -> None:
+        """Stops reading from a shared buffer and sends this attribute's data to its own buffer."""
+        if self._owns_buffer:
+            return
+        self.buffer_ref = GL.glGenBuffers(1)
+        self._allocation = None
+        self._stride = 0
+        self._offset = 0
+        self._owns_buffer = True
+        self.upload_data()
+
+    def release(self) -> None:
+        """Deletes the GPU buffer of this attribute, which must not be drawn afterward."""
+        if self.buffer_ref is not None and self._owns_buffer:
+            GL.glDeleteBuffers(1, [self.buffer_ref])
+        self.buffer_ref = None
 
     def associate_variable(self, program_ref: int, variable_name: str, vao_ref: int=None) -> None:
         """Associates a variable in the given program with this buffer.
@@ -79,19 +216,240 @@ class Attribute:
         # get vertex parameters for this attribute's data type
         size, gl_type = self._ATTRIB_SIZE_TYPE[self.data_type]
 
-        # specify how data will be read from the currently bound buffer 
-        # into the specified variable. These associations are stored by
-        # whichever VAO is bound before calling this method.
-        GL.glVertexAttribPointer(variable_ref, size, gl_type, False, 0, None)
+        # a matrix is read as one vec4 column from each of four consecutive locations
+        columns = 4 if self.data_type == 'mat4' else 1
+        size //= columns
+        stride = self._stride or (4 * size * columns if columns > 1 else 0)
+
+        for column in range(columns):
+            # specify how data will be read from the currently bound buffer 
+            # into the specified variable. These associations are stored by
+            # whichever VAO is bound before calling this method.
+            offset = self._offset + 4 * size * column
+            offset = ctypes.c_void_p(offset) if offset else None
+            if gl_type == GL.GL_INT:
+                # integers reach the shader unchanged instead of being converted to floats
+                GL.glVertexAttribIPointer(variable_ref + column, size, gl_type, stride, offset)
+            else:
+                GL.glVertexAttribPointer(variable_ref + column, size, gl_type, False, stride, offset)
+
+            # indicate that data will be streamed to this variable
+            GL.glEnableVertexAttribArray(variable_ref + column)
+
+            # data for instanced drawing advances per instance instead of per vertex
+            if self.divisor:
+                GL.glVertexAttribDivisor(variable_ref + column, self.divisor)
+
+    def _convert(self, data: Iterable) -> np.ndarray:
+        """Converts data to an (N, size) array of 32-bit values, copying it only if needed."""
+        size = self.size
+        dtype = np.int32 if self.data_type == 'int' else np.float32
+        data = np.asarray(data, dtype=dtype)
+        if self.data_type == 'mat4':
+            # shaders read matrix attributes one column at a time
+            data = data.reshape(-1, 4, 4).transpose(0, 2, 1)
+        elif data.ndim > 1 and data.shape[-1] != size:
+            raise ValueError(f"Expecting {size} values for each {self.data_type} element "
+                             f"but got {data.shape[-1]}.")
+        return np.ascontiguousarray(data).reshape(-1, size)
+
+
+class InterleavedBuffer:
+    """Stores the data of several attributes in a single vertex buffer, one vertex after another.
+
+    The data is packed into a structured numpy array with a field for each attribute, so all
+    the values of a vertex sit next to each other in memory. Each attribute reads its field
+    with the stride and offset given by the array's dtype. The buffer follows the usage hint
+    of whichever attribute changes most often.
+    """
+
+    def __init__(self, attributes: dict) -> None:
+        """Creates a shared buffer for the attributes and sends their data to it.
+
+        Args:
+            attributes: the Attribute objects to pack, keyed by their variable names
+
+        Raises:
+            ValueError: The attributes do not all have the same number of elements.
+        """
+        self._attributes = dict(attributes)
+        self.dtype = np.dtype([(name, attribute.data.dtype, (attribute.size,))
+                               for name, attribute in self._attributes.items()])
+        self.data = None
+        self.buffer_ref = GL.glGenBuffers(1)
+        self._allocation = None
+
+        self.upload_data()
+        for name, attribute in self._attributes.items():
+            attribute.share_buffer(self.buffer_ref, self.dtype.itemsize, self.dtype.fields[name][1])
+
+    @property
+    def attributes(self) -> dict:
+        return self._attributes
+
+    @property
+    def gl_usage(self) -> int:
+        """The OpenGL usage of the buffer storage for the most often changed attribute."""
+        usages = [attribute.gl_usage for attribute in self._attributes.values()]
+        for usage in (GL.GL_STREAM_DRAW, GL.GL_DYNAMIC_DRAW):
+            if usage in usages:
+                return usage
+        return GL.GL_STATIC_DRAW
+
+    def upload_data(self, start: int=0, stop: int=None) -> None:
+        """Packs the current data of the attributes and sends it to the shared buffer.
 
-        # indicate that data will be streamed to this variable
-        GL.glEnableVertexAttribArray(variable_ref)
+        Args:
+            start: the index of the first vertex to send. Defaults to 0.
+            stop: the index after the last vertex to send. Defaults to None for all of them.
+
+        Raises:
+            ValueError: The attributes do not all have the same number of elements.
+        """
+        arrays = {name: attribute.data for name, attribute in self._attributes.items()}
+        counts = {len(array) for array in arrays.values()}
+        if len(counts) > 1:
+            raise ValueError("Interleaved attributes must all have the same number of elements.")
+        count = counts.pop() if counts else 0
+
+        # only the vertices being sent are packed again unless the number of vertices changed
+        if self.data is None or len(self.data) != count:
+            self.data = np.empty(count, dtype=self.dtype)
+            start, stop = 0, None
+        for name, array in arrays.items():
+            self.data[name][start:stop] = array[start:stop]
+
+        self._allocation = _upload_array_buffer(self.buffer_ref, self.data, self.gl_usage,
+                                                self._allocation, start, stop)
+
+    def release(self) -> None:
+        """Deletes the shared buffer, after which the attributes must not be drawn
+        unless separate_buffer() is called for each of them."""
+        if self.buffer_ref is not None:
+            GL.glDeleteBuffers(1, [self.buffer_ref])
+            self.buffer_ref = None
+
+
+def _upload_array_buffer(buffer_ref, data, usage, allocation, start=0, stop=None):
+    """Sends a range of rows of an array to a vertex buffer, only allocating storage when needed.
+
+    Storage is allocated again when the size of the data or the usage changes, and whenever a 
+    static buffer is replaced entirely. Otherwise the rows are written into the existing storage
+    with glBufferSubData. Replacing all of a stream buffer first orphans its storage, so the
+    driver can hand out new memory instead of waiting for draws still reading the old data.
+
+    Args:
+        buffer_ref (int): The OpenGL reference of the buffer.
+        data (NDArray): The whole contiguous array stored in the buffer.
+        usage (int): The OpenGL usage of the buffer storage.
+        allocation (tuple): The value returned by the last call for this buffer, or None.
+        start (int, optional): The index of the first row to send. Defaults to 0.
+        stop (int, optional): The index after the last row to send. Defaults to None for all.
+
+    Returns:
+        tuple: The size and usage of the buffer storage, to pass to the next call.
+    """
+    GL.glBindBuffer(GL.GL_ARRAY_BUFFER, buffer_ref)
+    replaced = start == 0 and (stop is None or stop >= len(data))
+    if allocation != (data.nbytes, usage) or (replaced and usage == GL.GL_STATIC_DRAW):
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, data.nbytes, data, usage)
+        return (data.nbytes, usage)
+
+    if replaced and usage == GL.GL_STREAM_DRAW:
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, data.nbytes, None, usage)
+    rows = data[start:stop]
+    if len(rows):
+        GL.glBufferSubData(GL.GL_ARRAY_BUFFER, start * data.strides[0], rows.nbytes, rows)
+    return allocation
+
+
+class IndexBuffer:
+    """Manages the vertex indices of a geometry stored in an element array buffer.
+
+    Each group of indices names the vertices of one primitive, so a vertex shared by several
+    triangles is stored and processed only once, and the GPU can reuse its transformed result.
+    """
+
+    def __init__(self, data: Iterable) -> None:
+        """Stores the indices and a reference to the buffer before sending the indices to the buffer.
+
+        Args:
+            data: the vertex indices, three for each triangle
+        """
+        self.data = data
+        self.buffer_ref = GL.glGenBuffers(1)
+
+        # send the data to the GPU buffer
+        self.upload_data()
+
+    @property
+    def count(self) -> int:
+        """The number of indices."""
+        return len(self.data)
+
+    def upload_data(self) -> None:
+        """Sends the indices to a GPU buffer as 32-bit unsigned integers.
+        """
+        self.data = np.asarray(self.data, dtype=np.uint32).ravel()
+
+        # binding an element array buffer would change the bound VAO, 
+        # so the buffer is filled through the array buffer target instead
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.buffer_ref)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, self.data, GL.GL_STATIC_DRAW)
+
+    def bind(self) -> None:
+        """Stores this buffer as the source of indices in the currently bound VAO."""
+        GL.glBindBuffer(GL.GL_ELEMENT_ARRAY_BUFFER, self.buffer_ref)
+
+    def release(self) -> None:
+        """Deletes the GPU buffer of these indices, which must not be drawn afterward."""
+        if self.buffer_ref is not None:
+            GL.glDeleteBuffers(1, [self.buffer_ref])
+            self.buffer_ref = None
 
 
 class Uniform:
-    """ Manages data for a single uniform variable in a shader program """
+    """ Manages data for a single uniform variable in a shader program 
+
+    A shader program keeps the values of its uniform variables between draw calls, so data is 
+    only uploaded when it has changed since it was last uploaded to the same program variable.
+    Assigning to `data` marks the uniform as changed. Modifying the current data in place does
+    not, so assign the data again after modifying it.
+
+    The array types mat4[] and vec3[] upload every element of an (N, 4, 4) or (N, 3) array with
+    a single call. The variable must be declared in the shader with at least N elements.
 
-    _VALID_TYPES = ('int','bool','float','vec2','vec3','vec4','mat4','sampler2d')
+    The data of sampler2D and samplerBuffer variables is a (texture reference, texture unit) pair.
+    """
+
+    _VALID_TYPES = ('int','bool','float','vec2','vec3','vec4','mat4','sampler2d','samplerbuffer',
+                    'mat4[]','vec3[]')
+
+    # the texture target bound for each sampler type
+    _SAMPLER_TARGETS = {
+        'sampler2d':     GL.GL_TEXTURE_2D,
+        'samplerbuffer': GL.GL_TEXTURE_BUFFER,
+    }
+
+    # the name of the method that uploads each data type
+    _SETTERS = {
+        'int':       '_upload_int',
+        'bool':      '_upload_int',
+        'float':     '_upload_float',
+        'vec2':      '_upload_vec2',
+        'vec3':      '_upload_vec3',
+        'vec4':      '_upload_vec4',
+        'mat4':      '_upload_mat4',
+        'sampler2d': '_upload_sampler2d',
+        'samplerbuffer': '_upload_sampler2d',
+        'mat4[]':    '_upload_mat4_array',
+        'vec3[]':    '_upload_vec3_array',
+    }
+
+    # the serial number of the uniform and the version of its data last uploaded to each
+    # (program, variable location), which does not keep deleted uniforms alive
+    _uploaded = {}
+    _serial_numbers = itertools.count()
 
     def __init__(self, data_type, data):
         # check the given data type
@@ -99,40 +457,382 @@ class Uniform:
             raise ValueError(f"Unsupported data type: {data_type}")
         self.data_type = data_type.lower()
 
-        # data to be sent to uniform variable
-        self.data = data
+        # data to be sent to uniform variable, and a counter of its changes
+        self._data = data
+        self._version = 0
+        self._source = None
+        self._serial_number = next(Uniform._serial_numbers)
 
-        # reference for variable location in program
+        # reference for variable location in program and the method that uploads to it
         self.variable_ref = None
+        self._program_ref = None
+        self._upload = None
+
+        # float32 values in the layout expected by OpenGL, reused for every upload
+        self._staging = None
+        self._staging_pointer = None
+
+    @property
+    def data(self):
+        return self._data
 
-    def locate_variable(self, program_ref, variable_name):
-        """Get and store reference to a program variable with the given name."""
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._source = None
+        self._version += 1
+
+    @property
+    def version(self):
+        """A counter that increases whenever the data of this uniform changes."""
+        return self._version
+
+    def set_data(self, data, source=None):
+        """Assign data along with a key that identifies it, such as a node and its world version.
+
+        If the key equals the one given with the current data, the data is considered unchanged
+        and will not be uploaded again. This avoids comparing large values like matrices.
+
+        Args:
+            data (any): The data to be sent to the uniform variable.
+            source (hashable, optional): A key that changes whenever the data changes.
+                Defaults to None, which always marks the data as changed.
+        """
+        if source is not None and source == self._source:
+            return
+        self._data = data
+        self._source = source
+        self._version += 1
+
+    @classmethod
+    def forget_program(cls, program_ref):
+        """Discard the record of values uploaded to a program before it is deleted."""
+        for location in [location for location in cls._uploaded if location[0] == program_ref]:
+            del cls._uploaded[location]
+
+    def locate_variable(self, program_ref, variable_name, required=True):
+        """Get and store reference to a program variable with the given name.
+
+        If the variable is not required and the program does not use it, nothing is uploaded.
+        """
 
         self.variable_ref = GL.glGetUniformLocation(program_ref, variable_name)
-        if self.variable_ref == -1:
+        if self.variable_ref == -1 and required:
           raise ValueError(f"No uniform variable found with name {variable_name}")
+        self._program_ref = program_ref
+
+        # choose the upload method once instead of checking the data type for every upload
+        self._upload = getattr(self, self._SETTERS[self.data_type])
+        if self.data_type == "mat4":
+            self._stage((4, 4))
 
-    def upload_data(self):
-        """Store data in a previously located uniform variable."""
+    def upload_data(self, state=None):
+        """Store data in a previously located uniform variable if it has changed since its last upload.
+
+        Args:
+            state (GLState, optional): The state tracker used to bind the texture of a
+                sampler2D variable, which skips the bind if the texture is already bound.
+                Defaults to None, which always binds the texture.
+        """
         # check that the variable reference exists
         assert self.variable_ref is not None, "Must locate uniform variable before uploading data."
+        if self.variable_ref == -1:
+            return
+
+        # a sampler's texture must be bound for every draw even when its unit has not changed
+        target = self._SAMPLER_TARGETS.get(self.data_type)
+        if target is not None:
+            texture_obj_ref, texture_unit_ref = self._data
+            if state is not None:
+                state.bind_texture(texture_unit_ref, texture_obj_ref, target)
+            else:
+                GL.glActiveTexture(GL.GL_TEXTURE0 + texture_unit_ref)
+                GL.glBindTexture(target, texture_obj_ref)
+
+        # skip the upload if the program variable already holds this version of the data
+        location = (self._program_ref, self.variable_ref)
+        uploaded = (self._serial_number, self._version)
+        if self._uploaded.get(location) == uploaded:
+            return
+        self._uploaded[location] = uploaded
+
+        self._upload()
+
+    def _upload_int(self):
+        GL.glUniform1i(self.variable_ref, self._data)
+
+    def _upload_float(self):
+        GL.glUniform1f(self.variable_ref, self._data)
+
+    def _upload_vec2(self):
+        GL.glUniform2f(self.variable_ref, *self._data)
+
+    def _upload_vec3(self):
+        GL.glUniform3f(self.variable_ref, *self._data)
+
+    def _upload_vec4(self):
+        GL.glUniform4f(self.variable_ref, *self._data)
+
+    def _upload_mat4(self):
+        # the transpose of a row-major matrix is stored in column-major order
+        np.copyto(self._staging, np.transpose(self._data))
+        glUniformMatrix4fv(self.variable_ref, 1, GL.GL_FALSE, self._staging_pointer)
+
+    def _upload_sampler2d(self):
+        GL.glUniform1i(self.variable_ref, self._data[1])
+
+    def _upload_mat4_array(self):
+        matrices = np.asarray(self._data)
+        staging = self._stage(matrices.shape)
+        np.copyto(staging, np.swapaxes(matrices, 1, 2))
+        glUniformMatrix4fv(self.variable_ref, len(staging), GL.GL_FALSE, self._staging_pointer)
 
-        if self.data_type == "int":
-            GL.glUniform1i(self.variable_ref, self.data)
-        elif self.data_type == "bool":
-            GL.glUniform1i(self.variable_ref, self.data)
-        elif self.data_type == "float":
-            GL.glUniform1f(self.variable_ref, self.data)
-        elif self.data_type == "vec2":
-            GL.glUniform2f(self.variable_ref, *self.data)
-        elif self.data_type == "vec3":
-            GL.glUniform3f(self.variable_ref, *self.data)
-        elif self.data_type == "vec4":
-            GL.glUniform4f(self.variable_ref, *self.data)
-        elif self.data_type == "mat4":
-            GL.glUniformMatrix4fv(self.variable_ref, 1, GL.GL_TRUE, self.data)
-        elif self.data_type == "sampler2d":
-            texture_obj_ref, texture_unit_ref = self.data
-            GL.glActiveTexture(GL.GL_TEXTURE0 + texture_unit_ref)
-            GL.glBindTexture(GL.GL_TEXTURE_2D, texture_obj_ref)
-            GL.glUniform1i(self.variable_ref, texture_unit_ref)
+    def _upload_vec3_array(self):
+        vectors = np.asarray(self._data)
+        staging = self._stage(vectors.shape)
+        np.copyto(staging, vectors)
+        glUniform3fv(self.variable_ref, len(staging), self._staging_pointer)
+
+    def _stage(self, shape):
+        """Get a float32 staging buffer of the given shape, only allocating when the shape changes."""
+        if self._staging is None or self._staging.shape != shape:
+            self._staging = np.empty(shape, dtype=np.float32)
+            self._staging_pointer = self._staging.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
+        return self._staging
+
+
+class FrameUniformBuffer:
+    """Manages a uniform buffer object holding the camera data shared by every draw in a frame.
+
+    Shaders read the data by declaring the uniform block in BLOCK_SOURCE, which makes its members 
+    available as if they were ordinary uniforms. The renderer writes the whole block once per frame,
+    so materials that use it do not upload the view and projection matrices for every mesh.
+    Programs must be attached with attach_program() to read from this buffer.
+    """
+
+    # the uniform buffer binding point shared by all programs
+    BINDING_POINT = 0
+
+    BLOCK_NAME = "FrameData"
+
+    BLOCK_SOURCE = """
+    layout(std140) uniform FrameData {
+        mat4 viewMatrix;
+        mat4 projectionMatrix;
+        mat4 viewProjectionMatrix;
+        vec3 cameraPosition;
+        float time;
+    };
+    """
+
+    def __init__(self):
+        # three column-major matrices followed by a vec3 and a float in std140 layout
+        self._data = np.zeros(52, dtype=np.float32)
+        self._matrices = self._data[:48].reshape(3, 4, 4)
+        self.buffer_ref = GL.glGenBuffers(1)
+        GL.glBindBuffer(GL.GL_UNIFORM_BUFFER, self.buffer_ref)
+        GL.glBufferData(GL.GL_UNIFORM_BUFFER, self._data.nbytes, None, GL.GL_DYNAMIC_DRAW)
+        GL.glBindBuffer(GL.GL_UNIFORM_BUFFER, 0)
+
+    @classmethod
+    def attach_program(cls, program_ref):
+        """Connect the frame data block of a program to the shared binding point.
+
+        Args:
+            program_ref (int): An OpenGL reference to a linked shader program.
+
+        Returns:
+            bool: Whether the program declares the frame data block.
+        """
+        block_index = GL.glGetUniformBlockIndex(program_ref, cls.BLOCK_NAME)
+        if block_index == GL.GL_INVALID_INDEX:
+            return False
+        GL.glUniformBlockBinding(program_ref, block_index, cls.BINDING_POINT)
+        return True
+
+    def update(self, view_matrix, projection_matrix, view_projection_matrix, 
+               camera_position, time):
+        """Write the data for a new frame into the buffer and bind it to the shared binding point.
+
+        Args:
+            view_matrix (NDArray): The view matrix of the camera.
+            projection_matrix (NDArray): The projection matrix of the camera.
+            view_projection_matrix (NDArray): The projection matrix multiplied by the view matrix.
+            camera_position (NDArray): The position of the camera in world space.
+            time (float): The time in seconds, such as the time since the application started.
+        """
+        # transposing the row-major matrices stores them in column-major order
+        self._matrices[0] = view_matrix.T
+        self._matrices[1] = projection_matrix.T
+        self._matrices[2] = view_projection_matrix.T
+        self._data[48:51] = camera_position
+        self._data[51] = time
+
+        GL.glBindBuffer(GL.GL_UNIFORM_BUFFER, self.buffer_ref)
+        GL.glBufferSubData(GL.GL_UNIFORM_BUFFER, 0, self._data.nbytes, self._data)
+        GL.glBindBuffer(GL.GL_UNIFORM_BUFFER, 0)
+        GL.glBindBufferBase(GL.GL_UNIFORM_BUFFER, self.BINDING_POINT, self.buffer_ref)
+
+
+# GLSL shared by the vertex shaders of the built-in materials, which prepend it like
+# FrameUniformBuffer.BLOCK_SOURCE. getModelMatrix() returns the model matrix of the vertex
+# from the USE_INSTANCING or USE_MULTI_DRAW variant inputs, or the modelMatrix uniform.
+MODEL_MATRIX_SOURCE = """
+    #ifndef USE_MULTI_DRAW
+    uniform mat4 modelMatrix;
+    #endif
+
+    #ifdef USE_INSTANCING
+    in mat4 instanceMatrix;
+    #endif
+
+    #ifdef USE_MULTI_DRAW
+    uniform samplerBuffer modelMatrices;
+    in float vertexDrawIndex;
+    #endif
+
+    mat4 getModelMatrix() {
+        #if defined(USE_MULTI_DRAW)
+        int column = int(vertexDrawIndex) * 4;
+        return mat4(texelFetch(modelMatrices, column),
+                    texelFetch(modelMatrices, column + 1),
+                    texelFetch(modelMatrices, column + 2),
+                    texelFetch(modelMatrices, column + 3));
+        #elif defined(USE_INSTANCING)
+        return modelMatrix * instanceMatrix;
+        #else
+        return modelMatrix;
+        #endif
+    }
+    """
+
+
+class GLState:
+    """Shadows the OpenGL state set while rendering so that redundant calls can be skipped.
+
+    Every call through PyOpenGL crosses from Python into C, so setting a value that is already
+    current is wasted time. The tracker remembers the current program, vertex array object,
+    texture bindings, enabled capabilities, polygon mode, point size, line width and blend
+    function, and only calls OpenGL when a requested value differs from the shadowed one.
+
+    The shadowed values are only correct while all changes go through the tracker.
+    Call reset() after changing any of this state directly with OpenGL.
+    """
+    def __init__(self):
+        self._issued_count = 0
+        self._skipped_count = 0
+        self.reset()
+
+    @property
+    def issued_count(self):
+        """The number of OpenGL calls made through this tracker since the counters were reset."""
+        return self._issued_count
+
+    @property
+    def skipped_count(self):
+        """The number of redundant OpenGL calls skipped since the counters were reset."""
+        return self._skipped_count
+
+    def reset(self):
+        """Forget all shadowed values so that the next request for each one calls OpenGL."""
+        self._program = None
+        self._vertex_array = None
+        self._active_unit = None
+        self._textures = {}
+        self._capabilities = {}
+        self._polygon_mode = None
+        self._point_size = None
+        self._line_width = None
+        self._blend_function = None
+
+    def reset_counters(self):
+        """Set the issued and skipped call counters back to zero."""
+        self._issued_count = 0
+        self._skipped_count = 0
+
+    def use_program(self, program_ref):
+        """Make the given shader program current."""
+        if self._program == program_ref:
+            self._skipped_count += 1
+            return
+        GL.glUseProgram(program_ref)
+        self._program = program_ref
+        self._issued_count += 1
+
+    def bind_vertex_array(self, vao_ref):
+        """Bind the given vertex array object."""
+        if self._vertex_array == vao_ref:
+            self._skipped_count += 1
+            return
+        GL.glBindVertexArray(vao_ref)
+        self._vertex_array = vao_ref
+        self._issued_count += 1
+
+    def bind_texture(self, unit, texture_ref, target=GL.GL_TEXTURE_2D):
+        """Bind a texture to the given texture unit, activating the unit only if needed.
+
+        Args:
+            unit (int): The index of the texture unit.
+            texture_ref (int): The OpenGL reference of the texture.
+            target (int, optional): The texture target. Defaults to GL_TEXTURE_2D.
+        """
+        if self._textures.get((unit, target)) == texture_ref:
+            self._skipped_count += 1
+            return
+        if self._active_unit != unit:
+            GL.glActiveTexture(GL.GL_TEXTURE0 + unit)
+            self._active_unit = unit
+            self._issued_count += 1
+        GL.glBindTexture(target, texture_ref)
+        self._textures[(unit, target)] = texture_ref
+        self._issued_count += 1
+
+    def set_capability(self, capability, enabled):
+        """Enable or disable an OpenGL capability such as GL_CULL_FACE or GL_BLEND."""
+        enabled = bool(enabled)
+        if self._capabilities.get(capability) == enabled:
+            self._skipped_count += 1
+            return
+        if enabled:
+            GL.glEnable(capability)
+        else:
+            GL.glDisable(capability)
+        self._capabilities[capability] = enabled
+        self._issued_count += 1
+
+    def set_polygon_mode(self, mode):
+        """Set how both front and back faces are rasterized, such as GL_FILL or GL_LINE."""
+        if self._polygon_mode == mode:
+            self._skipped_count += 1
+            return
+        GL.glPolygonMode(GL.GL_FRONT_AND_BACK, mode)
+        self._polygon_mode = mode
+        self._issued_count += 1
+
+    def set_point_size(self, size):
+        """Set the diameter of rasterized points in pixels."""
+        if self._point_size == size:
+            self._skipped_count += 1
+            return
+        GL.glPointSize(size)
+        self._point_size = size
+        self._issued_count += 1
+
+    def set_line_width(self, width):
+        """Set the width of rasterized lines in pixels."""
+        if self._line_width == width:
+            self._skipped_count += 1
+            return
+        GL.glLineWidth(width)
+        self._line_width = width
+        self._issued_count += 1
+
+    def set_blend_function(self, source_factor, destination_factor):
+        """Set the factors used to blend new fragments with the colors already drawn."""
+        function = (source_factor, destination_factor)
+        if self._blend_function == function:
+            self._skipped_count += 1
+            return
+        GL.glBlendFunc(source_factor, destination_factor)
+        self._blend_function = function
+        self._issued_count += 1
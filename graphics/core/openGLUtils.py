@@ -1,6 +1,36 @@
+import ctypes
+import hashlib
+import os
+
 import OpenGL.GL as GL
 # if this import fails on Mac OS, try the fix posted here:
 # https://github.com/PixarAnimationStudios/USD/issues/1372
+from OpenGL.GL.KHR.parallel_shader_compile import (
+    GL_COMPLETION_STATUS_KHR, glInitParallelShaderCompileKHR, glMaxShaderCompilerThreadsKHR
+)
+
+from graphics.core.openGL import Uniform
+
+# programs shared between materials, keyed by a hash of their shader code,
+# along with the number of materials using each one
+_shared_programs = {}
+_shared_program_keys = {}
+
+# shared programs that were started but not yet checked, with the binary cache file for each
+_pending_programs = {}
+
+# shared programs that failed to compile or link, with their error messages, kept until
+# every holder has released them so each one gets the error
+_failed_programs = {}
+
+# the directory storing linked program binaries between runs, or None to always compile
+_binary_cache_directory = None
+
+# the shaders of programs started without waiting for them to compile and link
+_started_programs = {}
+
+# whether the driver compiles shaders in parallel, or None until first checked
+_parallel_compile = None
 
 
 def initialize_shader(shader_code, shader_type):
@@ -9,6 +39,16 @@ def initialize_shader(shader_code, shader_type):
     If the compilation fails, an exception will be raised after 
     clearing the shader object from memory."""
 
+    shader_ref = _start_shader(shader_code, shader_type)
+    _check_shader(shader_ref)
+
+    # compilation was successful, so return shader reference value
+    return shader_ref
+
+
+def _start_shader(shader_code, shader_type):
+    """Submits shader code for compiling without waiting for the result."""
+
     # specify required OpenGL_GLSL version
     shader_code = f"#version 330\n{shader_code}"
 
@@ -18,6 +58,11 @@ def initialize_shader(shader_code, shader_type):
     GL.glShaderSource(shader_ref, shader_code)
     # compile source code previously stored in the shader object
     GL.glCompileShader(shader_ref)
+    return shader_ref
+
+
+def _check_shader(shader_ref):
+    """Raises an exception if a shader failed to compile after clearing it from memory."""
 
     # queries whether shader compile was successful
     compile_success = GL.glGetShaderiv(shader_ref, GL.GL_COMPILE_STATUS)
@@ -32,24 +77,36 @@ def initialize_shader(shader_code, shader_type):
         # raise exception to halt application and print error message
         raise RuntimeError(error_message)
 
-    # compilation was successful, so return shader reference value
-    return shader_ref
-
 
-def initialize_program(vertex_shader_code, fragment_shader_code):
+def initialize_program(vertex_shader_code, fragment_shader_code, binary_retrievable=False):
     """Creates a GPU program by attaching and linking together compiled shaders.
     
     If the linking fails, an exception will be raised after 
-    clearing the program object from memory."""
+    clearing the program object from memory.
+    If binary_retrievable is True, the driver is asked to keep the linked
+    binary available for glGetProgramBinary."""
 
-    vertex_shader_ref = initialize_shader(
-        vertex_shader_code, 
-        GL.GL_VERTEX_SHADER
-    )
-    fragment_shader_ref = initialize_shader(
-        fragment_shader_code, 
-        GL.GL_FRAGMENT_SHADER
-    )
+    program_ref = start_program(vertex_shader_code, fragment_shader_code, binary_retrievable)
+    finish_program(program_ref)
+
+    # linking was successful, so return program reference value
+    return program_ref
+
+
+def start_program(vertex_shader_code, fragment_shader_code, binary_retrievable=False):
+    """Submits the shaders of a GPU program for compiling and linking without waiting for the result.
+
+    Drivers supporting GL_KHR_parallel_shader_compile compile on background threads, so
+    many programs can be started at once and is_program_complete() reports when each is done.
+    Every started program must be passed to finish_program() before it is used.
+
+    Returns:
+        int: The OpenGL reference of the program.
+    """
+    _enable_parallel_compile()
+
+    vertex_shader_ref = _start_shader(vertex_shader_code, GL.GL_VERTEX_SHADER)
+    fragment_shader_ref = _start_shader(fragment_shader_code, GL.GL_FRAGMENT_SHADER)
 
     # create empty program object and store its reference
     program_ref = GL.glCreateProgram()
@@ -58,25 +115,254 @@ def initialize_program(vertex_shader_code, fragment_shader_code):
     GL.glAttachShader(program_ref, vertex_shader_ref)
     GL.glAttachShader(program_ref, fragment_shader_ref)
 
+    if binary_retrievable:
+        GL.glProgramParameteri(program_ref, GL.GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL.GL_TRUE)
+
     # link vertex shader to fragment shader
     GL.glLinkProgram(program_ref)
 
+    _started_programs[program_ref] = (vertex_shader_ref, fragment_shader_ref)
+    return program_ref
+
+
+def is_program_complete(program_ref):
+    """Checks without waiting whether a started program has finished compiling and linking.
+
+    Without GL_KHR_parallel_shader_compile this is always True, and finish_program()
+    waits for the driver instead.
+    """
+    if program_ref not in _started_programs or not _enable_parallel_compile():
+        return True
+    status = GL.GLint()
+    GL.glGetProgramiv(program_ref, GL_COMPLETION_STATUS_KHR, ctypes.byref(status))
+    return bool(status.value)
+
+
+def finish_program(program_ref, delete_failed=True):
+    """Waits for a started program to compile and link, and checks that both succeeded.
+
+    If either failed, an exception will be raised after 
+    clearing the program object from memory, unless delete_failed is False."""
+
+    shader_refs = _started_programs.pop(program_ref, None)
+    if shader_refs is None:
+        return
+
+    try:
+        for shader_ref in shader_refs:
+            _check_shader(shader_ref)
+    except RuntimeError:
+        if delete_failed:
+            GL.glDeleteProgram(program_ref)
+        raise
+
     # checks if the program link was successful
     link_success = GL.glGetProgramiv(program_ref, GL.GL_LINK_STATUS)
     if not link_success:
         # retrieve error message
         error_message = GL.glGetProgramInfoLog(program_ref)
         # free memory used to store program
-        GL.glDeleteProgram(program_ref)
+        if delete_failed:
+            GL.glDeleteProgram(program_ref)
         # convert byte string to character string
         error_message = f"\n{error_message.decode('utf-8')}"
         # raise exception to halt application and print error message
         raise RuntimeError(error_message)
 
-    # linking was successful, so return program reference value
+
+def _enable_parallel_compile():
+    """Lets the driver use all its compiler threads if it supports parallel shader compiling."""
+    global _parallel_compile
+    if _parallel_compile is None:
+        _parallel_compile = bool(glInitParallelShaderCompileKHR())
+        if _parallel_compile:
+            # 0xFFFFFFFF leaves the number of threads up to the driver
+            glMaxShaderCompilerThreadsKHR(0xFFFFFFFF)
+    return _parallel_compile
+
+
+def set_program_binary_cache(directory):
+    """Stores linked program binaries in a directory so later runs can skip compiling shaders.
+
+    Binaries are only valid for the driver that created them, so entries are keyed by the 
+    OpenGL vendor, renderer and version along with the shader code. A binary that the driver
+    rejects is ignored and the program is compiled from source instead.
+
+    Args:
+        directory (str): The directory for cached binaries, which is created if needed,
+            or None to stop using a cache.
+    """
+    global _binary_cache_directory
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    _binary_cache_directory = directory
+
+
+def _binary_cache_path(key):
+    """Get the file for the cached binary of a program, or None if binaries cannot be cached."""
+    if _binary_cache_directory is None:
+        return None
+    if GL.glGetIntegerv(GL.GL_NUM_PROGRAM_BINARY_FORMATS) == 0:
+        return None
+
+    driver = "\0".join(GL.glGetString(name).decode("utf-8")
+                       for name in (GL.GL_VENDOR, GL.GL_RENDERER, GL.GL_VERSION))
+    name = hashlib.sha256(f"{key}\0{driver}".encode("utf-8")).hexdigest()
+    return os.path.join(_binary_cache_directory, f"{name}.bin")
+
+
+def _load_program_binary(path):
+    """Create a program from a cached binary, or return None if it is missing or rejected."""
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+    if len(data) <= 4:
+        return None
+
+    # each file holds the binary format followed by the binary itself
+    binary_format = int.from_bytes(data[:4], "little")
+    binary = data[4:]
+
+    program_ref = GL.glCreateProgram()
+    try:
+        GL.glProgramBinary(program_ref, binary_format, binary, len(binary))
+        loaded = GL.glGetProgramiv(program_ref, GL.GL_LINK_STATUS)
+    except GL.GLError:
+        loaded = False
+    if not loaded:
+        GL.glDeleteProgram(program_ref)
+        return None
     return program_ref
 
 
+def _save_program_binary(program_ref, path):
+    """Write the linked binary of a program to the cache, ignoring any failure."""
+    length = GL.glGetProgramiv(program_ref, GL.GL_PROGRAM_BINARY_LENGTH)
+    if length <= 0:
+        return
+
+    binary = (ctypes.c_ubyte * length)()
+    written = GL.GLsizei()
+    binary_format = GL.GLenum()
+    GL.glGetProgramBinary(program_ref, length, ctypes.byref(written), 
+                          ctypes.byref(binary_format), binary)
+    data = binary_format.value.to_bytes(4, "little") + bytes(binary)[:written.value]
+
+    # write to a temporary file first so other processes never read a partial binary
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def _program_key(vertex_shader_code, fragment_shader_code):
+    """Hash the shader code of a program into a key for the program cache."""
+    source = f"{vertex_shader_code}\0{fragment_shader_code}".encode("utf-8")
+    return hashlib.sha256(source).hexdigest()
+
+
+def acquire_program(vertex_shader_code, fragment_shader_code, wait=True):
+    """Gets a shared GPU program for the given shader code, only compiling it the first time.
+
+    Every call must be matched by a call to release_program() when the program is no longer used.
+    If a binary cache has been set with set_program_binary_cache(), new programs are loaded
+    from it when possible.
+
+    Args:
+        vertex_shader_code (str): The GLSL code of the vertex shader.
+        fragment_shader_code (str): The GLSL code of the fragment shader.
+        wait (bool, optional): Whether to wait for a new program to compile. If False, the
+            program must not be used until program_ready() returns True. Defaults to True.
+    
+    Returns:
+        int: The OpenGL reference of the shared program.
+    """
+    key = _program_key(vertex_shader_code, fragment_shader_code)
+    entry = _shared_programs.get(key)
+    if entry is None:
+        path = _binary_cache_path(key)
+        program_ref = _load_program_binary(path) if path is not None else None
+        if program_ref is None:
+            program_ref = start_program(vertex_shader_code, fragment_shader_code, 
+                                        binary_retrievable=path is not None)
+            _pending_programs[program_ref] = path
+        entry = [program_ref, 0]
+        _shared_programs[key] = entry
+        _shared_program_keys[program_ref] = key
+    entry[1] += 1
+    if wait:
+        try:
+            program_ready(entry[0], wait=True)
+        except RuntimeError:
+            release_program(entry[0])
+            raise
+    return entry[0]
+
+
+def program_ready(program_ref, wait=False):
+    """Checks whether a shared program has finished compiling so it can be used.
+
+    Args:
+        program_ref (int): A program from acquire_program().
+        wait (bool, optional): Whether to wait for the program instead of returning False
+            while it is still compiling. Defaults to False.
+
+    Returns:
+        bool: True once the program is linked and ready to use.
+
+    Raises:
+        RuntimeError: when the program failed to compile or link, for every holder of it,
+            each of which must still release it
+    """
+    if program_ref in _failed_programs:
+        raise RuntimeError(_failed_programs[program_ref])
+    if program_ref not in _pending_programs:
+        return True
+    if not wait and not is_program_complete(program_ref):
+        return False
+
+    path = _pending_programs.pop(program_ref)
+    try:
+        # the failed program stays shared until its last release deletes it, 
+        # so its reference cannot be reused by another program in the meantime
+        finish_program(program_ref, delete_failed=False)
+    except RuntimeError as error:
+        _failed_programs[program_ref] = str(error)
+        raise
+    if path is not None:
+        _save_program_binary(program_ref, path)
+    return True
+
+
+def release_program(program_ref):
+    """Releases one use of a shared GPU program, deleting it once it is no longer used."""
+    key = _shared_program_keys.get(program_ref)
+    if key is None:
+        raise ValueError(f"Program {program_ref} was not acquired from the program cache.")
+
+    entry = _shared_programs[key]
+    entry[1] -= 1
+    if entry[1] == 0:
+        del _shared_programs[key]
+        del _shared_program_keys[program_ref]
+        _pending_programs.pop(program_ref, None)
+        _started_programs.pop(program_ref, None)
+        _failed_programs.pop(program_ref, None)
+        Uniform.forget_program(program_ref)
+        GL.glDeleteProgram(program_ref)
+
+
+def shared_program_count():
+    """Counts the distinct GPU programs currently held by the program cache."""
+    return len(_shared_programs)
+
+
 def print_system_info():
     """Prints information about the supported version of OpenGL/SLGL on this computer."""
 
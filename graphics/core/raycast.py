@@ -0,0 +1,311 @@
+import numpy as np
+import OpenGL.GL as GL
+
+from graphics.core.bounds import transform_boxes, ray_box_distances
+
+def intersect_triangles(origin, direction, vertices, edges1, edges2):
+    """Intersects a ray with many triangles at once using the Möller–Trumbore algorithm.
+
+    Triangles are hit from either side.
+
+    Args:
+        origin (NDArray): The (3,) starting point of the ray.
+        direction (NDArray): The (3,) direction of the ray.
+        vertices (NDArray): An (N, 3) array of the first vertex of each triangle.
+        edges1 (NDArray): An (N, 3) array of the edges from the first to the second vertices.
+        edges2 (NDArray): An (N, 3) array of the edges from the first to the third vertices.
+
+    Returns:
+        tuple: The (N,) arrays of distances along the ray and the barycentric coordinates u and v
+            of the second and third vertices. The distance is infinity for triangles that are missed.
+    """
+    p = np.cross(direction, edges2)
+    determinants = (edges1 * p).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inverse = 1 / determinants
+        s = origin - vertices
+        u = (s * p).sum(axis=1) * inverse
+        q = np.cross(s, edges1)
+        v = (q * direction).sum(axis=1) * inverse
+        distances = (q * edges2).sum(axis=1) * inverse
+        # comparisons with nan from parallel or degenerate triangles are False
+        hits = (u >= 0) & (v >= 0) & (u + v <= 1) & (distances >= 0)
+    return np.where(hits, distances, np.inf), u, v
+
+
+def _morton_codes(points):
+    """Interleave the bits of points quantized to a 1024^3 grid over their bounding box."""
+    low = points.min(axis=0)
+    span = points.max(axis=0) - low
+    span[span == 0] = 1
+    cells = ((points - low) / span * 1023).astype(np.uint32)
+
+    # spread the lower 10 bits of each coordinate out to every third bit
+    cells = (cells | (cells << 16)) & 0x030000FF
+    cells = (cells | (cells << 8)) & 0x0300F00F
+    cells = (cells | (cells << 4)) & 0x030C30C3
+    cells = (cells | (cells << 2)) & 0x09249249
+    return (cells[:, 0] << 2) | (cells[:, 1] << 1) | cells[:, 2]
+
+
+class TriangleBVH:
+    """A bounding volume hierarchy over the triangles of a geometry for fast ray casting.
+
+    Triangles are sorted along a Morton curve so nearby triangles are stored together, and
+    then grouped into leaves of LEAF_SIZE triangles. Each level above pairs up neighboring
+    nodes of the level below, so the tree is built and traversed with whole-array operations
+    one level at a time instead of a Python loop over nodes or triangles.
+
+    Geometry objects build one when their triangle_bvh property is first requested.
+    """
+
+    # the number of triangles in each leaf node
+    LEAF_SIZE = 8
+
+    def __init__(self, positions):
+        """Build the hierarchy from a list of vertex positions, three for each triangle.
+
+        Args:
+            positions (NDArray): An (N, 3) array of vertex positions. Leftover vertices are ignored.
+        """
+        count = len(positions) // 3
+        triangles = np.asarray(positions, dtype=float)[:count * 3, :3].reshape(count, 3, 3)
+
+        order = np.argsort(_morton_codes(triangles.sum(axis=1) / 3), kind="stable")
+        triangles = triangles[order]
+        self._order = order
+        self._vertices = triangles[:, 0]
+        self._edges1 = triangles[:, 1] - triangles[:, 0]
+        self._edges2 = triangles[:, 2] - triangles[:, 0]
+
+        # leaf boxes, then each parent level pairs up the nodes of the level below
+        first, second, third = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+        starts = np.arange(0, count, self.LEAF_SIZE)
+        mins = np.minimum.reduceat(np.minimum(np.minimum(first, second), third), starts)
+        maxs = np.maximum.reduceat(np.maximum(np.maximum(first, second), third), starts)
+        levels = [(mins, maxs)]
+        while len(mins) > 1:
+            pairs = np.arange(0, len(mins), 2)
+            mins = np.minimum.reduceat(mins, pairs)
+            maxs = np.maximum.reduceat(maxs, pairs)
+            levels.append((mins, maxs))
+        levels.reverse()
+        self._levels = levels
+
+    def __len__(self):
+        return len(self._order)
+
+    def intersect(self, origin, direction, max_distance=np.inf):
+        """Find the nearest triangle hit by a ray.
+
+        Args:
+            origin (NDArray): The (3,) starting point of the ray.
+            direction (NDArray): The (3,) direction of the ray.
+            max_distance (float, optional): Ignore hits farther than this. Defaults to infinity.
+
+        Returns:
+            tuple: The distance along the ray, the index of the triangle in the original
+                draw order and the barycentric coordinates (u, v) of its second and third
+                vertices, or None if no triangle was hit.
+        """
+        if len(self._order) == 0:
+            return None
+
+        frontier = np.zeros(1, dtype=np.intp)
+        last = len(self._levels) - 1
+        for depth, (mins, maxs) in enumerate(self._levels):
+            near, far = ray_box_distances(origin, direction, mins[frontier], maxs[frontier])
+            frontier = frontier[(near <= far) & (far >= 0) & (near <= max_distance)]
+            if len(frontier) == 0:
+                return None
+            if depth < last:
+                children = np.concatenate((frontier * 2, frontier * 2 + 1))
+                frontier = children[children < len(self._levels[depth + 1][0])]
+
+        # test every triangle in the leaves that were reached
+        starts = frontier * self.LEAF_SIZE
+        counts = np.minimum(self.LEAF_SIZE, len(self._order) - starts)
+        ends = np.cumsum(counts)
+        candidates = np.repeat(starts - (ends - counts), counts) + np.arange(ends[-1])
+
+        distances, u, v = intersect_triangles(origin, direction, self._vertices[candidates],
+                                              self._edges1[candidates], self._edges2[candidates])
+        best = np.argmin(distances)
+        distance = distances[best]
+        if distance == np.inf or distance > max_distance:
+            return None
+        return float(distance), int(self._order[candidates[best]]), float(u[best]), float(v[best])
+
+
+class RaycastHit:
+    """The result of a ray hitting a mesh.
+
+    Attributes:
+        mesh (core.scene_graph.Mesh): The mesh that was hit.
+        distance (float): The distance from the origin of the ray to the hit point.
+        point (NDArray): The hit point in world space.
+        triangle (int): The index of the triangle that was hit in the geometry's draw order.
+        barycentric (NDArray): The weights of the triangle's three vertices at the hit point.
+        instance (int): The index of the instance that was hit in an InstancedMesh, or None.
+        vertices (NDArray): The indices of the triangle's three vertices in the geometry.
+    """
+    def __init__(self, mesh, distance, point, triangle, barycentric, instance=None):
+        self.mesh = mesh
+        self.distance = distance
+        self.point = point
+        self.triangle = triangle
+        self.barycentric = barycentric
+        self.instance = instance
+
+    @property
+    def vertices(self):
+        indices = self.mesh.geometry.indices
+        first = 3 * self.triangle
+        if indices is None:
+            return np.arange(first, first + 3)
+        return indices[first:first + 3]
+
+
+class Ray:
+    """A ray in world space for picking meshes in a scene.
+
+    Attributes:
+        origin (NDArray): The starting point of the ray.
+        direction (NDArray): The normalized direction of the ray.
+    """
+    def __init__(self, origin, direction):
+        self.origin = np.array(origin, dtype=float)
+        direction = np.array(direction, dtype=float)
+        length = np.linalg.norm(direction)
+        if length == 0:
+            raise ValueError("The direction of a ray must not be a zero vector.")
+        self.direction = direction / length
+
+    @classmethod
+    def from_screen(cls, camera, x, y, width, height):
+        """Create a ray from a camera through a point on the screen, such as the mouse position.
+
+        Args:
+            camera (core.scene_graph.Camera): The camera viewing the scene.
+            x (float): The horizontal pixel coordinate, increasing to the right.
+            y (float): The vertical pixel coordinate, increasing downward.
+            width (int): The width of the screen in pixels.
+            height (int): The height of the screen in pixels.
+
+        Returns:
+            Ray: A ray starting at the camera's position.
+        """
+        ndc_x = 2 * x / width - 1
+        ndc_y = 1 - 2 * y / height
+        inverse = np.linalg.inv(camera.view_projection_matrix)
+        far_point = inverse @ (ndc_x, ndc_y, 1, 1)
+        origin = camera.world_matrix[:3, 3]
+        return cls(origin, far_point[:3] / far_point[3] - origin)
+
+    def at(self, distance):
+        """Get the point at the given distance along the ray."""
+        return self.origin + self.direction * distance
+
+    def intersect_mesh(self, mesh, max_distance=np.inf):
+        """Find where this ray first hits the triangles of a mesh.
+
+        The ray is moved into the local space of the mesh so the geometry's cached triangle
+        hierarchy can be used no matter how the mesh is transformed. For an InstancedMesh,
+        the bounding boxes of all the instances are tested first in one vectorized pass and
+        then the instances that were hit are tested in order of distance.
+
+        Args:
+            mesh (core.scene_graph.Mesh): The mesh to test.
+            max_distance (float, optional): Ignore hits farther than this. Defaults to infinity.
+
+        Returns:
+            RaycastHit: The nearest hit, or None if the ray misses the mesh.
+        """
+        if mesh.material.get_setting("drawStyle") != GL.GL_TRIANGLES:
+            return None
+        triangles = mesh.geometry.triangle_bvh
+        if triangles is None:
+            return None
+
+        instance_matrices = getattr(mesh, "instance_matrices", None)
+        if instance_matrices is None:
+            world_matrices = mesh.world_matrix[np.newaxis]
+            candidates = [0]
+        else:
+            world_matrices = mesh.world_matrix @ instance_matrices
+            count = len(world_matrices)
+            low, high = mesh.geometry.bounding_box
+            near, far = ray_box_distances(self.origin, self.direction,
+                                          *transform_boxes(world_matrices,
+                                                           np.broadcast_to(low, (count, 3)),
+                                                           np.broadcast_to(high, (count, 3))))
+            near = np.maximum(near, 0)
+            candidates = np.flatnonzero((near <= far) & (near <= max_distance))
+            candidates = candidates[np.argsort(near[candidates])].tolist()
+
+        nearest = None
+        for index in candidates:
+            if instance_matrices is not None and near[index] > max_distance:
+                break
+
+            # distances along the ray are the same in local space since the mapping is affine
+            inverse = np.linalg.inv(world_matrices[index])
+            origin = inverse[:3, :3] @ self.origin + inverse[:3, 3]
+            direction = inverse[:3, :3] @ self.direction
+
+            hit = triangles.intersect(origin, direction, max_distance)
+            if hit is not None:
+                distance, triangle, u, v = hit
+                nearest = RaycastHit(mesh, distance, self.at(distance), triangle,
+                                     np.array((1 - u - v, u, v)),
+                                     None if instance_matrices is None else index)
+                max_distance = distance
+        return nearest
+
+
+def raycast(root, ray, max_distance=np.inf, visible_only=True):
+    """Find the nearest mesh hit by a ray in a scene graph.
+
+    The bounding boxes of all the meshes are tested first in one vectorized pass, or through
+    the scene's spatial index if it has one. The triangles of the remaining meshes are then
+    tested in order of distance until no closer hit is possible.
+    Only meshes drawn as triangles can be hit.
+
+    Args:
+        root (core.scene_graph.Object3D): The scene or the root of the subtree to search.
+        ray (Ray): The ray to cast.
+        max_distance (float, optional): Ignore hits farther than this. Defaults to infinity.
+        visible_only (bool, optional): Whether to ignore invisible meshes. Defaults to True.
+
+    Returns:
+        RaycastHit: The nearest hit, or None if the ray misses every mesh.
+    """
+    spatial_index = getattr(root, "spatial_index", None)
+    if spatial_index is not None:
+        meshes = spatial_index.query_ray(ray.origin, ray.direction, max_distance, visible_only)
+    elif visible_only:
+        meshes = list(root.iter_visible_meshes())
+    else:
+        meshes = root.mesh_list
+
+    meshes = [mesh for mesh in meshes if mesh.bounding_box is not None]
+    if not meshes:
+        return None
+
+    world_matrices = np.array([mesh.world_matrix for mesh in meshes])
+    mins = np.array([mesh.bounding_box[0] for mesh in meshes])
+    maxs = np.array([mesh.bounding_box[1] for mesh in meshes])
+    near, far = ray_box_distances(ray.origin, ray.direction,
+                                  *transform_boxes(world_matrices, mins, maxs))
+    near = np.maximum(near, 0)
+    candidates = np.flatnonzero((near <= far) & (near <= max_distance))
+
+    nearest = None
+    for index in candidates[np.argsort(near[candidates])].tolist():
+        if near[index] > max_distance:
+            break
+        hit = ray.intersect_mesh(meshes[index], max_distance)
+        if hit is not None:
+            nearest = hit
+            max_distance = hit.distance
+    return nearest
@@ -1,21 +1,67 @@
+from itertools import compress
+from time import perf_counter
+
+import numpy as np
 import OpenGL.GL as GL
 
-from graphics.core.scene_graph import Mesh, Camera, Scene
+from graphics.core.bounds import frustum_planes, transform_spheres, spheres_in_frustum
+from graphics.core.multidraw import pack_meshes
+from graphics.core.openGL import GLState, FrameUniformBuffer
+from graphics.core.scene_graph import Camera, InstancedMesh, Scene
 
 class Renderer:
-    """Manages the rendering of a given scene with basic OpenGL settings."""
-    def __init__(self, clear_color: tuple[int, int, int] = (0,0,0)):
+    """Manages the rendering of a given scene with basic OpenGL settings.
+    
+    Attributes:
+        state (core.openGL.GLState): The tracker of OpenGL state used while rendering, 
+            whose counters show how many OpenGL calls were issued and skipped.
+        frustum_culling (bool): Whether to skip meshes that are entirely outside the camera's view.
+        sort_meshes (bool): Whether to sort meshes into a render queue that groups meshes with the
+            same program, material and textures and orders them by depth.
+        multi_draw (bool): Whether to pack meshes that share a material into core.multidraw.MeshPack
+            objects, drawing the visible meshes of each pack with one multi-draw call.
+        wait_for_programs (bool): Whether to wait for shader programs to compile before drawing.
+            If False, meshes whose materials are still compiling are skipped until they are ready.
+        culled_count (int): The number of meshes skipped by frustum culling in the last render.
+        pending_count (int): The number of meshes skipped in the last render because their
+            shader programs were still compiling.
+    """
+    def __init__(self, clear_color: tuple[int, int, int] = (0,0,0), frustum_culling=True,
+                 sort_meshes=True, multi_draw=False, wait_for_programs=True):
         """Initialize basic settings for depth testing, antialiasing and clear color."
 
         Args:
             clearColor (tuple, optional): The background color for clearing the screen. Defaults to (0,0,0).
+            frustum_culling (bool, optional): Whether to skip meshes outside the view. Defaults to True.
+            sort_meshes (bool, optional): Whether to draw meshes in a sorted render queue. Defaults to True.
+            multi_draw (bool, optional): Whether to draw meshes sharing a material with multi-draw
+                calls. Defaults to False.
+            wait_for_programs (bool, optional): Whether to wait for shader programs to compile
+                before drawing. Defaults to True.
         """
-        GL.glEnable(GL.GL_DEPTH_TEST)
-        GL.glEnable(GL.GL_MULTISAMPLE)
-        GL.glClearColor(*clear_color, 1)
+        self.frustum_culling = frustum_culling
+        self.sort_meshes = sort_meshes
+        self.multi_draw = multi_draw
+        self.wait_for_programs = wait_for_programs
+        self._culled_count = 0
+        self._pending_count = 0
+
+        # the packs built for the scene last rendered, and the pack and position of each mesh
+        self._packs = []
+        self._pack_entries = None
+        self._packed_scene = None
 
-        GL.glEnable(GL.GL_BLEND)
-        GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+        # the local bounding spheres of the meshes of the scene last culled, kept until the
+        # scene's tree or one of the meshes' geometries changes
+        self._cull_bounds = None
+        self._cull_key = None
+
+        self._state = GLState()
+        self._frame_uniforms = FrameUniformBuffer()
+        self._start_time = perf_counter()
+
+        GL.glClearColor(*clear_color, 1)
+        self._apply_global_settings()
 
     def render(self, scene: Scene, camera: Camera) -> None:
         """Render the given scene as viewed through the given camera.
@@ -32,7 +78,231 @@ class Renderer:
         # clear buffers
         GL.glClear(GL.GL_COLOR_BUFFER_BIT | GL.GL_DEPTH_BUFFER_BIT)
 
-        # draw all the viewable meshes
-        for mesh in scene.descendant_list:
-            if isinstance(mesh, Mesh) and mesh.visible:
-                mesh.render(camera.view_matrix, camera.projection_matrix)
\ No newline at end of file
+        view_matrix = camera.view_matrix
+        projection_matrix = camera.projection_matrix
+
+        # share the camera data with every material that reads the frame uniform block
+        self._frame_uniforms.update(view_matrix, projection_matrix, 
+                                    camera.view_projection_matrix, camera.world_matrix[:3, 3],
+                                    perf_counter() - self._start_time)
+
+        self._culled_count = 0
+        spatial_index = scene.spatial_index
+        if self.frustum_culling and spatial_index is not None:
+            # the hierarchy skips whole groups of meshes outside the view at once
+            planes = frustum_planes(camera.view_projection_matrix)
+            meshes = spatial_index.query_frustum(planes, visible_only=True)
+            visible_count = sum(1 for _ in scene.iter_visible_meshes())
+            self._culled_count = visible_count - len(meshes)
+        elif self.frustum_culling:
+            meshes = self._cull(scene, camera)
+        else:
+            meshes = scene.iter_visible_meshes()
+
+        self._pending_count = 0
+        if not self.wait_for_programs:
+            meshes = list(meshes)
+            ready = [mesh.material.program_ready for mesh in meshes]
+            self._pending_count = len(meshes) - sum(ready)
+            meshes = compress(meshes, ready)
+
+        if self.sort_meshes:
+            meshes = self._sort(list(meshes), view_matrix)
+
+        # OpenGL state may have been changed outside the renderer since the last frame
+        state = self._state
+        state.reset()
+        self._apply_global_settings()
+
+        if self.multi_draw:
+            meshes = self._pack_queue(scene, meshes)
+        elif self._packs:
+            self._release_packs()
+
+        # draw all the viewable meshes, only changing the state that differs between them
+        for mesh in meshes:
+            mesh.render(view_matrix, projection_matrix, state, camera)
+        state.bind_vertex_array(0)
+
+    def compile(self, scene: Scene, wait=False):
+        """Start compiling the shader programs of every mesh in a scene at once.
+
+        Submitting all the programs before checking any of them lets the driver compile them
+        in parallel, and with wait_for_programs set to False the first frames can be drawn
+        while the rest are still compiling.
+
+        Args:
+            scene (core.scene_graph.Scene): The scene whose materials will be compiled.
+            wait (bool, optional): Whether to wait for every program to finish. Defaults to False.
+
+        Returns:
+            bool: True if every material is ready to draw.
+        """
+        materials = {id(mesh.material): mesh.material for mesh in scene.mesh_list}.values()
+        for material in materials:
+            material.compile(wait=False)
+        return all([material.compile(wait) for material in materials])
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def culled_count(self):
+        return self._culled_count
+
+    @property
+    def pending_count(self):
+        return self._pending_count
+
+    def _apply_global_settings(self):
+        """Enable depth testing, antialiasing and alpha blending for all meshes."""
+        state = self._state
+        state.set_capability(GL.GL_DEPTH_TEST, True)
+        state.set_capability(GL.GL_MULTISAMPLE, True)
+        state.set_capability(GL.GL_BLEND, True)
+        state.set_blend_function(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+
+    def _pack_queue(self, scene, meshes):
+        """Replace the meshes of each pack in the render queue with the pack itself.
+
+        Each pack takes the place of the first of its meshes in the queue and draws the rest
+        of its meshes in their queued order. The packs are rebuilt when the scene's tree changes,
+        and a pack is rebuilt when the geometry of any of its meshes changes. Unless the renderer
+        waits for programs, the meshes of a pack are drawn one by one until its program is ready.
+        """
+        if self._packed_scene != (scene, scene.tree_version):
+            self._release_packs()
+            self._packs = pack_meshes(scene.mesh_list)
+            self._packed_scene = (scene, scene.tree_version)
+        else:
+            outdated = [pack for pack in self._packs if pack.outdated]
+            if outdated:
+                self._packs = [pack for pack in self._packs if not pack.outdated]
+                for pack in outdated:
+                    pack.release()
+                    self._packs.extend(pack_meshes(pack.meshes))
+                self._pack_entries = None
+        if self._pack_entries is None:
+            self._pack_entries = {mesh: (pack, index) for pack in self._packs
+                                  for index, mesh in enumerate(pack.meshes)}
+
+        compiling = set()
+        if not self.wait_for_programs:
+            compiling = {pack for pack in self._packs if not pack.material.program_ready}
+
+        queue = []
+        selections = {}
+        for mesh in meshes:
+            entry = self._pack_entries.get(mesh)
+            if entry is None or entry[0] in compiling:
+                queue.append(mesh)
+                continue
+            pack, index = entry
+            selection = selections.get(pack)
+            if selection is None:
+                selection = selections[pack] = []
+                queue.append(pack)
+            selection.append(index)
+
+        for pack, selection in selections.items():
+            pack.select(selection)
+        return queue
+
+    def _release_packs(self):
+        """Delete the packs of the last scene."""
+        for pack in self._packs:
+            pack.release()
+        self._packs = []
+        self._pack_entries = None
+        self._packed_scene = None
+
+    def _cull(self, scene, camera):
+        """Get the visible meshes of a scene whose bounding spheres are at least partly in view.
+
+        The bounds of all the meshes are tested together in one vectorized pass, and the world
+        matrices are read straight from the scene's transform store when it has one.
+        Meshes without vertex positions are never culled.
+        """
+        meshes, centers, radii, store_indices = self._get_cull_bounds(scene)
+        if not meshes:
+            return []
+
+        if store_indices is not None:
+            world_matrices = scene.transform_store.world_matrices[store_indices]
+        else:
+            world_matrices = np.array([mesh.world_matrix for mesh in meshes])
+
+        centers, radii = transform_spheres(world_matrices, centers, radii)
+        inside = spheres_in_frustum(frustum_planes(camera.view_projection_matrix), 
+                                    centers, radii)
+        visible = np.fromiter((mesh._visible for mesh in meshes), dtype=bool, count=len(meshes))
+        self._culled_count = int(np.count_nonzero(visible & ~inside))
+        return list(compress(meshes, visible & inside))
+
+    def _get_cull_bounds(self, scene):
+        """Gather the local bounding spheres of every mesh in a scene into arrays.
+
+        Returns:
+            tuple: The meshes of the scene, the (N, 3) array of sphere centers, the (N,) array
+                of radii, and the index of each mesh in the scene's transform store, or None if
+                the scene does not have one.
+        """
+        key = self._cull_key
+        if (key is not None and key[0] == (scene, scene.tree_version)
+                and all(geometry.version == version for geometry, version in key[1])):
+            meshes, centers, radii, store_indices, instanced = self._cull_bounds
+            # the bounds of instanced meshes change with their instances
+            for row, mesh in instanced:
+                centers[row], radii[row] = _sphere_of(mesh)
+            return meshes, centers, radii, store_indices
+
+        meshes = scene.mesh_list
+        centers = np.zeros((len(meshes), 3))
+        radii = np.zeros(len(meshes))
+        for row, mesh in enumerate(meshes):
+            centers[row], radii[row] = _sphere_of(mesh)
+        store = scene.transform_store
+        store_indices = None
+        if store is not None:
+            store_indices = np.array([store.index_of(mesh) for mesh in meshes], dtype=np.intp)
+        instanced = [(row, mesh) for row, mesh in enumerate(meshes) 
+                     if isinstance(mesh, InstancedMesh)]
+
+        geometries = {id(mesh.geometry): mesh.geometry for mesh in meshes}.values()
+        self._cull_key = ((scene, scene.tree_version),
+                          [(geometry, geometry.version) for geometry in geometries])
+        self._cull_bounds = (meshes, centers, radii, store_indices, instanced)
+        return meshes, centers, radii, store_indices
+
+    def _sort(self, meshes, view_matrix):
+        """Order meshes into a render queue that keeps state changes between draw calls low.
+
+        Opaque meshes are grouped by program, material and textures and drawn front-to-back
+        within each group so hidden fragments fail the depth test early. Transparent meshes
+        are drawn afterward from back-to-front so they blend correctly with what is behind them.
+        """
+        if len(meshes) < 2:
+            return meshes
+
+        # the distance in front of the camera of each mesh's origin
+        positions = np.array([mesh.world_matrix[:3, 3] for mesh in meshes])
+        depths = -(positions @ view_matrix[2, :3] + view_matrix[2, 3])
+
+        keys = []
+        for mesh, depth in zip(meshes, depths.tolist()):
+            material = mesh.material
+            if material.get_setting("transparent"):
+                keys.append((1, -depth, material.program_ref, id(material), material.texture_refs))
+            else:
+                keys.append((0, material.program_ref, id(material), material.texture_refs, depth))
+        order = sorted(range(len(meshes)), key=keys.__getitem__)
+        return [meshes[index] for index in order]
+
+
+def _sphere_of(mesh):
+    """Get the local bounding sphere of a mesh, or an infinite one without vertex positions."""
+    sphere = mesh.bounding_sphere
+    if sphere is None:
+        return (0, 0, 0), np.inf
+    return sphere
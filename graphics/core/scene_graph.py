@@ -1,7 +1,10 @@
 import numpy as np
 import OpenGL.GL as GL
 
+from graphics.core.bounds import transform_boxes
 from graphics.core.matrix import Matrix
+from graphics.core.openGL import Attribute, GLState
+from graphics.core.transform_store import TransformStore
 from graphics.geometries import Geometry
 from graphics.materials import Material
 
@@ -11,16 +14,44 @@ class Object3D:
     It stores a list of references to child objects and a parent object with 
     add and remove functions to update parent and child references when needed.
     In addition, each object stores transform data as a core.Matrix object and 
-    can calculate its world transformation with the getWorldMatrix() method.
+    can calculate its world transformation with the world_matrix property.
+    The world transformation is cached and only recalculated after the transform
+    of this object or one of its ancestors changes.
 
     Attributes:
         parent (Object3D): The parent object of this object in the scene graph.
     """
+
+    # preallocated buffers so transform operations do not allocate new arrays
+    _scratch_matrix = np.empty((4, 4))
+    _scratch_product = np.empty((4, 4))
+    _scratch_row_factors = np.ones(4)
+    _scratch_column_factors = np.ones((4, 1))
+    _scratch_direction = np.zeros(4)
+    _scratch_column = np.empty(4)
+
     def __init__(self):
         self._transform = Matrix.identity()
         self._parent = None
         self._children = []
 
+        # cached world transformation and whether it needs recalculating
+        self._world_matrix = Matrix.identity()
+        self._world_dirty = True
+        self._world_version = 0
+
+        # cached traversal of this subtree, rebuilt after nodes are added or removed
+        self._descendants = None
+        self._meshes = None
+        self._tree_version = 0
+
+        # the scene-wide transform store holding this node's transform, if any
+        self._store = None
+        self._store_index = None
+
+        # the spatial index that is told when this node moves, if any
+        self._move_listener = None
+
     @property
     def parent(self):
         return self._parent
@@ -36,24 +67,70 @@ class Object3D:
             RuntimeError: The provided node is not an instance of Object3D
             RuntimeError: This node already has a parent and the provided node is not None
         """
-        if not isinstance(node, Object3D):
+        if node is not None and not isinstance(node, Object3D):
             raise RuntimeError("Parent node must be an instance of Object3D.")
         if self._parent is not None and node is not None:
             raise RuntimeError("Cannot add a child of another node.")
         self._parent = node
+        self._mark_world_dirty()
 
     @property
     def world_matrix(self):
         """Calculate the transformation of this object relative to the root of the scene graph (a.k.a., the world).
 
+        The result is cached until this object or one of its ancestors is transformed or moved
+        to a different parent, so reading it repeatedly does no extra matrix math.
+
+        The matrix is the cache itself rather than a copy, so it must not be modified. In a 
+        scene with a transform store it is a view into the store's arrays, which are replaced
+        when the store grows, so read the property again after adding nodes instead of keeping
+        the matrix. Copy it to keep its current value.
+
         Returns:
             NDArray: A matrix representing this object's world transformation.
         """
-        if self._parent is None:
-            return self._transform
-        else:
-            # recursion!
-            return self._parent.world_matrix @ self._transform
+        if self._store is not None:
+            return self._store.world_matrix(self._store_index)
+        if self._world_dirty:
+            if self._parent is None:
+                self._world_matrix[...] = self._transform
+            else:
+                # recursion!
+                np.dot(self._parent.world_matrix, self._transform, 
+                       out=self._world_matrix)
+            self._world_dirty = False
+            self._world_version += 1
+        return self._world_matrix
+
+    @property
+    def world_version(self):
+        """A counter that increases whenever the world matrix of this object is recalculated.
+
+        Comparing it with a previously read value is a cheap way to tell whether
+        anything derived from the world matrix must be updated.
+        """
+        if self._store is not None:
+            self._store.update()
+            return self._store.version
+        if self._world_dirty:
+            self.world_matrix
+        return self._world_version
+
+    def _mark_world_dirty(self):
+        """Flag the cached world matrix of this object and all its descendants for recalculation."""
+        if self._store is not None:
+            self._store.invalidate()
+            return
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            # a dirty node always has a dirty subtree, so there is no need to go further
+            if node._world_dirty:
+                continue
+            node._world_dirty = True
+            if node._move_listener is not None:
+                node._move_listener.mark_moved(node)
+            stack.extend(node._children)
 
     @property
     def descendant_list(self):
@@ -62,11 +139,63 @@ class Object3D:
         Returns:
             List: All descendants of this node including itself.
         """
-        descendants = [self]
-        for c in self._children:
-            # more recursion!
-            descendants += c.descendant_list
-        return descendants
+        return list(self._get_descendants())
+
+    @property
+    def mesh_list(self):
+        """Get a single list containing all Mesh objects in this subtree, visible or not.
+
+        Returns:
+            List: The descendant meshes of this node (including itself) in scene graph order.
+        """
+        return list(self._get_meshes())
+
+    @property
+    def tree_version(self):
+        """A counter that increases whenever a node is added to or removed from this subtree."""
+        return self._tree_version
+
+    def iter_visible_meshes(self):
+        """Iterate over the visible Mesh objects in this subtree in scene graph order.
+
+        Yields:
+            Mesh: Each descendant mesh (including this node) whose visible flag is set.
+        """
+        for mesh in self._get_meshes():
+            if mesh._visible:
+                yield mesh
+
+    def _get_descendants(self):
+        """Return the cached depth-first list of this subtree, flattening it first if needed."""
+        if self._descendants is None:
+            descendants = []
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                # reuse the flattened list of any subtree that is still valid
+                if node is not self and node._descendants is not None:
+                    descendants.extend(node._descendants)
+                    continue
+                descendants.append(node)
+                stack.extend(reversed(node._children))
+            self._descendants = descendants
+        return self._descendants
+
+    def _get_meshes(self):
+        """Return the cached list of Mesh objects in this subtree, filtering it first if needed."""
+        if self._meshes is None:
+            self._meshes = [node for node in self._get_descendants() 
+                            if isinstance(node, Mesh)]
+        return self._meshes
+
+    def _mark_tree_changed(self):
+        """Discard the cached traversals of this node and all its ancestors."""
+        node = self
+        while node is not None:
+            node._descendants = None
+            node._meshes = None
+            node._tree_version += 1
+            node = node._parent
 
     @property
     def position(self):
@@ -89,9 +218,8 @@ class Object3D:
         if not isinstance(coords, (list,tuple)) or len(coords) != 3:
             raise ValueError("Object3D position must be in the form (x,y,z).")
 
-        self._transform.itemset((0,3), coords[0]) # numpy.ndarray.itemset
-        self._transform.itemset((1,3), coords[1]) # inserts the scalar value into the array at the given index     
-        self._transform.itemset((2,3), coords[2])
+        self._transform[0:3, 3] = coords # inserts the values into the last column of the array
+        self._mark_world_dirty()
 
     @property
     def world_position(self):
@@ -100,9 +228,10 @@ class Object3D:
         Returns:
             list: This object's coordinates as [x,y,z].
         """
-        return [self.world_matrix.item((0,3)),
-                self.world_matrix.item((1,3)),
-                self.world_matrix.item((2,3))]
+        world_matrix = self.world_matrix
+        return [world_matrix.item((0,3)),
+                world_matrix.item((1,3)),
+                world_matrix.item((2,3))]
 
     def add(self, child: 'Object3D'):
         """Adds an object as the child to this object in the scene graph.
@@ -115,6 +244,12 @@ class Object3D:
         """
         child.parent = self
         self._children.append(child)
+        self._mark_tree_changed()
+
+        # move the new subtree into this node's transform store, parents first
+        if self._store is not None:
+            for node in child._get_descendants():
+                self._store.register(node)
 
     def remove(self, child):
         """Remove a child object from this object.
@@ -123,7 +258,12 @@ class Object3D:
             child (Object3D): The object to remove from this object's list of children.
         """
         self._children.remove(child)
+        store = child._store
+        if store is not None:
+            for node in child._get_descendants():
+                store.unregister(node)
         child.parent = None
+        self._mark_tree_changed()
 
     def apply_matrix(self, matrix, local=True):
         """Apply a geometric transformation to this object.
@@ -132,22 +272,41 @@ class Object3D:
             matrix (NDArray): The transformation matrix to apply.
             localCoord (bool, optional): Whether the transformation is local or not. Defaults to True.
         """
+        # multiply into a scratch buffer, then copy back in place
+        # since the transform may be a view into a transform store
+        product = Object3D._scratch_product
         if local:
-            self._transform = self._transform @ matrix
+            np.dot(self._transform, matrix, out=product)
         else:
-            self._transform = matrix @ self._transform
+            np.dot(matrix, self._transform, out=product)
+        self._transform[...] = product
+        self._mark_world_dirty()
 
     def translate(self, x, y, z, local=True):
         """Calculate and apply a translation to this object.
 
+        A local translation only changes the last column of the transform,
+        so that column is updated directly without building a translation matrix.
+
         Args:
             x (float): The number of units to translate along the x-axis.
             y (float): The number of units to translate along the y-axis.
             z (float): The number of units to translate along the z-axis.
             localCoord (bool, optional): Whether the transformation is local or not. Defaults to True.
         """
-        m = Matrix.translation(x,y,z)
-        self.apply_matrix(m, local)
+        if local:
+            # the last column moves by the transform applied to the direction (x, y, z, 0)
+            direction = Object3D._scratch_direction
+            direction[0] = x
+            direction[1] = y
+            direction[2] = z
+            column = Object3D._scratch_column
+            np.dot(self._transform, direction, out=column)
+            self._transform[:, 3] += column
+            self._mark_world_dirty()
+        else:
+            m = Matrix.translation(x, y, z, out=Object3D._scratch_matrix)
+            self.apply_matrix(m, local)
     
     def rotate_x(self, angle, local=True):
         """Calculate and apply a rotation around the x-axis of this object.
@@ -156,7 +315,7 @@ class Object3D:
             angle (float): The number of radians to rotate around the x-axis.
             localCoord (bool, optional): Whether the tranformation is local or not. Defaults to True.
         """
-        m = Matrix.rotation_x(angle)
+        m = Matrix.rotation_x(angle, out=Object3D._scratch_matrix)
         self.apply_matrix(m, local)
     
     def rotate_y(self, angle, local=True):
@@ -166,7 +325,7 @@ class Object3D:
             angle (float): The number of radians to rotate around the y-axis.
             localCoord (bool, optional): Whether the tranformation is local or not. Defaults to True.
         """
-        m = Matrix.rotation_y(angle)
+        m = Matrix.rotation_y(angle, out=Object3D._scratch_matrix)
         self.apply_matrix(m, local)
     
     def rotate_z(self, angle, local=True):
@@ -176,7 +335,7 @@ class Object3D:
             angle (float): The number of radians to rotate around the z-axis.
             localCoord (bool, optional): Whether the tranformation is local or not. Defaults to True.
         """
-        m = Matrix.rotation_z(angle)
+        m = Matrix.rotation_z(angle, out=Object3D._scratch_matrix)
         self.apply_matrix(m, local)
     
     def scale_uniform(self, s, local=True):
@@ -186,17 +345,40 @@ class Object3D:
             s (float): The magnitude by which to scale.
             localCoord (bool, optional): Whether the transformation is local or not. Defaults to True.
         """
-        m = Matrix.scale(s, s, s)
-        self.apply_matrix(m, local)
+        if local:
+            # scale the first three columns
+            factors = Object3D._scratch_row_factors
+        else:
+            # scale the first three rows
+            factors = Object3D._scratch_column_factors
+        factors[:3] = s
+        np.multiply(self._transform, factors, out=self._transform)
+        self._mark_world_dirty()
 
 
 class Scene(Object3D):
     """Represents the root node of the scene graph tree structure.
     
-    This class is entirely semantic and provides no additional functionality.
+    A scene can optionally keep the transforms of all its descendants in a single
+    TransformStore so their world matrices are calculated in batches. This pays off
+    for scenes with many thousands of nodes.
+
+    Attributes:
+        spatial_index (SceneBVH): An optional spatial index over the meshes of this scene
+            which the renderer uses for frustum culling. Defaults to None.
     """
-    def __init__(self):
+    def __init__(self, use_transform_store=False):
         super().__init__()
+        if use_transform_store:
+            TransformStore().register(self)
+
+        # an optional spatial index, such as a SceneBVH, used for culling and queries
+        self.spatial_index = None
+
+    @property
+    def transform_store(self):
+        """The TransformStore shared by this scene's nodes, or None if it does not use one."""
+        return self._store
 
     @Object3D.parent.setter
     def parent(self, node):
@@ -222,26 +404,105 @@ class Camera(Object3D):
     this class also stores a view matrix as the inverse of the camera's transform matrix.
     The camera defines the position and orientation of the viewer, so it also stores the projection matrix.
 
+    The view matrix is cached until the camera or one of its ancestors moves, and the projection matrix 
+    is cached until one of its parameters changes. The camera's world transformation must be made of 
+    rotations, translations and uniform scaling so its inverse can be calculated in closed form.
+
     Attributes:
         projection_matrix (NDArray): The projection matrix for the scene.
         view_matrix (NDArray): The transformation matrix for the camera.
+        view_projection_matrix (NDArray): The projection matrix multiplied by the view matrix.
     """
     def __init__(self, angle_of_view=60, aspect_ratio=1, near=0.1, far=1000):
         super().__init__()
-        self._projection_matrix = Matrix.perspective(
-            angle_of_view, aspect_ratio, near, far
-        )
+        self._angle_of_view = angle_of_view
+        self._aspect_ratio = aspect_ratio
+        self._near = near
+        self._far = far
+
+        self._projection_matrix = Matrix.identity()
+        self._projection_dirty = True
+        self._projection_version = 0
+
+        # the world version and (view, projection) versions each matrix was calculated from
         self._view_matrix = Matrix.identity()
+        self._view_source = None
+        self._view_projection_matrix = Matrix.identity()
+        self._view_projection_source = None
+
+    @property
+    def angle_of_view(self):
+        return self._angle_of_view
+
+    @angle_of_view.setter
+    def angle_of_view(self, angle):
+        self._angle_of_view = angle
+        self._projection_dirty = True
+
+    @property
+    def aspect_ratio(self):
+        return self._aspect_ratio
+
+    @aspect_ratio.setter
+    def aspect_ratio(self, ratio):
+        self._aspect_ratio = ratio
+        self._projection_dirty = True
+
+    @property
+    def near(self):
+        return self._near
+
+    @near.setter
+    def near(self, distance):
+        self._near = distance
+        self._projection_dirty = True
+
+    @property
+    def far(self):
+        return self._far
+
+    @far.setter
+    def far(self, distance):
+        self._far = distance
+        self._projection_dirty = True
 
     @property
     def projection_matrix(self):
+        if self._projection_dirty:
+            Matrix.perspective(self._angle_of_view, self._aspect_ratio,
+                               self._near, self._far, 
+                               out=self._projection_matrix)
+            self._projection_dirty = False
+            self._projection_version += 1
         return self._projection_matrix
 
+    @property
+    def projection_version(self):
+        """A counter that increases whenever the projection matrix changes."""
+        if self._projection_dirty:
+            self.projection_matrix
+        return self._projection_version
+
     @property
     def view_matrix(self):
-        self._view_matrix = np.linalg.inv(self.world_matrix)
+        world_matrix = self.world_matrix
+        version = self.world_version
+        if version != self._view_source:
+            Matrix.rigid_inverse(world_matrix, out=self._view_matrix)
+            self._view_source = version
         return self._view_matrix
 
+    @property
+    def view_projection_matrix(self):
+        view_matrix = self.view_matrix
+        projection_matrix = self.projection_matrix
+        source = (self._view_source, self._projection_version)
+        if source != self._view_projection_source:
+            np.dot(projection_matrix, view_matrix, 
+                   out=self._view_projection_matrix)
+            self._view_projection_source = source
+        return self._view_projection_matrix
+
 
 class Mesh(Object3D):
     """Represents a visible object in the scene.
@@ -267,16 +528,18 @@ class Mesh(Object3D):
 
         self._visible = True
 
-        # Set up associations between attributes in the geometry 
-        # and the shader program in material.
-        self._vao_ref = GL.glGenVertexArrays(1)
-        GL.glBindVertexArray(self._vao_ref)
+        # the vertex array is created once the material's program has been compiled
+        self._vao_ref = None
+        self._vao_program = None
+        self._vao_layout = None
 
-        for variable, attribute in geometry.attributes.items():
-            attribute.associate_variable(material.program_ref, variable)
+    @property
+    def geometry(self):
+        return self._geometry
 
-        # unbind this vertex array object
-        GL.glBindVertexArray(0)
+    @property
+    def material(self):
+        return self._material
 
     @property
     def visible(self):
@@ -286,20 +549,292 @@ class Mesh(Object3D):
     def visible(self, value):
         self._visible = bool(value)
 
-    def render(self, view_matrix, projection_matrix):
-        GL.glUseProgram(self._material.program_ref)
-            
+    @property
+    def bounding_box(self):
+        """The axis-aligned bounding box of this mesh in its local space.
+
+        Returns:
+            tuple: The (min, max) corners as numpy arrays, or None without vertex positions.
+        """
+        return self._geometry.bounding_box
+
+    @property
+    def bounding_sphere(self):
+        """A sphere containing this mesh in its local space.
+
+        Returns:
+            tuple: The center as a numpy array and the radius, or None without vertex positions.
+        """
+        return self._geometry.bounding_sphere
+
+    @property
+    def vao_ref(self):
+        if self._vertex_array_outdated():
+            self._create_vertex_array()
+        return self._vao_ref
+
+    def release(self):
+        """Delete the vertex array of this mesh, leaving its geometry and material as they are."""
+        if self._vao_ref is not None:
+            GL.glDeleteVertexArrays(1, [self._vao_ref])
+            self._vao_ref = None
+            self._vao_program = None
+            self._vao_layout = None
+
+    def _vertex_array_outdated(self):
+        """Check whether the program or the geometry's buffers changed since the VAO was set up."""
+        return (self._vao_program != self._material.program_ref
+                or self._vao_layout != self._geometry.layout_version)
+
+    def _create_vertex_array(self):
+        """Set up associations between attributes in the geometry and the material's shader program.
+
+        This is done when the mesh is first drawn and again whenever the material switches
+        to a different program variant, since attribute locations can differ between programs,
+        or the geometry's buffers change, such as when its attributes are interleaved.
+        """
+        if self._vao_ref is not None:
+            GL.glDeleteVertexArrays(1, [self._vao_ref])
+        self._vao_program = self._material.program_ref
+        self._vao_layout = self._geometry.layout_version
+        self._vao_ref = GL.glGenVertexArrays(1)
         GL.glBindVertexArray(self._vao_ref)
 
-        # update matrix uniforms
-        self._material.set_uniform("modelMatrix", self.world_matrix)
-        self._material.set_uniform("viewMatrix", view_matrix)
-        self._material.set_uniform("projectionMatrix", projection_matrix)
+        for variable, attribute in self._geometry.attributes.items():
+            attribute.associate_variable(self._vao_program, variable)
+
+        # the vertex array also stores which buffer holds the vertex indices
+        if self._geometry.index_buffer is not None:
+            self._geometry.index_buffer.bind()
+
+        # unbind this vertex array object
+        GL.glBindVertexArray(0)
+
+    def render(self, view_matrix, projection_matrix, state=None, camera=None):
+        """Draw this mesh with the given camera matrices.
+
+        Args:
+            view_matrix (NDArray): The view matrix of the camera, unless the material reads it 
+                from the renderer's frame uniform buffer.
+            projection_matrix (NDArray): The projection matrix of the camera, unless the material
+                reads it from the renderer's frame uniform buffer.
+            state (core.openGL.GLState, optional): The state tracker shared by all draws in a frame,
+                which skips binds and settings left in place by the previous draw and leaves
+                this mesh's VAO bound. Defaults to None, which sets everything and unbinds the
+                VAO afterward.
+            camera (Camera, optional): The camera the matrices come from, whose versions tell
+                whether the matrices changed since they were last uploaded to the material.
+                Defaults to None, which uploads them every time.
+        """
+        material = self._material
+        standalone = state is None
+        if standalone:
+            state = GLState()
+        if self._vertex_array_outdated():
+            # the new vertex array may reuse a deleted name the state tracker still has bound
+            self._create_vertex_array()
+            state.reset()
+
+        state.use_program(material.program_ref)
+        state.bind_vertex_array(self._vao_ref)
+
+        # update matrix uniforms, identifying each matrix so unchanged ones are not uploaded
+        world_matrix = self.world_matrix
+        material.set_uniform("modelMatrix", world_matrix, source=(self, self.world_version))
+        if not material.uses_frame_uniforms:
+            if camera is not None:
+                view_source = (camera, camera.world_version)
+                projection_source = (camera, camera.projection_version)
+            else:
+                view_source = projection_source = None
+            material.set_uniform("viewMatrix", view_matrix, source=view_source)
+            material.set_uniform("projectionMatrix", projection_matrix, source=projection_source)
 
         # update the stored data and settings before drawing
-        self._material.upload_data()
-        self._material.update_render_settings()
-        GL.glDrawArrays(self._material.get_setting("drawStyle"), 0, 
-                     self._geometry.vertex_count)
+        material.upload_data(state)
+        material.apply_render_settings(state)
+        self._draw(material.get_setting("drawStyle"))
+
+        if standalone:
+            GL.glBindVertexArray(0)
+
+    def _draw(self, draw_style):
+        """Issue the draw call for the vertices of this mesh."""
+        geometry = self._geometry
+        if geometry.index_buffer is not None:
+            GL.glDrawElements(draw_style, geometry.draw_count, GL.GL_UNSIGNED_INT, None)
+        else:
+            GL.glDrawArrays(draw_style, 0, geometry.vertex_count)
+
+
+class InstancedMesh(Mesh):
+    """Draws many copies of one geometry and material with a single draw call.
 
-        GL.glBindVertexArray(0)
\ No newline at end of file
+    Each instance has its own transformation relative to this mesh and, optionally, its own
+    color which multiplies the color of the material. The transformations and colors are
+    stored in vertex buffers read once per instance, so moving every instance is a single
+    buffer upload instead of one uniform upload and draw call per copy.
+
+    The built-in materials switch to their instanced shader variant through their useInstancing
+    and useInstanceColors settings, which are turned on here. Other materials need a vertex shader
+    that reads the mat4 instanceMatrix attribute, such as by prepending core.openGL.MODEL_MATRIX_SOURCE
+    with USE_INSTANCING defined, and the vec3 instanceColor attribute for colors.
+    The material should not be shared with ordinary meshes, which have no instance attributes.
+
+    Attributes:
+        instance_count (int): The number of copies drawn.
+        instance_matrices (NDArray): The (N, 4, 4) transformations of the instances.
+        instance_colors (NDArray): The (N, 3) colors of the instances, or None.
+    """
+    def __init__(self, geometry, material, matrices, colors=None):
+        """Create the instance buffers and enable instancing in the material.
+
+        Args:
+            geometry (geometries.Geometry): The geometry drawn for every instance.
+            material (materials.Material): The material drawn for every instance.
+            matrices (Iterable): The 4x4 transformation of each instance relative to this mesh.
+            colors (Iterable, optional): The RGB color of each instance. Defaults to None.
+        """
+        super().__init__(geometry, material)
+
+        matrices = self._check_matrices(matrices)
+        # instances are expected to move, so their buffers are updated in place
+        self._instance_attributes = {
+            "instanceMatrix": Attribute("mat4", matrices, divisor=1, usage="dynamic")
+        }
+        if colors is not None:
+            colors = self._check_colors(colors, len(matrices))
+            self._instance_attributes["instanceColor"] = Attribute("vec3", colors, divisor=1, 
+                                                                   usage="dynamic")
+
+        # bounds around all the instances, calculated when first requested
+        self._bounding_box = None
+        self._bounding_sphere = None
+
+        properties = {"useInstancing": True, "useInstanceColors": colors is not None}
+        material.set_properties({name: value for name, value in properties.items()
+                                 if material.get_setting(name) is not None})
+
+    @property
+    def instance_count(self):
+        return len(self._instance_attributes["instanceMatrix"].data)
+
+    @property
+    def instance_matrices(self):
+        # the attribute stores each matrix one column at a time, so this is a transposed view
+        return self._instance_attributes["instanceMatrix"].data.reshape(-1, 4, 4).transpose(0, 2, 1)
+
+    @property
+    def instance_colors(self):
+        attribute = self._instance_attributes.get("instanceColor")
+        return None if attribute is None else attribute.data
+
+    def set_instance_matrices(self, matrices):
+        """Replace the transformations of all the instances with a single buffer upload.
+
+        The number of instances may change unless the instances have colors.
+
+        Args:
+            matrices (Iterable): The 4x4 transformation of each instance relative to this mesh.
+
+        Raises:
+            ValueError: when the number of matrices does not match the number of colors
+        """
+        matrices = self._check_matrices(matrices)
+        colors = self.instance_colors
+        if colors is not None and len(colors) != len(matrices):
+            raise ValueError(f"Expecting {len(colors)} instance matrices to match the instance "
+                             f"colors but got {len(matrices)}.")
+        attribute = self._instance_attributes["instanceMatrix"]
+        attribute.data = matrices
+        attribute.upload_data()
+
+        self._bounding_box = None
+        self._bounding_sphere = None
+        if self._move_listener is not None:
+            self._move_listener.mark_bounds_changed(self)
+
+    def set_instance_colors(self, colors):
+        """Replace the colors of all the instances with a single buffer upload.
+
+        Args:
+            colors (Iterable): The RGB color of each instance.
+
+        Raises:
+            RuntimeError: when the instances were created without colors
+            ValueError: when the number of colors does not match the number of instances
+        """
+        attribute = self._instance_attributes.get("instanceColor")
+        if attribute is None:
+            raise RuntimeError("Instance colors must be given when the InstancedMesh is created.")
+        attribute.data = self._check_colors(colors, self.instance_count)
+        attribute.upload_data()
+
+    @property
+    def bounding_box(self):
+        """The axis-aligned bounding box of all the instances in the local space of this mesh."""
+        if self._bounding_box is None:
+            self._calculate_bounds()
+        return self._bounding_box
+
+    @property
+    def bounding_sphere(self):
+        """A sphere containing all the instances in the local space of this mesh."""
+        if self._bounding_sphere is None:
+            self._calculate_bounds()
+        return self._bounding_sphere
+
+    def _calculate_bounds(self):
+        """Calculate and store the bounds around the transformed bounds of every instance."""
+        box = self._geometry.bounding_box
+        matrices = self.instance_matrices
+        if box is None or len(matrices) == 0:
+            return
+        count = len(matrices)
+        mins, maxs = transform_boxes(matrices, np.broadcast_to(box[0], (count, 3)),
+                                     np.broadcast_to(box[1], (count, 3)))
+        low = mins.min(axis=0)
+        high = maxs.max(axis=0)
+        self._bounding_box = (low, high)
+
+        # each instance's sphere is scaled by the longest axis of its transformation
+        center, radius = self._geometry.bounding_sphere
+        centers = matrices[:, :3, :3] @ center + matrices[:, :3, 3]
+        radii = radius * np.sqrt((matrices[:, :3, :3] ** 2).sum(axis=1).max(axis=1))
+        middle = (low + high) / 2
+        reach = np.sqrt(((centers - middle) ** 2).sum(axis=1)) + radii
+        self._bounding_sphere = (middle, float(reach.max()))
+
+    def _create_vertex_array(self):
+        """Associate the instance attributes along with the geometry's attributes."""
+        super()._create_vertex_array()
+        for variable, attribute in self._instance_attributes.items():
+            attribute.associate_variable(self._vao_program, variable, self._vao_ref)
+        GL.glBindVertexArray(0)
+
+    def _draw(self, draw_style):
+        """Issue a single draw call for the vertices of every instance."""
+        geometry = self._geometry
+        if geometry.index_buffer is not None:
+            GL.glDrawElementsInstanced(draw_style, geometry.draw_count, GL.GL_UNSIGNED_INT, None,
+                                       self.instance_count)
+        else:
+            GL.glDrawArraysInstanced(draw_style, 0, geometry.vertex_count, self.instance_count)
+
+    @staticmethod
+    def _check_matrices(matrices):
+        """Convert instance transformations to an (N, 4, 4) array or raise a ValueError."""
+        matrices = np.array(matrices, dtype=float)
+        if matrices.ndim != 3 or matrices.shape[1:] != (4, 4):
+            raise ValueError(f"Expecting an (N, 4, 4) array of instance matrices "
+                             f"but got shape {matrices.shape} instead.")
+        return matrices
+
+    @staticmethod
+    def _check_colors(colors, count):
+        """Convert instance colors to an (N, 3) array or raise a ValueError."""
+        colors = np.array(colors, dtype=float)
+        if colors.shape != (count, 3):
+            raise ValueError(f"Expecting a ({count}, 3) array of instance colors "
+                             f"but got shape {colors.shape} instead.")
+        return colors
\ No newline at end of file
@@ -0,0 +1,191 @@
+import numpy as np
+
+from graphics.core.matrix import Matrix
+
+class TransformStore:
+    """Stores the transforms of many scene graph nodes in contiguous arrays.
+
+    Local transforms live in a single (N, 4, 4) array alongside an array of parent indices,
+    and each registered node only keeps its index into the store. World matrices for every node
+    are recalculated together with one batched matrix multiplication per level of the tree
+    instead of one multiplication per node, which keeps very large scenes manageable.
+
+    Nodes are normally registered by attaching them to a Scene created with a transform store.
+    For vectorized animation, write into `local_matrices` at the indices given by `index_of`
+    and then call `invalidate` so the world matrices are recalculated on the next read.
+    """
+
+    def __init__(self, capacity=64):
+        self._local = np.zeros((capacity, 4, 4))
+        self._world = np.zeros((capacity, 4, 4))
+        self._parents = np.full(capacity, -1, dtype=np.intp)
+        self._used = np.zeros(capacity, dtype=bool)
+        self._nodes = [None] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+
+        # whether the world matrices or the order of levels must be recalculated
+        self._dirty = False
+        self._levels_dirty = False
+        self._levels = []
+
+        self._version = 0
+
+    @property
+    def local_matrices(self):
+        """The (N, 4, 4) array of local transforms, including unused slots.
+
+        The array is replaced by a larger one when registering a node fills the store,
+        so read the property again after registering nodes instead of keeping the array.
+        """
+        return self._local
+
+    @property
+    def world_matrices(self):
+        """The (N, 4, 4) array of world transforms after bringing them up to date.
+
+        Like local_matrices, the array is replaced when the store grows.
+        """
+        self.update()
+        return self._world
+
+    @property
+    def version(self):
+        """A counter that increases every time the world matrices are recalculated."""
+        return self._version
+
+    def __len__(self):
+        return len(self._nodes) - len(self._free)
+
+    def index_of(self, node):
+        """Get the index of a registered node in the transform arrays."""
+        if node._store is not self:
+            raise ValueError("The node is not registered with this transform store.")
+        return node._store_index
+
+    def register(self, node):
+        """Move the transform of a node into the store.
+
+        The parent of the node must already be registered, or the node is treated as a root.
+        Afterwards, the node's transform is a view into `local_matrices`.
+        """
+        if node._store is not None:
+            raise RuntimeError("The node is already registered with a transform store.")
+        if not self._free:
+            self._grow()
+
+        index = self._free.pop()
+        self._local[index] = node._transform
+        parent = node.parent
+        if parent is not None and parent._store is self:
+            self._parents[index] = parent._store_index
+        else:
+            self._parents[index] = -1
+        self._used[index] = True
+        self._nodes[index] = node
+
+        node._transform = self._local[index]
+        node._world_matrix = None
+        node._store = self
+        node._store_index = index
+
+        # keep the world version of the node increasing while it is in the store
+        self._version = max(self._version, node._world_version)
+
+        self._levels_dirty = True
+        self._dirty = True
+
+    def unregister(self, node):
+        """Give a node its own copy of its transform and release its slot in the store."""
+        index = self.index_of(node)
+
+        node._transform = self._local[index].copy()
+        node._world_matrix = Matrix.identity()
+        node._world_dirty = True
+        node._world_version = self._version
+        node._store = None
+        node._store_index = None
+
+        self._parents[index] = -1
+        self._used[index] = False
+        self._nodes[index] = None
+        self._free.append(index)
+
+        self._levels_dirty = True
+        self._dirty = True
+
+    def invalidate(self):
+        """Flag the world matrices for recalculation on the next read."""
+        self._dirty = True
+
+    def world_matrix(self, index):
+        """Get the world matrix at the given index after bringing all world matrices up to date.
+
+        The matrix is a view into world_matrices, so it is updated in place until the store
+        grows, after which it is no longer part of the store and must be fetched again.
+        """
+        if self._dirty:
+            self.update()
+        return self._world[index]
+
+    def update(self):
+        """Recalculate all world matrices, one level of the tree at a time."""
+        if not self._dirty:
+            return
+        if self._levels_dirty:
+            self._build_levels()
+
+        local = self._local
+        world = self._world
+        roots = self._levels[0]
+        world[roots] = local[roots]
+        for indices, parents in self._levels[1:]:
+            world[indices] = np.matmul(world[parents], local[indices])
+
+        self._dirty = False
+        self._version += 1
+
+    def _build_levels(self):
+        """Group the used slots by their depth in the tree so parents come before children."""
+        used = np.flatnonzero(self._used)
+        parents = self._parents
+        depth = np.zeros(len(parents), dtype=np.intp)
+        ancestors = parents[used]
+        while True:
+            has_ancestor = ancestors >= 0
+            if not has_ancestor.any():
+                break
+            depth[used[has_ancestor]] += 1
+            ancestors = np.where(has_ancestor, parents[ancestors], -1)
+
+        used_depth = depth[used]
+        order = used[np.argsort(used_depth, kind="stable")]
+        counts = np.bincount(used_depth) if len(used) else np.zeros(0, dtype=np.intp)
+        split = np.split(order, np.cumsum(counts)[:-1])
+
+        self._levels = [split[0]]
+        for indices in split[1:]:
+            self._levels.append((indices, parents[indices]))
+        self._levels_dirty = False
+
+    def _grow(self):
+        """Double the capacity of the store and point registered nodes at the new arrays."""
+        old_capacity = len(self._nodes)
+        capacity = old_capacity * 2
+
+        local = np.zeros((capacity, 4, 4))
+        local[:old_capacity] = self._local
+        world = np.zeros((capacity, 4, 4))
+        world[:old_capacity] = self._world
+        parents = np.full(capacity, -1, dtype=np.intp)
+        parents[:old_capacity] = self._parents
+        used = np.zeros(capacity, dtype=bool)
+        used[:old_capacity] = self._used
+
+        self._local, self._world = local, world
+        self._parents, self._used = parents, used
+        self._nodes.extend([None] * (capacity - old_capacity))
+        self._free = list(range(capacity - 1, old_capacity - 1, -1))
+
+        for index, node in enumerate(self._nodes[:old_capacity]):
+            if node is not None:
+                node._transform = self._local[index]
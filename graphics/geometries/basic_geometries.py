@@ -8,6 +8,7 @@ class RectangleGeometry(Geometry):
     Position data is given in a way so that it is drawn as two triangles that share the same hypotenuse.
     The first triangle has coordinates [-w/2,-h/2,0], [w/2,-h/2,0], [w/2, h/2, 0].
     The second triangle has coordinates [-w/2,-h/2,0], [w/2,h/2,0], [-w/2,h/2, 0].
+    The four corners are stored once and the triangles refer to them by index.
 
     The width (w) and height (h) default to 1 unless otherwise specified.
     """
@@ -22,8 +23,8 @@ class RectangleGeometry(Geometry):
         P3 = ( w,  h, 0)
         C0, C1, C2, C3 = (1,1,1), (1,0,0), (0,1,0), (0,0,1)
 
-        position_data = (P0, P1, P3, P0, P3, P2)
-        color_data = (C0, C1, C3, C0, C3, C2)
+        position_data = (P0, P1, P2, P3)
+        color_data = (C0, C1, C2, C3)
 
         self.set_attribute("vertexPosition", position_data, "vec3")
         self.set_attribute("vertexColor", color_data, "vec3")
@@ -32,12 +33,28 @@ class RectangleGeometry(Geometry):
 
         # texture coordinates
         T0, T1, T2, T3 = (0,0), (1,0), (0,1), (1,1)
-        uv_data = (T0,T1,T3, T0,T3,T2)
+        uv_data = (T0, T1, T2, T3)
 
         self.set_attribute("vertexUV", uv_data, "vec2")
 
+        self.set_indices((0,1,3, 0,3,2))
+
 
 class BoxGeometry(Geometry):
+    """A box centered at (0,0,0) with a different color on each side.
+
+    Each side has its own four vertices so that colors and texture coordinates are not shared
+    between sides, and its two triangles refer to them by index.
+    """
+
+    # the box corner at each vertex, four for each side in the order (0,0), (1,0), (0,1), (1,1)
+    # of its texture coordinates
+    _CORNERS = (5,1,7,3,  # right side
+                0,4,2,6,  # left side
+                6,7,2,3,  # top side
+                0,1,4,5,  # bottom side
+                4,5,6,7,  # front side
+                1,0,3,2)  # back side
 
     def __init__(self, width=1, height=1, depth=1):
         super().__init__()
@@ -53,45 +70,43 @@ class BoxGeometry(Geometry):
         P5 = ( w, -h,  d)
         P6 = (-w,  h,  d)
         P7 = ( w,  h,  d)
+        corners = (P0, P1, P2, P3, P4, P5, P6, P7)
 
         # color vertex data for each side
-        C1 = [(1.0, 0.0, 0.0)] * 6  # six red vertices
-        C2 = [(1.0, 1.0, 0.0)] * 6  # six yellow vertices
-        C3 = [(0.0, 1.0, 0.0)] * 6  # six green vertices
-        C4 = [(0.0, 1.0, 1.0)] * 6  # six cyan vertices
-        C5 = [(0.0, 0.0, 1.0)] * 6  # six blue vertices
-        C6 = [(1.0, 0.0, 1.0)] * 6  # six magenta vertices
-
-        position_data = (P5,P1,P3, P5,P3,P7, # right side
-                         P0,P4,P6, P0,P6,P2, # left side
-                         P6,P7,P3, P6,P3,P2, # top side
-                         P0,P1,P5, P0,P5,P4, # bottom side
-                         P4,P5,P7, P4,P7,P6, # front side
-                         P1,P0,P2, P1,P2,P3) # back side
-        
-        # create a list of 36 RGB vertices
-        color_data = C1 + C2 + C3 + C4 + C5 + C6 
-        
+        C1 = [(1.0, 0.0, 0.0)] * 4  # four red vertices
+        C2 = [(1.0, 1.0, 0.0)] * 4  # four yellow vertices
+        C3 = [(0.0, 1.0, 0.0)] * 4  # four green vertices
+        C4 = [(0.0, 1.0, 1.0)] * 4  # four cyan vertices
+        C5 = [(0.0, 0.0, 1.0)] * 4  # four blue vertices
+        C6 = [(1.0, 0.0, 1.0)] * 4  # four magenta vertices
+
+        position_data = [corners[corner] for corner in self._CORNERS]
+
+        # create a list of 24 RGB vertices
+        color_data = C1 + C2 + C3 + C4 + C5 + C6
+
         self.set_attribute("vertexPosition", position_data, "vec3")
         self.set_attribute("vertexColor", color_data, "vec3")
         self.count_vertices()
 
         # texture coordinates
         T0, T1, T2, T3 = (0,0), (1,0), (0,1), (1,1)
-        uv_data = [T0,T1,T3, T0,T3,T2] * 6
+        uv_data = [T0,T1,T2,T3] * 6
 
         self.set_attribute("vertexUV", uv_data, "vec2")
 
+        # two triangles for each side
+        self.set_indices([side * 4 + corner for side in range(6) for corner in (0,1,3, 0,3,2)])
 
     def change_position(self, position_data):
         if len(position_data) != 8 or len(position_data[0]) != 3:
             raise ValueError("Box geometry position requires 8 points of 3-dimensional vertices")
-        self.set_attribute("vertexPosition", position_data)
+        self.set_attribute("vertexPosition", [position_data[corner] for corner in self._CORNERS])
     
     def change_color(self, color_data):
         if len(color_data) != 8 or len(color_data[0]) != 3:
             raise ValueError("Box geometry color requires 8 points of 3-dimensional vertices")
-        self.set_attribute("vertexColor", color_data)
+        self.set_attribute("vertexColor", [color_data[corner] for corner in self._CORNERS])
 
 
 class PolygonGeometry(Geometry):
@@ -100,23 +115,26 @@ class PolygonGeometry(Geometry):
         super().__init__()
 
         theta = 2 * pi / sides
-        position_data = []
-        color_data = []
+
+        # every triangle shares the center vertex, while the rim vertices between triangles
+        # are stored twice since each triangle colors them differently
+        position_data = [(0, 0, 0)]
+        color_data = [(1, 1, 1)]
+        indices = []
 
         # texture coordinates
-        uv_data = []
+        uv_data = [(0.5, 0.5)]
 
         for n in range(sides):
             position_data += (
-                (0, 0, 0),
                 (radius*cos(n*theta), radius*sin(n*theta), 0),
                 (radius*cos((n+1)*theta), radius*sin((n+1)*theta), 0)
-            )            
-            color_data += ((1, 1, 1), (1, 0, 0), (0, 0, 1))
+            )
+            color_data += ((1, 0, 0), (0, 0, 1))
+            indices += (0, 2*n + 1, 2*n + 2)
 
             # texture coordinates
             uv_data += (
-                (0.5, 0.5),
                 (cos(n*theta)*0.5 + 0.5, sin(n*theta)*0.5 + 0.5),
                 (cos((n+1)*theta)*0.5 + 0.5, sin((n+1)*theta)*0.5 + 0.5)
             )
@@ -125,4 +143,6 @@ class PolygonGeometry(Geometry):
 
         self.set_attribute("vertexPosition", position_data, "vec3")
         self.set_attribute("vertexColor", color_data, "vec3")
-        self.count_vertices()
\ No newline at end of file
+        self.count_vertices()
+
+        self.set_indices(indices)
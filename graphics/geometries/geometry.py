@@ -1,4 +1,7 @@
-from graphics.core.openGL import Attribute
+import numpy as np
+
+from graphics.core.openGL import Attribute, IndexBuffer, InterleavedBuffer
+from graphics.core.raycast import TriangleBVH
 
 class Geometry:
     """
@@ -8,10 +11,33 @@ class Geometry:
     Attributes:
         attributes (dict): A dictionary of geometric attributes for this object.
         vertexCount (int): The total number of vertices for this object.
+        index_buffer (core.openGL.IndexBuffer): The vertex indices of each primitive, or None to
+            draw the vertices in order.
+        draw_count (int): The number of vertices drawn, which is the number of indices if any.
+        interleaved (bool): Whether all the attributes share one vertex buffer.
+        layout_version (int): A number that changes whenever the buffers read by a vertex array
+            object change, so meshes know when to set up their vertex arrays again.
+        version (int): A number that changes whenever the vertex data or indices change through
+            this geometry, so copies of the data, such as in a core.multidraw.MeshPack, are updated.
+        bounding_box (tuple): The minimum and maximum corners of a box around the vertex positions.
+        bounding_sphere (tuple): The center and radius of a sphere around the vertex positions.
+        triangle_bvh (TriangleBVH): A hierarchy over the triangles of the vertex positions for ray casting.
     """
 
     def  __init__(self):
         self._attributes = {}
+        self._index_buffer = None
+        self._vertex_buffer = None
+        self._layout_version = 0
+        self._version = 0
+
+        # counted from the attributes when first requested after they change
+        self._vertex_count = None
+
+        # bounding volumes calculated from vertexPosition when first requested
+        self._bounding_box = None
+        self._bounding_sphere = None
+        self._triangle_bvh = None
 
     @property
     def attributes(self):
@@ -19,24 +45,217 @@ class Geometry:
 
     @property
     def vertex_count(self):
-        return self.count_vertices()
+        if self._vertex_count is None:
+            self._vertex_count = self.count_vertices()
+        return self._vertex_count
+
+    @property
+    def index_buffer(self):
+        return self._index_buffer
+
+    @property
+    def interleaved(self):
+        return self._vertex_buffer is not None
+
+    @property
+    def layout_version(self):
+        return self._layout_version
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def indices(self):
+        """The vertex indices as a numpy array, or None if the vertices are drawn in order."""
+        return None if self._index_buffer is None else self._index_buffer.data
+
+    @property
+    def draw_count(self):
+        if self._index_buffer is not None:
+            return self._index_buffer.count
+        return self.vertex_count
+
+    @property
+    def bounding_box(self):
+        """The axis-aligned bounding box of the vertex positions in local space.
+
+        Returns:
+            tuple: The (min, max) corners as numpy arrays, or None without vertex positions.
+        """
+        if self._bounding_box is None:
+            self._calculate_bounds()
+        return self._bounding_box
+
+    @property
+    def bounding_sphere(self):
+        """A sphere containing all the vertex positions in local space.
+
+        The sphere is centered on the bounding box and reaches the farthest vertex.
+
+        Returns:
+            tuple: The center as a numpy array and the radius, or None without vertex positions.
+        """
+        if self._bounding_sphere is None:
+            self._calculate_bounds()
+        return self._bounding_sphere
+
+    @property
+    def triangle_bvh(self):
+        """A hierarchy over the triangles of the vertex positions, built when first requested.
+
+        Returns:
+            core.raycast.TriangleBVH: The hierarchy, or None without a complete triangle.
+        """
+        if self._triangle_bvh is None:
+            attribute = self._attributes.get("vertexPosition")
+            if attribute is not None and len(attribute.data) >= 3:
+                positions = np.asarray(attribute.data, dtype=float)
+                if self._index_buffer is not None:
+                    positions = positions[self._index_buffer.data]
+                if len(positions) >= 3:
+                    self._triangle_bvh = TriangleBVH(positions)
+        return self._triangle_bvh
+
+    def set_indices(self, indices):
+        """
+        Set the vertex indices of each primitive so shared vertices are only stored once.
+
+        Args:
+            indices (Iterable): The indices of the vertices to draw, three for each triangle,
+                or None to draw the vertices in order.
+        """
+        if indices is None:
+            if self._index_buffer is not None:
+                self._index_buffer.release()
+                self._index_buffer = None
+                self._layout_version += 1
+        elif self._index_buffer is not None:
+            self._index_buffer.data = indices
+            self._index_buffer.upload_data()
+        else:
+            self._index_buffer = IndexBuffer(indices)
+            self._layout_version += 1
+        self._version += 1
+        self._triangle_bvh = None
+
+    def set_interleaved(self, interleaved=True):
+        """
+        Choose whether to store all the attributes in a single vertex buffer.
+
+        Interleaved attributes keep the values of each vertex together in memory and need only
+        one buffer object, but changing any attribute uploads the data of all of them, so this
+        suits geometries whose vertices rarely change. Attributes added later are packed as well.
+
+        Args:
+            interleaved (bool, optional): True to pack the attributes into one buffer, or False 
+                to give each attribute its own buffer. Defaults to True.
 
-    def set_attribute(self, variable_name, data, data_type=None) -> None:
+        Raises:
+            ValueError: when the attributes do not all have the same number of vertices
+        """
+        if interleaved == self.interleaved:
+            return
+        if interleaved:
+            self._vertex_buffer = InterleavedBuffer(self._attributes)
+        else:
+            for attribute in self._attributes.values():
+                attribute.separate_buffer()
+            self._vertex_buffer.release()
+            self._vertex_buffer = None
+        self._layout_version += 1
+
+    def set_attribute(self, variable_name, data, data_type=None, usage=None) -> None:
         """
         Set or add an attribute for this geometric object.
 
         Args:
             variableName (string): The name of the attribute variable to add or set.
-            data (any): The data of type dataType to store in the attribute variable.
+            data (any): The data of type dataType to store in the attribute variable. A numpy 
+                array of 32-bit values with a row for each vertex is stored without copying.
             dataType (string): The type of data for the attribute variable to add.
+            usage (string, optional): How often the data will change (static, dynamic, stream).
+                See core.openGL.Attribute. Defaults to None, which keeps the current usage of 
+                an attribute or makes a new attribute static.
         """
         if variable_name in self._attributes.keys():
-            self._attributes[variable_name].data = data
-            self._attributes[variable_name].upload_data()
+            attribute = self._attributes[variable_name]
+            attribute.data = data
+            if usage is not None:
+                attribute.usage = usage
+            self._upload_attributes([variable_name])
         elif data_type is not None:
-            self._attributes[variable_name] = Attribute(data_type, data)
+            self._attributes[variable_name] = Attribute(data_type, data, usage=usage or "static")
+            self._vertex_count = None
+            self._version += 1
+            if self._vertex_buffer is not None:
+                # the new attribute changes the layout of every vertex
+                self._vertex_buffer.release()
+                self._vertex_buffer = InterleavedBuffer(self._attributes)
+                self._layout_version += 1
+            if variable_name == "vertexPosition":
+                self._clear_bounds()
         else:
             raise ValueError("A new Geometry attribute must have a data type.")
+
+    def update_attribute(self, variable_name, data, start=0):
+        """
+        Replace the values of a range of vertices in an attribute, uploading only that range.
+
+        This suits data animated on the CPU, such as vertices moved every frame, especially in
+        attributes with a dynamic or stream usage. The number of vertices does not change.
+
+        Args:
+            variable_name (string): The name of the attribute variable to update.
+            data (any): The new values of each vertex from start onward.
+            start (int, optional): The index of the first vertex to update. Defaults to 0.
+
+        Raises:
+            ValueError: when the attribute does not exist or the range does not fit within it
+        """
+        attribute = self._attributes.get(variable_name)
+        if attribute is None:
+            raise ValueError(f"Unable to update unknown attribute: {variable_name}")
+
+        stop = attribute.set_elements(start, data)
+        self._version += 1
+        if self._vertex_buffer is not None:
+            self._vertex_buffer.upload_data(start, stop)
+        else:
+            attribute.upload_data(start, stop)
+        if variable_name == "vertexPosition":
+            self._clear_bounds()
+
+    def _upload_attributes(self, variable_names):
+        """Send the changed data of attributes to their buffers."""
+        self._vertex_count = None
+        self._version += 1
+        if self._vertex_buffer is not None:
+            self._vertex_buffer.upload_data()
+        else:
+            for variable_name in variable_names:
+                self._attributes[variable_name].upload_data()
+        if "vertexPosition" in variable_names:
+            self._clear_bounds()
+
+    def _clear_bounds(self):
+        """Forget the bounding volumes of the vertex positions so they are calculated again."""
+        self._bounding_box = None
+        self._bounding_sphere = None
+        self._triangle_bvh = None
+
+    def _calculate_bounds(self):
+        """Calculate and store the bounding box and bounding sphere of the vertex positions."""
+        attribute = self._attributes.get("vertexPosition")
+        if attribute is None or len(attribute.data) == 0:
+            return
+        positions = np.asarray(attribute.data, dtype=float)[:, :3]
+        low = positions.min(axis=0)
+        high = positions.max(axis=0)
+        center = (low + high) / 2
+        radius = np.sqrt(((positions - center) ** 2).sum(axis=1).max())
+        self._bounding_box = (low, high)
+        self._bounding_sphere = (center, float(radius))
     
     def count_vertices(self, variable_name=None) -> int:
         """
@@ -63,29 +282,103 @@ class Geometry:
         if variable_name not in self._attributes.keys():
             raise ValueError(f"Unable to apply matrix to unknown attribute: {variable_name}")
 
-        old_position_data = self._attributes[variable_name].data
-        new_position_data = []
-
-        for old_pos in old_position_data:
-            # copy the data and add a homogeneous fourth coordinate
-            new_pos = old_pos + (1,)
-
-            # apply the matrix
-            new_pos = matrix @ new_pos
-
-            # remove the homogeneous coordinate and append to the new data
-            new_pos = new_pos[:3]
-            new_position_data.append(new_pos)
-
-        self.set_attribute(variable_name, new_position_data)
+        # transform every position at once, leaving out the homogeneous coordinate
+        positions = np.asarray(self._attributes[variable_name].data, dtype=float)[:, :3]
+        matrix = np.asarray(matrix, dtype=float)
+        self.set_attribute(variable_name, positions @ matrix[:3, :3].T + matrix[:3, 3])
 
     def merge(self, other_geometry):
         """
         Merge data from attributes of other geometries into this object.
         Both geometries must share attributes with the same names.
         """
+        if self._index_buffer is not None or other_geometry.index_buffer is not None:
+            self.set_indices(_join_indices([self, other_geometry]))
+
         for variable_name, attribute in self._attributes.items():
-            attribute.data += other_geometry.attributes[variable_name].data
-            self.set_attribute(variable_name, attribute.data)
+            attribute.data = _concatenate(
+                [attribute.data, other_geometry.attributes[variable_name].data])
+        self._upload_attributes(list(self._attributes))
+
+    @staticmethod
+    def combine(geometries, matrices=None):
+        """Create a new geometry holding the vertices of many geometries one after another.
+
+        All the geometries must share attributes with the same names and data types.
+        If any of them has vertex indices, the combined geometry is indexed as well, and if
+        all of them are interleaved, so is the combined geometry.
+
+        Args:
+            geometries (list): The geometries to combine, in order.
+            matrices (Iterable, optional): A 4x4 transformation for the vertex positions of each 
+                geometry. Defaults to None, which leaves the positions as they are.
+
+        Returns:
+            Geometry: The combined geometry.
+
+        Raises:
+            ValueError: when the geometries do not share the same attributes
+        """
+        combined = Geometry()
+        if not geometries:
+            return combined
 
-        self.count_vertices()
+        data_types = {name: attribute.data_type 
+                      for name, attribute in geometries[0].attributes.items()}
+        for geometry in geometries[1:]:
+            if {name: attribute.data_type 
+                    for name, attribute in geometry.attributes.items()} != data_types:
+                raise ValueError("Only geometries with the same attributes can be combined.")
+
+        for variable_name, data_type in data_types.items():
+            # geometries are often shared between meshes, so convert each one only once
+            arrays = {}
+            parts = []
+            for geometry in geometries:
+                attribute = geometry.attributes[variable_name]
+                if id(attribute) not in arrays:
+                    arrays[id(attribute)] = _concatenate([attribute.data])
+                parts.append(arrays[id(attribute)])
+            if variable_name == "vertexPosition" and matrices is not None:
+                parts = [part[:, :3] @ matrix[:3, :3].T + matrix[:3, 3] if len(part) else part
+                         for part, matrix in zip(parts, np.asarray(matrices, dtype=float))]
+            combined.set_attribute(variable_name, _concatenate(parts), data_type)
+
+        if any(geometry.index_buffer is not None for geometry in geometries):
+            combined.set_indices(_join_indices(geometries))
+        if all(geometry.interleaved for geometry in geometries):
+            combined.set_interleaved()
+        return combined
+
+    def release(self):
+        """Delete the GPU buffers of all the attributes and indices of this geometry."""
+        for attribute in self._attributes.values():
+            attribute.release()
+        if self._vertex_buffer is not None:
+            self._vertex_buffer.release()
+        if self._index_buffer is not None:
+            self._index_buffer.release()
+
+
+def _concatenate(parts):
+    """Join the data of several attributes into one array with a row for each vertex."""
+    arrays = [np.asarray(part) for part in parts]
+    arrays = [array.reshape(len(array), -1) for array in arrays if len(array)]
+    return np.concatenate(arrays) if arrays else np.zeros(0)
+
+
+def _join_indices(geometries):
+    """Join the vertex indices of geometries whose vertices are stored one after another.
+
+    Geometries without indices draw their vertices in order, so they are given indices that do.
+    """
+    parts = []
+    offset = 0
+    for geometry in geometries:
+        count = geometry.vertex_count
+        indices = geometry.indices
+        if indices is None:
+            indices = np.arange(count)
+        parts.append(indices.astype(np.int64) + offset)
+        offset += count
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint32)
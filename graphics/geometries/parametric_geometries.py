@@ -1,4 +1,4 @@
-from math import sin, cos, pi
+from math import pi
 import numpy as np
 
 from graphics.core.matrix import Matrix
@@ -6,55 +6,55 @@ from graphics.geometries.geometry import Geometry
 from graphics.geometries.basic_geometries import PolygonGeometry
 
 class ParametricGeometry(Geometry):
-    """A geometric surface rendered with the given function for parameters u and v."""
+    """A geometric surface rendered with the given function for parameters u and v.
+
+    Each point of the (u,v) grid is stored once, and the triangles refer to the points by index,
+    so the default vertex colors cycle from one grid point to the next. With indexed=False, each
+    triangle stores its own three vertices instead, and the two triangles of every segment are
+    colored red, green, blue and cyan, magenta, yellow, which gives vertex-colored surfaces a
+    faceted look at the cost of six vertices per segment.
+
+    The surface function is called once with 2D arrays of every u and v value in the grid and
+    should return the x, y and z coordinates as arrays of the same shape, or as numbers for
+    coordinates that do not change. Functions that only work with single numbers are called
+    for each point instead, which is much slower for large grids.
+    """
     def __init__(self, u_start, u_stop, u_resolution,
-                       v_start, v_stop, v_resolution, surface_function):
+                       v_start, v_stop, v_resolution, surface_function, indexed=True):
         super().__init__()
         
-        # generate a matrix of vertex points for all values of (u,v)
-        point_matrix = []
-        for u in np.linspace(u_start, u_stop, u_resolution + 1):
-            matrix_row = []
-            for v in np.linspace(v_start, v_stop, v_resolution + 1):
-                matrix_row.append(surface_function(u,v))
-            point_matrix.append(matrix_row)
-        
-        # texture coordinates
-        uv_matrix = []
-        uv_data = []
-
-        for u_index in range(u_resolution + 1):
-            uv_row = []
-            for v_index in range(v_resolution + 1):
-                u = u_index/u_resolution
-                v = v_index/v_resolution
-                uv_row.append((u,v))
-            uv_matrix.append(uv_row)
-
-        # store vertex data
-        position_data = []
-        color_data = []
+        # generate a grid of vertex points for all values of (u,v)
+        u, v = np.meshgrid(np.linspace(u_start, u_stop, u_resolution + 1),
+                           np.linspace(v_start, v_stop, v_resolution + 1), indexing="ij")
+        position_data = _evaluate_surface(surface_function, u, v).reshape(-1, 3)
+        count = len(position_data)
 
         # default vertex color data: red, green, blue, cyan, magenta, yellow
-        C1, C2, C3 = [1, 0, 0], [0, 1, 0], [0, 0, 1]
-        C4, C5, C6 = [0, 1, 1], [1, 0, 1], [1, 1, 0]
-
-        # store vertices for each rectangular segment as a pair of triangles
-        for n in range(u_resolution):
-            for m in range(v_resolution):
-                P1 = point_matrix[n + 0][m + 0]
-                P2 = point_matrix[n + 1][m + 0]
-                P3 = point_matrix[n + 1][m + 1]
-                P4 = point_matrix[n + 0][m + 1]
-                position_data += [P1,P2,P3, P1,P3,P4]
-                color_data += [C1,C2,C3, C4,C5,C6]
-
-                # texture coordinates
-                uv_A = uv_matrix[n + 0][m + 0]
-                uv_B = uv_matrix[n + 1][m + 0]
-                uv_D = uv_matrix[n + 1][m + 1]
-                uv_C = uv_matrix[n + 0][m + 1]
-                uv_data += [uv_A,uv_B,uv_C, uv_A,uv_C,uv_D]
+        colors = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1],
+                           [0, 1, 1], [1, 0, 1], [1, 1, 0]], dtype=np.float32)
+
+        # texture coordinates
+        u_index, v_index = np.meshgrid(np.arange(u_resolution + 1), np.arange(v_resolution + 1),
+                                       indexing="ij")
+        uv_data = np.stack((u_index / u_resolution, v_index / v_resolution),
+                           axis=-1).reshape(-1, 2).astype(np.float32)
+
+        # each rectangular segment is a pair of triangles sharing the grid points at its corners
+        row = v_resolution + 1
+        n, m = np.meshgrid(np.arange(u_resolution), np.arange(v_resolution), indexing="ij")
+        P1 = (n * row + m).ravel()
+        P2 = P1 + row
+        P3 = P1 + row + 1
+        P4 = P1 + 1
+        indices = np.stack((P1,P2,P3, P1,P3,P4), axis=-1).ravel()
+
+        if indexed:
+            color_data = colors[np.arange(count) % len(colors)]
+        else:
+            # every triangle gets its own vertices, so the colors follow the triangles
+            position_data = position_data[indices]
+            uv_data = uv_data[indices]
+            color_data = np.tile(colors, (u_resolution * v_resolution, 1))
 
         self.set_attribute("vertexUV", uv_data, "vec2")
 
@@ -62,10 +62,39 @@ class ParametricGeometry(Geometry):
         self.set_attribute("vertexColor", color_data, "vec3")
         self.count_vertices()
 
+        if indexed:
+            self.set_indices(indices)
+
+
+def _evaluate_surface(surface_function, u, v):
+    """Get the (x,y,z) points of a surface function for grids of u and v values.
+
+    The function is called with the whole grids first, and for each point if that fails.
+
+    Returns:
+        NDArray: A float32 array of points with the shape of the grids plus a last axis of 3.
+    """
+    try:
+        points = np.stack(np.broadcast_arrays(*surface_function(u, v)), axis=-1)
+    except (TypeError, ValueError):
+        points = None
+    if points is None or points.shape != u.shape + (3,):
+        point_function = lambda u,v: np.asarray(surface_function(u,v), dtype=float)
+        points = np.vectorize(point_function, signature="(),()->(n)")(u, v)
+    return np.asarray(points, dtype=np.float32)
+
+
+def _expand_indices(geometry):
+    """Store the vertices of each triangle of an indexed geometry separately, in draw order."""
+    indices = geometry.indices
+    for variable_name, attribute in geometry.attributes.items():
+        geometry.set_attribute(variable_name, np.asarray(attribute.data)[indices])
+    geometry.set_indices(None)
+
 
 class PlaneGeometry(ParametricGeometry):
     """A 2D plane divided into segments."""
-    def __init__(self, width=1, height=1, width_segments=8, height_segments=8):
+    def __init__(self, width=1, height=1, width_segments=8, height_segments=8, indexed=True):
         
         surface_function = lambda u,v: [u, v, 0]
         
@@ -76,18 +105,19 @@ class PlaneGeometry(ParametricGeometry):
             v_start=-height/2,
             v_stop=height/2,
             v_resolution=height_segments,
-            surface_function=surface_function
+            surface_function=surface_function,
+            indexed=indexed
         )
 
 class EllipsoidGeometry(ParametricGeometry):
     """A sphere stretched by the given factors of width, height, and depth."""
     def __init__(self, width=1, height=1, depth=1, 
-                       radial_segments=32, height_segments=16):
+                       radial_segments=32, height_segments=16, indexed=True):
 
         surface_function = lambda u,v: [
-            width/2 * sin(u) * cos(v),
-            height/2 * sin(v),
-            depth/2 * cos(u) * cos(v)
+            width/2 * np.sin(u) * np.cos(v),
+            height/2 * np.sin(v),
+            depth/2 * np.cos(u) * np.cos(v)
         ]
 
         super().__init__(
@@ -97,30 +127,32 @@ class EllipsoidGeometry(ParametricGeometry):
             v_start=-pi/2,
             v_stop=pi/2,
             v_resolution=height_segments,
-            surface_function=surface_function
+            surface_function=surface_function,
+            indexed=indexed
         )
 
 class SphereGeometry(EllipsoidGeometry):
     """A perfect sphere with the given radius."""
-    def __init__(self, radius=1, radial_segments=32, height_segments=16):
+    def __init__(self, radius=1, radial_segments=32, height_segments=16, indexed=True):
         super().__init__(
             width=2*radius,
             height=2*radius,
             depth=2*radius,
             radial_segments=radial_segments,
-            height_segments=height_segments
+            height_segments=height_segments,
+            indexed=indexed
         )
 
 class CylindricalGeometry(ParametricGeometry):
     """A cylindrical object with the given top and bottom radiuses."""
     def __init__(self, top_radius=1, bottom_radius=1, height=1,
                        radial_segments=32, height_segments=4, 
-                       top_closed=True, bottom_closed=True):
+                       top_closed=True, bottom_closed=True, indexed=True):
         # S(u,v) = ((vt + s(1-v))sin(u), h(v-0.5), (vt + s(1-v)cos(u)))
         surface_function = lambda u,v: [
-            (v * top_radius + (1-v) * bottom_radius) * sin(u),  # x
+            (v * top_radius + (1-v) * bottom_radius) * np.sin(u),  # x
             height * (v - 0.5),                                 # y
-            (v * top_radius + (1-v) * bottom_radius) * cos(u)   # z
+            (v * top_radius + (1-v) * bottom_radius) * np.cos(u)   # z
         ]
         super().__init__(
             u_start=0,
@@ -129,7 +161,8 @@ class CylindricalGeometry(ParametricGeometry):
             v_start=0,
             v_stop=1,
             v_resolution=height_segments,
-            surface_function=surface_function
+            surface_function=surface_function,
+            indexed=indexed
         )
 
         # add polygons to the top and bottom if requested
@@ -138,6 +171,8 @@ class CylindricalGeometry(ParametricGeometry):
             rotation = Matrix.rotation_y(-pi/2) @ Matrix.rotation_x(-pi/2)
             transform = Matrix.translation(0, height/2, 0) @ rotation
             top_geometry.apply_matrix(transform)
+            if not indexed:
+                _expand_indices(top_geometry)
             self.merge(top_geometry)
 
         if bottom_closed:
@@ -145,12 +180,14 @@ class CylindricalGeometry(ParametricGeometry):
             rotation = Matrix.rotation_y(-pi/2) @ Matrix.rotation_x(pi/2)
             transform = Matrix.translation(0, -height/2, 0) @ rotation
             bottom_geometry.apply_matrix(transform)
+            if not indexed:
+                _expand_indices(bottom_geometry)
             self.merge(bottom_geometry)
 
 class CylinderGeometry(CylindricalGeometry):
     "A cylindrical object with the same radius at the top and bottom."
     def __init__(self, radius=1, height=1, radial_segments=32,
-                       height_segments=4, top_closed=True, bottom_closed=True):
+                       height_segments=4, top_closed=True, bottom_closed=True, indexed=True):
         super().__init__(
             top_radius=radius,
             bottom_radius=radius,
@@ -158,13 +195,14 @@ class CylinderGeometry(CylindricalGeometry):
             radial_segments=radial_segments,
             height_segments=height_segments,
             top_closed=top_closed,
-            bottom_closed=bottom_closed
+            bottom_closed=bottom_closed,
+            indexed=indexed
         )
 
 class ConeGeometry(CylindricalGeometry):
     """A cylindrical object that comes to a point at the top."""
     def __init__(self, radius=1, height=1, radial_segments=32,
-                       height_segments=4, closed=True):
+                       height_segments=4, closed=True, indexed=True):
         super().__init__(
             top_radius=0,
             bottom_radius=radius,
@@ -172,5 +210,6 @@ class ConeGeometry(CylindricalGeometry):
             radial_segments=radial_segments,
             height_segments=height_segments,
             top_closed=False,
-            bottom_closed=closed
+            bottom_closed=closed,
+            indexed=indexed
         )
\ No newline at end of file
@@ -1,45 +1,73 @@
 import OpenGL.GL as GL
 
+from graphics.core.openGL import FrameUniformBuffer, MODEL_MATRIX_SOURCE
 from graphics.materials import Material
 
 class BasicMaterial(Material):
-    """A simple material for rendering objects in a solid color or vertex colors."""
-    def __init__(self):
-        vertex_shader_code = """
-        uniform mat4 projectionMatrix;
-        uniform mat4 viewMatrix;
-        uniform mat4 modelMatrix;
+    """A simple material for rendering objects in a solid color or vertex colors.
 
+    useVertexColors: False to color with baseColor only, or True to multiply it by the vertex colors
+    useInstancing: False unless drawn by a core.scene_graph.InstancedMesh
+    useInstanceColors: False unless drawn by an InstancedMesh with instance colors
+    useMultiDraw: False unless drawn by a core.multidraw.MeshPack
+    """
+    def __init__(self):
+        vertex_shader_code = FrameUniformBuffer.BLOCK_SOURCE + MODEL_MATRIX_SOURCE + """
         in vec3 vertexPosition;
+
+        #ifdef USE_VERTEX_COLORS
         in vec3 vertexColor;
-        
+        #endif
+
+        #ifdef USE_INSTANCE_COLORS
+        in vec3 instanceColor;
+        #endif
+
+        #if defined(USE_VERTEX_COLORS) || defined(USE_INSTANCE_COLORS)
         out vec3 color;
+        #endif
 
         void main() {
-            gl_Position = projectionMatrix * viewMatrix * modelMatrix * vec4(vertexPosition, 1.0);
-            color = vertexColor;
+            mat4 model = getModelMatrix();
+            gl_Position = projectionMatrix * viewMatrix * model * vec4(vertexPosition, 1.0);
+
+            #if defined(USE_VERTEX_COLORS) || defined(USE_INSTANCE_COLORS)
+            color = vec3(1.0);
+            #endif
+            #ifdef USE_VERTEX_COLORS
+            color *= vertexColor;
+            #endif
+            #ifdef USE_INSTANCE_COLORS
+            color *= instanceColor;
+            #endif
         }
         """
 
         fragment_shader_code = """
         uniform vec3 baseColor;
-        uniform bool useVertexColors;
-        
+
+        #if defined(USE_VERTEX_COLORS) || defined(USE_INSTANCE_COLORS)
         in vec3 color;
-        
+        #endif
+
         out vec4 fragColor;
 
         void main() {
             vec4 tempColor = vec4(baseColor, 1.0);
-            if (useVertexColors) tempColor *= vec4(color, 1.0);
+            #if defined(USE_VERTEX_COLORS) || defined(USE_INSTANCE_COLORS)
+            tempColor *= vec4(color, 1.0);
+            #endif
             fragColor = tempColor;
         }
         """
 
-        super().__init__(vertex_shader_code, fragment_shader_code)
+        super().__init__(vertex_shader_code, fragment_shader_code,
+                         features={"useVertexColors": "USE_VERTEX_COLORS",
+                                   "useInstancing": "USE_INSTANCING",
+                                   "useInstanceColors": "USE_INSTANCE_COLORS",
+                                   "useMultiDraw": "USE_MULTI_DRAW"})
 
         self.set_uniform("baseColor", (1,1,1), "vec3")
-        self.set_uniform("useVertexColors", False, "bool")
 
 class PointMaterial(BasicMaterial):
     """Manages render settings for drawing vertices as rounded points.
@@ -63,8 +91,8 @@ class PointMaterial(BasicMaterial):
 
         self.set_properties(properties)
 
-    def update_render_settings(self):
-        GL.glPointSize(self._settings["pointSize"])
+    def update_render_settings(self, state):
+        state.set_point_size(self._settings["pointSize"])
 
 class LineMaterial(BasicMaterial):
     """Manages render settings for drawing lines between vertices.
@@ -82,7 +110,7 @@ class LineMaterial(BasicMaterial):
 
         self.set_properties(properties)
 
-    def update_render_settings(self):
+    def update_render_settings(self, state):
         
         if self._settings["lineType"] == "connected":
             self._settings["drawStyle"] = GL.GL_LINE_STRIP
@@ -110,14 +138,11 @@ class SurfaceMaterial(BasicMaterial):
         # set additional properties if any have been provided
         self.set_properties(properties)
 
-    def update_render_settings(self):
+    def update_render_settings(self, state):
         """Applies OpenGL render settings as specified by this material's settings."""
-        if self._settings.get("doubleSide", False):
-            GL.glDisable(GL.GL_CULL_FACE)
-        else:
-            GL.glEnable(GL.GL_CULL_FACE)
+        state.set_capability(GL.GL_CULL_FACE, not self._settings.get("doubleSide", False))
 
         if self._settings.get("wireframe", False):
-            GL.glPolygonMode(GL.GL_FRONT_AND_BACK, GL.GL_LINE)
+            state.set_polygon_mode(GL.GL_LINE)
         else:
-            GL.glPolygonMode(GL.GL_FRONT_AND_BACK, GL.GL_FILL)
\ No newline at end of file
+            state.set_polygon_mode(GL.GL_FILL)
\ No newline at end of file
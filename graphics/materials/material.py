@@ -1,7 +1,10 @@
+import copy
+import re
+
 from OpenGL.GL import GL_TRIANGLES
 
-from graphics.core.openGL import Uniform
-from graphics.core.openGLUtils import initialize_program
+from graphics.core.openGL import Uniform, FrameUniformBuffer, GLState
+from graphics.core.openGLUtils import acquire_program, program_ready, release_program
 
 class Material:
     """
@@ -9,70 +12,293 @@ class Material:
 
     This class initializes the shader program from vertex shader code and fragment shader code;
     links uniform variables to their associated data; and maintains OpenGL render settings and their values.
+
+    Materials with identical shader code share a single compiled program, while each material
+    keeps its own uniform values. Call release() when a material will no longer be used so the
+    program can be deleted once no material uses it.
+
+    Shader code can be written as a template with optional features inside #ifdef blocks. Each
+    feature is switched on and off by a boolean setting, and every combination of features is
+    compiled into its own program variant the first time it is used, so disabled features cost
+    nothing when drawing. The program is compiled when it is first needed, after the material
+    has been fully set up, or when compile() is called. Calling compile(wait=False) lets the
+    driver compile in the background, and a material keeps drawing with its previous program
+    variant, if it has one, until the new one is ready. Uniforms declared inside #if blocks
+    may be missing from a variant, but setting any other uniform that the program does not
+    declare raises a ValueError.
+
+    Shaders that declare the uniform block in core.openGL.FrameUniformBuffer.BLOCK_SOURCE read the
+    view and projection matrices from the renderer's per-frame buffer. Otherwise, viewMatrix and
+    projectionMatrix are declared as ordinary uniforms and uploaded for each mesh. Vertex shaders
+    that also prepend core.openGL.MODEL_MATRIX_SOURCE get the model matrix from getModelMatrix(),
+    which works for ordinary meshes as well as instanced meshes and mesh packs.
+
+    drawStyle: GL_TRIANGLES by default, the OpenGL primitive used to draw the vertices
+    transparent: False to draw among opaque meshes, or True to blend with the meshes behind it
     """
-    def __init__(self, vertex_shader_code, fragment_shader_code):
-        self._program_ref = initialize_program(
-            vertex_shader_code, 
-            fragment_shader_code
-        )
+    def __init__(self, vertex_shader_code, fragment_shader_code, features=None, defines=()):
+        """Store the shader code of this material and initialize its common settings.
+
+        Args:
+            vertex_shader_code (str): The GLSL code of the vertex shader.
+            fragment_shader_code (str): The GLSL code of the fragment shader.
+            features (dict, optional): Maps the names of boolean settings to the preprocessor
+                symbols they define when True. Each setting is False by default. Defaults to None.
+            defines (Iterable, optional): Preprocessor symbols that are always defined. Defaults to ().
+        """
+        self._vertex_shader_code = vertex_shader_code
+        self._fragment_shader_code = fragment_shader_code
+        self._features = dict(features) if features else {}
+        self._defines = tuple(defines)
+
+        # uniforms declared inside #if blocks may be compiled away, while any other uniform
+        # missing from the program is an error
+        self._optional_uniforms = (_conditional_uniforms(vertex_shader_code) 
+                                   | _conditional_uniforms(fragment_shader_code))
+
+        # the program is compiled when first needed and again whenever a feature changes,
+        # and a program that is still compiling is kept apart from the one in use
+        self._program_ref = None
+        self._pending_program_ref = None
+        self._program_dirty = True
+        self._uses_frame_uniforms = False
 
         # store uniform objects assigned to names of their associated shader variables
         self._uniforms = {}
 
         # initialize common shader uniforms to be set during the render process
         self.set_uniform("modelMatrix", None, "mat4")
-        self.set_uniform("viewMatrix", None, "mat4")
-        self.set_uniform("projectionMatrix", None, "mat4")
 
         # OpenGL render settings assigned to variable names
-        self._settings = {"drawStyle": GL_TRIANGLES}
+        self._settings = {"drawStyle": GL_TRIANGLES, "transparent": False}
+        for setting_name in self._features:
+            self._settings[setting_name] = False
 
     @property
     def program_ref(self):
+        if self._program_dirty or self._program_ref is None:
+            self.compile()
         return self._program_ref
 
+    @property
+    def program_ready(self):
+        """Whether the material can be drawn without waiting for a shader program to compile."""
+        return self.compile(wait=False)
+
+    @property
+    def uses_frame_uniforms(self):
+        """Whether the shader program reads the camera matrices from the per-frame uniform block."""
+        if self._program_dirty or self._program_ref is None:
+            self.compile()
+        return self._uses_frame_uniforms
+
+    @property
+    def texture_refs(self):
+        """A tuple of the texture references used by this material's sampler2D uniforms."""
+        return tuple(uniform.data[0] for uniform in self._uniforms.values()
+                     if uniform.data_type == "sampler2d")
+
+    def compile(self, wait=True):
+        """Compile the shader program for the enabled features if it has not been compiled yet.
+
+        Args:
+            wait (bool, optional): Whether to wait for the program to compile. If False, the
+                compile is only started and checked again on later calls. Defaults to True.
+
+        Returns:
+            bool: True if the material has a program ready to draw with, which may be the
+                previous program variant while a new one is still compiling.
+
+        Raises:
+            RuntimeError: when the shader program failed to compile or link
+        """
+        if self._program_dirty:
+            self._program_dirty = False
+            program_ref = acquire_program(*self._variant_code(), wait=False)
+            if self._pending_program_ref is not None:
+                release_program(self._pending_program_ref)
+            self._pending_program_ref = program_ref
+
+        if self._pending_program_ref is not None:
+            try:
+                ready = program_ready(self._pending_program_ref, wait)
+            except RuntimeError:
+                # keep the previous program and acquire the variant again next time
+                # to report the error again
+                release_program(self._pending_program_ref)
+                self._pending_program_ref = None
+                self._program_dirty = True
+                raise
+            if not ready:
+                return self._program_ref is not None
+            if self._program_ref is not None:
+                release_program(self._program_ref)
+            self._program_ref = self._pending_program_ref
+            self._pending_program_ref = None
+            self._locate_uniforms()
+        return True
+
+    def release(self):
+        """Stop using the shared shader program, deleting it if no other material uses it."""
+        for program_ref in (self._program_ref, self._pending_program_ref):
+            if program_ref is not None:
+                release_program(program_ref)
+        self._program_ref = None
+        self._pending_program_ref = None
+        self._program_dirty = True
+
+    def clone(self):
+        """Create a copy of this material with its own uniforms and settings.
+
+        The copy shares compiled programs with this material through the program cache, but
+        its settings and features can be changed without affecting this material. Call 
+        release() on the copy when it is no longer used.
+
+        Returns:
+            Material: The new material.
+        """
+        material = copy.copy(self)
+        material._uniforms = {}
+        material._settings = dict(self._settings)
+        material._program_ref = None
+        material._pending_program_ref = None
+        material._program_dirty = True
+        material.copy_properties(self)
+        return material
+
+    def copy_properties(self, material, skip=()):
+        """Copy the uniform data and render settings of a material with the same shader code.
+
+        Uniform data is only marked as changed when it changed in the other material, 
+        so copying before every draw does not upload anything new.
+
+        Args:
+            material (Material): The material to copy from, such as the one this was cloned from.
+            skip (Container, optional): The names of uniforms and settings to leave as they are. 
+                Defaults to ().
+        """
+        for name, uniform in material._uniforms.items():
+            if name not in skip:
+                self.set_uniform(name, uniform.data, uniform.data_type, source=uniform.version)
+        changed = {name: value for name, value in material._settings.items()
+                   if name not in skip and self._settings.get(name) != value}
+        if changed:
+            self.set_properties(changed)
+
     def get_setting(self, setting_name):
         """ Return a setting value if the setting exists; otherwise, return None """
         return self._settings.get(setting_name, None)
 
-    def set_uniform(self, variable_name, data, data_type=None):
+    def set_uniform(self, variable_name, data, data_type=None, source=None):
         """
         Add or update a Uniform object representing a property of this material.
 
-        If the uniform variable is already set, its data will be updated. 
+        If the uniform variable is already set, its data will be updated.
         If a new uniform object is being created, a data type must be provided.
 
         Args:
             variableName (string): The name of the shader uniform variable
             data (any): The data to be linked by the Uniform object
             dataType (string, optional): The type of data stored in the uniform variable. Defaults to None.
+            source (hashable, optional): A key identifying the data so it is only uploaded again
+                when the key changes. See Uniform.set_data(). Defaults to None.
 
         Raises:
-            ValueError: when setting a new uniform variable without a data type
+            ValueError: when setting a new uniform variable without a data type, or one that
+                the compiled program does not declare outside an #if block
         """
         if variable_name in self._uniforms:
-            self._uniforms[variable_name].data = data
+            self._uniforms[variable_name].set_data(data, source)
         elif data_type is not None:
-            self._uniforms[variable_name] = Uniform(data_type, data)
-            self._uniforms[variable_name].locate_variable(self._program_ref, 
-                                                          variable_name)
+            uniform = Uniform(data_type, None)
+            uniform.set_data(data, source)
+            if self._program_ref is not None:
+                uniform.locate_variable(self._program_ref, variable_name,
+                                        variable_name not in self._optional_uniforms)
+            self._uniforms[variable_name] = uniform
         else:
             raise ValueError("A new Material property must have a dataType.")
-            
-    def update_render_settings(self):
+
+    def update_render_settings(self, state):
+        """Apply the OpenGL render settings of this material before drawing.
+
+        Subclasses override this to set their settings through the state tracker, 
+        which is called by apply_render_settings().
+
+        Args:
+            state (core.openGL.GLState): The state tracker that skips settings already in effect.
+        """
         pass
 
+    def apply_render_settings(self, state=None):
+        """Apply the OpenGL render settings of this material before drawing.
+
+        Args:
+            state (core.openGL.GLState, optional): The state tracker shared by the draws of a
+                frame. Defaults to None, which sets every setting with OpenGL.
+        """
+        if state is None:
+            state = GLState()
+        self.update_render_settings(state)
+
     def set_properties(self, properties):
         """ Convenience method for setting multiple uniform variable and render setting values from a dictionary """
         for name, data in properties.items():
             if name in self._uniforms.keys():
                 self._uniforms[name].data = data
             elif name in self._settings:
+                if name in self._features and bool(data) != bool(self._settings[name]):
+                    self._program_dirty = True
                 self._settings[name] = data
             else:
                 raise ValueError(f"Material has no property named {name}")
-        
-    def upload_data(self):
-        """Convenience method for uploading the data of all stored uniform variables."""
+
+    def upload_data(self, state=None):
+        """Convenience method for uploading the data of all stored uniform variables.
+
+        Args:
+            state (core.openGL.GLState, optional): The state tracker used to bind textures.
+                Defaults to None, which always binds them.
+        """
         for uniform_obj in self._uniforms.values():
-            uniform_obj.upload_data()
\ No newline at end of file
+            uniform_obj.upload_data(state)
+
+    def _variant_code(self):
+        """Get the vertex and fragment shader code with the defines of the enabled features."""
+        defines = set(self._defines)
+        defines.update(symbol for setting_name, symbol in self._features.items()
+                       if self._settings[setting_name])
+        header = "".join(f"#define {symbol}\n" for symbol in sorted(defines))
+        return header + self._vertex_shader_code, header + self._fragment_shader_code
+
+    def _locate_uniforms(self):
+        """Locate the uniform variables of this material in a newly compiled program."""
+        program_ref = self._program_ref
+        self._uses_frame_uniforms = FrameUniformBuffer.attach_program(program_ref)
+        for name in ("viewMatrix", "projectionMatrix"):
+            if self._uses_frame_uniforms:
+                self._uniforms.pop(name, None)
+            elif name not in self._uniforms:
+                self._uniforms[name] = Uniform("mat4", None)
+
+        for name, uniform in self._uniforms.items():
+            uniform.locate_variable(program_ref, name, name not in self._optional_uniforms)
+
+
+# a uniform variable declaration, capturing the variable name
+_UNIFORM_DECLARATION = re.compile(r"\buniform\s+(?:\w+\s+)+(\w+)\s*(?:\[[^\]]*\])?\s*;")
+
+
+def _conditional_uniforms(shader_code):
+    """Find the names of the uniforms declared inside #if, #ifdef or #ifndef blocks."""
+    names = set()
+    depth = 0
+    for line in shader_code.splitlines():
+        directive = line.strip()
+        if directive.startswith("#if"):
+            depth += 1
+        elif directive.startswith("#endif"):
+            depth = max(depth - 1, 0)
+        elif depth:
+            names.update(_UNIFORM_DECLARATION.findall(line))
+    return names
@@ -1,16 +1,27 @@
 import OpenGL.GL as GL
 
+from graphics.core.openGL import FrameUniformBuffer, MODEL_MATRIX_SOURCE
 from graphics.materials import Material
 
 class TextureMaterial(Material):
+    """Manages render settings for drawing a surface with a texture image.
 
-    def __init__(self, texture, properties={}):
+    alphaDiscard: True to skip drawing fragments that are almost fully transparent
+    doubleSide: True to render both sides of the surface
+    wireframe: False to render triangles instead of lines between the vertices
+    useInstancing: False unless drawn by a core.scene_graph.InstancedMesh
+    useInstanceColors: False unless drawn by an InstancedMesh with instance colors
+    useMultiDraw: False unless drawn by a core.multidraw.MeshPack
+
+    Every variant samples texture2D, so there is no feature for drawing without a texture; 
+    BasicMaterial and its subclasses draw the same surfaces untextured. repeatUV and offsetUV
+    are always applied as well, since their defaults leave the coordinates unchanged for the
+    cost of one multiply and add per vertex.
+    """
 
-        vs_code = """
-        uniform mat4 projectionMatrix;
-        uniform mat4 viewMatrix;
-        uniform mat4 modelMatrix;
+    def __init__(self, texture, properties={}):
 
+        vs_code = FrameUniformBuffer.BLOCK_SOURCE + MODEL_MATRIX_SOURCE + """
         in vec3 vertexPosition;
         in vec2 vertexUV;
         
@@ -19,9 +30,18 @@ class TextureMaterial(Material):
         
         out vec2 UV;
 
+        #ifdef USE_INSTANCE_COLORS
+        in vec3 instanceColor;
+        out vec3 tint;
+        #endif
+
         void main() {
-            gl_Position = projectionMatrix * viewMatrix * modelMatrix * vec4(vertexPosition, 1.0);
+            mat4 model = getModelMatrix();
+            gl_Position = projectionMatrix * viewMatrix * model * vec4(vertexPosition, 1.0);
             UV = vertexUV * repeatUV + offsetUV;
+            #ifdef USE_INSTANCE_COLORS
+            tint = instanceColor;
+            #endif
         }
         """
 
@@ -31,39 +51,46 @@ class TextureMaterial(Material):
 
         in vec2 UV;
 
+        #ifdef USE_INSTANCE_COLORS
+        in vec3 tint;
+        #endif
+
         out vec4 fragColor;
 
         void main() {
             vec4 color = vec4(baseColor, 1.0) * texture(texture2D, UV);
+            #ifdef USE_INSTANCE_COLORS
+            color *= vec4(tint, 1.0);
+            #endif
+            #ifdef USE_ALPHA_DISCARD
             if (color.a < 0.10)
                 discard;
+            #endif
 
             fragColor = color;
         }
         """
 
-        super().__init__(vs_code, fs_code)
+        super().__init__(vs_code, fs_code, features={"alphaDiscard": "USE_ALPHA_DISCARD",
+                                                     "useInstancing": "USE_INSTANCING",
+                                                     "useInstanceColors": "USE_INSTANCE_COLORS",
+                                                     "useMultiDraw": "USE_MULTI_DRAW"})
 
         self.set_uniform("baseColor", (1.0, 1.0, 1.0), "vec3")
         self.set_uniform("texture2D", (texture.texture_ref, 1), "sampler2D")
         self.set_uniform("repeatUV", (1.0, 1.0), "vec2")
         self.set_uniform("offsetUV", (0.0, 0.0), "vec2")
 
+        self._settings["alphaDiscard"] = True
         self._settings["doubleSide"] = True
         self._settings["wireframe"] = False
 
         self.set_properties(properties)
 
-    def update_render_settings(self):
-        
-        if self._settings["doubleSide"]:
-            GL.glDisable(GL.GL_CULL_FACE)
-        else:
-            GL.glEnable(GL.GL_CULL_FACE)
+    def update_render_settings(self, state):
+        state.set_capability(GL.GL_CULL_FACE, not self._settings["doubleSide"])
 
         if self._settings["wireframe"]:
-            GL.glPolygonMode(GL.GL_FRONT_AND_BACK, GL.GL_LINE)
+            state.set_polygon_mode(GL.GL_LINE)
         else:
-            GL.glPolygonMode(GL.GL_FRONT_AND_BACK, GL.GL_FILL)
-
-        
\ No newline at end of file
+            state.set_polygon_mode(GL.GL_FILL)
@@ -0,0 +1,75 @@
+"""Shared fixtures for the test suite.
+
+Tests that create GPU resources request the gl_context fixture, which makes an OpenGL 3.3
+core context current for the whole session, or skips those tests when no context can be made.
+Without a display, the context is created offscreen through EGL.
+"""
+import ctypes
+import os
+import sys
+
+import pytest
+
+# PyOpenGL picks its platform when it is first imported, so choose EGL before any test module
+# imports OpenGL if there is no display to open a window on
+if not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")
+        or sys.platform in ("win32", "darwin")):
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _create_egl_context():
+    """Make an offscreen OpenGL 3.3 core context current with EGL."""
+    from OpenGL import EGL
+
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise RuntimeError("EGL could not be initialized.")
+
+    config_attributes = (EGL.EGLint * 13)(
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+        EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+        EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+    config = EGL.EGLConfig()
+    count = EGL.EGLint()
+    if not EGL.eglChooseConfig(display, config_attributes, ctypes.pointer(config), 1,
+                               ctypes.pointer(count)) or count.value == 0:
+        raise RuntimeError("No suitable EGL configuration was found.")
+
+    surface = EGL.eglCreatePbufferSurface(
+        display, config, (EGL.EGLint * 5)(EGL.EGL_WIDTH, 64, EGL.EGL_HEIGHT, 64, EGL.EGL_NONE))
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context_attributes = (EGL.EGLint * 7)(
+        EGL.EGL_CONTEXT_MAJOR_VERSION, 3, EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+        EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+        EGL.EGL_NONE)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, context_attributes)
+    if not context or not EGL.eglMakeCurrent(display, surface, surface, context):
+        raise RuntimeError("An EGL context could not be made current.")
+
+
+def _create_pygame_context():
+    """Make an OpenGL 3.3 core context current in a hidden pygame window."""
+    import pygame
+
+    pygame.display.init()
+    pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MAJOR_VERSION, 3)
+    pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MINOR_VERSION, 3)
+    pygame.display.gl_set_attribute(pygame.GL_CONTEXT_PROFILE_MASK,
+                                    pygame.GL_CONTEXT_PROFILE_CORE)
+    pygame.display.set_mode((64, 64), pygame.OPENGL | pygame.DOUBLEBUF | pygame.HIDDEN)
+
+
+@pytest.fixture(scope="session")
+def gl_context():
+    """An OpenGL context shared by every test that needs one."""
+    try:
+        if os.environ.get("PYOPENGL_PLATFORM") == "egl":
+            _create_egl_context()
+        else:
+            _create_pygame_context()
+    except Exception as error:
+        pytest.skip(f"No OpenGL context is available: {error}")
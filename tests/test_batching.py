@@ -0,0 +1,97 @@
+import numpy as np
+
+from graphics.core.batching import StaticBatch
+from graphics.core.scene_graph import Group, Mesh, Scene
+from graphics.geometries import BoxGeometry, RectangleGeometry
+from graphics.materials import LineMaterial, SurfaceMaterial
+
+
+def positions(geometry, matrix=np.identity(4)):
+    """Get the vertex positions of a geometry transformed by a matrix."""
+    points = np.asarray(geometry.attributes["vertexPosition"].data, dtype=float)[:, :3]
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def build_scene():
+    scene = Scene()
+    root = Group()
+    root.translate(0, 1, 0)
+    root.rotate_y(0.5)
+    scene.add(root)
+
+    surface = SurfaceMaterial()
+    meshes = []
+    for index, geometry in enumerate([BoxGeometry(), RectangleGeometry(), BoxGeometry(1, 2, 3)]):
+        mesh = Mesh(geometry, surface)
+        mesh.translate(index * 2, 0, -index)
+        mesh.rotate_x(index * 0.3)
+        root.add(mesh)
+        meshes.append(mesh)
+    return scene, root, meshes
+
+
+def test_meshes_sharing_a_material_are_merged(gl_context):
+    scene, root, meshes = build_scene()
+    lone = Mesh(BoxGeometry(), LineMaterial())
+    root.add(lone)
+
+    batch = StaticBatch(root)
+    assert len(batch.batched_meshes) == 1
+    merged = batch.batched_meshes[0]
+    assert merged.parent is root
+    assert all(not mesh.visible for mesh in meshes)
+    assert lone.visible
+
+    # the vertices are moved into the space of the root, one mesh after another
+    root_inverse = np.linalg.inv(root.world_matrix)
+    expected = np.concatenate([positions(mesh.geometry, root_inverse @ mesh.world_matrix)
+                               for mesh in meshes])
+    assert np.allclose(positions(merged.geometry), expected, atol=1e-5)
+    assert np.allclose(merged.world_matrix, root.world_matrix)
+
+    first = meshes[0].geometry.vertex_count
+    assert batch.source_mesh(merged, 0) is meshes[0]
+    assert batch.source_mesh(merged, first) is meshes[1]
+    assert batch.source_mesh(merged, len(expected) - 1) is meshes[2]
+    assert batch.source_mesh(lone, 0) is None
+
+
+def test_update_rebuilds_groups_whose_sources_moved(gl_context):
+    scene, root, meshes = build_scene()
+    batch = StaticBatch(root)
+    assert batch.update() == 0
+
+    meshes[1].translate(0, 5, 0)
+    assert batch.update() == 1
+    merged = batch.batched_meshes[0]
+    start = meshes[0].geometry.vertex_count
+    stop = start + meshes[1].geometry.vertex_count
+    expected = positions(meshes[1].geometry,
+                         np.linalg.inv(root.world_matrix) @ meshes[1].world_matrix)
+    assert np.allclose(positions(merged.geometry)[start:stop], expected, atol=1e-5)
+    assert len(root._children) == len(meshes) + 1
+
+
+def test_update_rebuilds_groups_whose_geometry_changed_in_place(gl_context):
+    scene, root, meshes = build_scene()
+    batch = StaticBatch(root)
+    geometry = meshes[0].geometry
+    geometry.update_attribute("vertexPosition",
+                              np.asarray(geometry.attributes["vertexPosition"].data) * 2)
+    assert batch.update() == 1
+
+    merged = batch.batched_meshes[0]
+    expected = positions(geometry, np.linalg.inv(root.world_matrix) @ meshes[0].world_matrix)
+    assert np.allclose(positions(merged.geometry)[:geometry.vertex_count], expected, atol=1e-5)
+    assert batch.update() == 0
+
+
+def test_release_shows_the_source_meshes(gl_context):
+    scene, root, meshes = build_scene()
+    batch = StaticBatch(root)
+    merged = batch.batched_meshes[0]
+    batch.release()
+
+    assert batch.batched_meshes == []
+    assert merged.parent is None
+    assert all(mesh.visible for mesh in meshes)
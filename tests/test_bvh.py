@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from graphics.core.bounds import transform_boxes
+from graphics.core.bvh import SceneBVH
+from graphics.core.scene_graph import Group, Mesh, Scene
+from graphics.geometries.basic_geometries import BoxGeometry
+from graphics.materials.basic_materials import SurfaceMaterial
+
+
+@pytest.fixture
+def scene(gl_context):
+    """A scene of randomly placed boxes spread over a few groups."""
+    rng = np.random.default_rng(7)
+    geometry = BoxGeometry(1, 2, 0.5)
+    material = SurfaceMaterial()
+    scene = Scene()
+    groups = [Group() for _ in range(4)]
+    for group in groups:
+        group.translate(*rng.uniform(-10, 10, 3))
+        scene.add(group)
+    for index in range(60):
+        mesh = Mesh(geometry, material)
+        mesh.translate(*rng.uniform(-15, 15, 3))
+        mesh.rotate_y(rng.uniform(0, 3))
+        groups[index % len(groups)].add(mesh)
+    return scene
+
+
+def world_boxes(meshes):
+    low, high = meshes[0].geometry.bounding_box
+    count = len(meshes)
+    return transform_boxes(np.array([mesh.world_matrix for mesh in meshes]),
+                           np.broadcast_to(low, (count, 3)), np.broadcast_to(high, (count, 3)))
+
+
+def brute_force(scene, test):
+    meshes = scene.mesh_list
+    mins, maxs = world_boxes(meshes)
+    return [mesh for mesh, found in zip(meshes, test(mins, maxs)) if found]
+
+
+def test_query_box_matches_brute_force(scene):
+    bvh = SceneBVH(scene)
+    low, high = np.array((-5, -5, -5)), np.array((8, 4, 6))
+    expected = brute_force(scene, lambda mins, maxs:
+                           np.all((mins <= high) & (maxs >= low), axis=1))
+    assert expected
+    assert bvh.query_box(low, high) == expected
+
+
+def test_query_sphere_matches_brute_force(scene):
+    bvh = SceneBVH(scene)
+    center, radius = np.array((2, -1, 3)), 9
+
+    def test(mins, maxs):
+        closest = np.clip(center, mins, maxs)
+        return ((closest - center) ** 2).sum(axis=1) <= radius ** 2
+
+    expected = brute_force(scene, test)
+    assert expected
+    assert bvh.query_sphere(center, radius) == expected
+
+
+def test_query_ray_matches_brute_force(scene):
+    bvh = SceneBVH(scene)
+    origin, direction = np.array((-30, 1, 2)), np.array((1, 0.05, -0.1))
+
+    def test(mins, maxs):
+        # the slab test, where the ray enters the box before it leaves through any side
+        with np.errstate(divide="ignore", invalid="ignore"):
+            first = (mins - origin) / direction
+            second = (maxs - origin) / direction
+        near = np.minimum(first, second).max(axis=1)
+        far = np.maximum(first, second).min(axis=1)
+        return (near <= far) & (far >= 0)
+
+    expected = brute_force(scene, test)
+    assert bvh.query_ray(origin, direction) == expected
+
+
+def test_nearest_matches_brute_force(scene):
+    bvh = SceneBVH(scene)
+    meshes = scene.mesh_list
+    mins, maxs = world_boxes(meshes)
+    for point in np.random.default_rng(3).uniform(-30, 30, (10, 3)):
+        distances = np.linalg.norm(np.clip(point, mins, maxs) - point, axis=1)
+        mesh, distance = bvh.nearest(point)
+        assert distance == pytest.approx(distances.min())
+        assert distances[meshes.index(mesh)] == pytest.approx(distances.min())
+
+
+def test_queries_follow_moved_and_added_meshes(scene):
+    bvh = SceneBVH(scene)
+    mesh = scene.mesh_list[0]
+    mesh.translate(100, 100, 100, local=False)
+    assert bvh.query_sphere(mesh.world_position, 0.1) == [mesh]
+
+    added = Mesh(mesh.geometry, mesh.material)
+    added.translate(-100, -100, -100)
+    scene.add(added)
+    assert bvh.query_sphere((-100, -100, -100), 0.1) == [added]
+    assert len(bvh) == 61
+
+    scene.remove(added)
+    assert bvh.query_sphere((-100, -100, -100), 0.1) == []
+
+
+def test_invisible_meshes_are_left_out_on_request(scene):
+    bvh = SceneBVH(scene)
+    low, high = (-50, -50, -50), (50, 50, 50)
+    mesh = scene.mesh_list[5]
+    mesh.visible = False
+    assert mesh in bvh.query_box(low, high)
+    assert mesh not in bvh.query_box(low, high, visible_only=True)
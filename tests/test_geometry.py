@@ -0,0 +1,117 @@
+import numpy as np
+import OpenGL.GL as GL
+import pytest
+
+from graphics.core.openGL import IndexBuffer
+from graphics.core.renderer import Renderer
+from graphics.core.scene_graph import Camera, Mesh, Scene
+from graphics.geometries import BoxGeometry, Geometry, PolygonGeometry, RectangleGeometry
+from graphics.materials import SurfaceMaterial
+
+
+def expand(geometry):
+    """Create a geometry without indices that draws the same triangles as an indexed one."""
+    expanded = Geometry()
+    for name, attribute in geometry.attributes.items():
+        data = np.asarray(attribute.data, dtype=float)
+        expanded.set_attribute(name, data[geometry.indices], attribute.data_type)
+    return expanded
+
+
+def triangles(geometry):
+    """Get the corners of each triangle of a geometry as an array of shape (n, 3, 3)."""
+    positions = np.asarray(geometry.attributes["vertexPosition"].data, dtype=float)[:, :3]
+    if geometry.indices is not None:
+        positions = positions[geometry.indices]
+    return positions.reshape(-1, 3, 3)
+
+
+def read_pixels():
+    pixels = GL.glReadPixels(0, 0, 64, 64, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE)
+    return np.frombuffer(pixels, dtype=np.uint8).reshape(64, 64, 4)
+
+
+def test_index_buffer_stores_unsigned_ints(gl_context):
+    buffer = IndexBuffer([[0, 1, 2], [2, 1, 3]])
+    assert buffer.data.dtype == np.uint32
+    assert buffer.data.tolist() == [0, 1, 2, 2, 1, 3]
+    assert buffer.count == 6
+    buffer.release()
+    assert buffer.buffer_ref is None
+
+
+@pytest.mark.parametrize("geometry_class, vertex_count, index_count", [
+    (RectangleGeometry, 4, 6),
+    (BoxGeometry, 24, 36),
+])
+def test_generators_share_vertices(gl_context, geometry_class, vertex_count, index_count):
+    geometry = geometry_class()
+    assert geometry.vertex_count == vertex_count
+    assert geometry.draw_count == index_count
+    assert geometry.indices.max() < vertex_count
+
+
+def test_box_triangles_face_outward(gl_context):
+    corners = triangles(BoxGeometry())
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    assert np.all(np.linalg.norm(normals, axis=1) > 0)
+    assert np.all(np.einsum("ij,ij->i", normals, corners.mean(axis=1)) > 0)
+
+
+def test_polygon_shares_its_center(gl_context):
+    geometry = PolygonGeometry(sides=6)
+    assert geometry.vertex_count == 1 + 2 * 6
+    assert geometry.draw_count == 18
+    assert np.all(geometry.indices.reshape(-1, 3)[:, 0] == 0)
+    corners = triangles(geometry)
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    assert np.all(normals[:, 2] > 0)
+
+
+def test_combine_offsets_the_indices_of_each_part(gl_context):
+    rectangle = RectangleGeometry()
+    plain = expand(RectangleGeometry())
+    box = BoxGeometry()
+    combined = Geometry.combine([rectangle, plain, box])
+
+    assert combined.vertex_count == 4 + 6 + 24
+    assert combined.indices.tolist() == (rectangle.indices.tolist()
+                                         + list(range(4, 10))
+                                         + (box.indices + 10).tolist())
+    expected = np.concatenate([triangles(rectangle), triangles(plain), triangles(box)])
+    assert np.allclose(triangles(combined), expected)
+
+
+def test_merge_joins_the_indices(gl_context):
+    geometry = RectangleGeometry()
+    other = RectangleGeometry(2, 2)
+    expected = np.concatenate([triangles(geometry), triangles(other)])
+    geometry.merge(other)
+    assert geometry.vertex_count == 8
+    assert np.allclose(triangles(geometry), expected)
+
+
+def test_indexed_geometry_renders_like_its_expanded_triangles(gl_context):
+    renderer = Renderer(frustum_culling=False)
+    scene = Scene()
+    camera = Camera(aspect_ratio=1)
+    camera.translate(0, 0, 4)
+    scene.add(camera)
+
+    material = SurfaceMaterial({"useVertexColors": True})
+    geometry = BoxGeometry()
+    mesh = Mesh(geometry, material)
+    mesh.rotate_y(0.6)
+    mesh.rotate_x(0.4)
+    scene.add(mesh)
+    renderer.render(scene, camera)
+    indexed = read_pixels()
+
+    scene.remove(mesh)
+    expanded = Mesh(expand(geometry), material)
+    expanded.rotate_y(0.6)
+    expanded.rotate_x(0.4)
+    scene.add(expanded)
+    renderer.render(scene, camera)
+    assert np.count_nonzero(indexed[..., :3]) > 0
+    assert np.array_equal(read_pixels(), indexed)
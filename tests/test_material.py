@@ -0,0 +1,149 @@
+import numpy as np
+import OpenGL.GL as GL
+import pytest
+
+from graphics.core.openGLUtils import (
+    acquire_program, program_ready, release_program, shared_program_count
+)
+from graphics.core.renderer import Renderer
+from graphics.core.scene_graph import Camera, Mesh, Scene
+from graphics.geometries import BoxGeometry
+from graphics.materials import Material, SurfaceMaterial
+
+VERTEX_SHADER_CODE = """
+in vec3 vertexPosition;
+uniform mat4 modelMatrix;
+uniform mat4 viewMatrix;
+uniform mat4 projectionMatrix;
+void main() {
+    #ifdef BROKEN
+    this is not GLSL;
+    #endif
+    gl_Position = projectionMatrix * viewMatrix * modelMatrix * vec4(vertexPosition, 1.0);
+}
+"""
+
+FRAGMENT_SHADER_CODE = """
+out vec4 fragColor;
+void main() {
+    fragColor = vec4(1.0);
+}
+"""
+
+
+def test_failed_compiles_can_be_released(gl_context):
+    programs = shared_program_count()
+    material = Material(VERTEX_SHADER_CODE, FRAGMENT_SHADER_CODE, defines=("BROKEN",))
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            material.compile()
+    material.release()
+    assert shared_program_count() == programs
+
+
+def test_failed_shared_program_fails_for_every_holder(gl_context):
+    programs = shared_program_count()
+    code = ("#define BROKEN\n" + VERTEX_SHADER_CODE, FRAGMENT_SHADER_CODE)
+    holders = [acquire_program(*code, wait=False) for _ in range(2)]
+    assert holders[0] == holders[1]
+    for program_ref in holders:
+        with pytest.raises(RuntimeError):
+            program_ready(program_ref, wait=True)
+
+    # a material acquiring the failed program gets the error as well
+    material = Material(*code)
+    with pytest.raises(RuntimeError):
+        material.compile()
+    material.release()
+
+    for program_ref in holders:
+        release_program(program_ref)
+    assert shared_program_count() == programs
+
+
+def test_failed_variant_keeps_the_previous_program(gl_context):
+    programs = shared_program_count()
+    material = Material(VERTEX_SHADER_CODE, FRAGMENT_SHADER_CODE, features={"broken": "BROKEN"})
+    material.compile()
+    program_ref = material.program_ref
+
+    material.set_properties({"broken": True})
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            material.compile(wait=False)
+            # the driver may still be compiling the variant in the background
+            material.compile()
+    assert material._program_ref == program_ref
+
+    material.set_properties({"broken": False})
+    assert material.compile()
+    material.release()
+    assert shared_program_count() == programs
+
+
+def test_only_uniforms_of_disabled_features_may_be_missing(gl_context):
+    fragment_shader_code = """
+    #ifdef TINTED
+    uniform vec3 tint;
+    #endif
+    out vec4 fragColor;
+    void main() {
+        fragColor = vec4(1.0);
+        #ifdef TINTED
+        fragColor.rgb *= tint;
+        #endif
+    }
+    """
+    material = Material(VERTEX_SHADER_CODE, fragment_shader_code, features={"tinted": "TINTED"})
+    material.set_uniform("tint", (1, 0, 0), "vec3")
+    material.compile()
+    with pytest.raises(ValueError):
+        material.set_uniform("tnit", (1, 0, 0), "vec3")
+
+    material.set_properties({"tinted": True})
+    material.compile()
+    material.release()
+
+
+class WireframeMaterial(Material):
+    """A custom material that draws lines through the state tracker."""
+    def __init__(self):
+        super().__init__(VERTEX_SHADER_CODE, FRAGMENT_SHADER_CODE)
+
+    def update_render_settings(self, state):
+        state.set_polygon_mode(GL.GL_LINE)
+
+
+def test_custom_render_settings_are_undone_for_the_next_mesh(gl_context):
+    renderer = Renderer(frustum_culling=False, sort_meshes=False)
+    scene = Scene()
+    camera = Camera(aspect_ratio=1)
+    camera.translate(0, 0, 5)
+    scene.add(camera)
+
+    # the wireframe mesh is drawn between two filled ones, so the tracker must not skip
+    # switching back to filled polygons for the last mesh once the vertex arrays exist
+    geometry = BoxGeometry()
+    materials = [SurfaceMaterial({"baseColor": (0, 1, 0)}), WireframeMaterial()]
+    for x, material in ((-1.2, materials[0]), (0, materials[1]), (1.2, materials[0])):
+        mesh = Mesh(geometry, material)
+        mesh.translate(x, 0, 0)
+        scene.add(mesh)
+    renderer.render(scene, camera)
+    renderer.render(scene, camera)
+
+    pixels = GL.glReadPixels(0, 0, 64, 64, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE)
+    pixels = np.frombuffer(pixels, dtype=np.uint8).reshape(64, 64, 4)
+    green = np.all(pixels[:, :, :3] == (0, 255, 0), axis=-1)
+    assert green[:, :32].sum() > 20
+    assert green[:, 32:].sum() == green[:, :32].sum()
+
+    # without a tracker every setting is set with OpenGL
+    GL.glPolygonMode(GL.GL_FRONT_AND_BACK, GL.GL_FILL)
+    materials[1].apply_render_settings()
+    assert GL.glGetIntegerv(GL.GL_POLYGON_MODE)[0] == GL.GL_LINE
+    GL.glPolygonMode(GL.GL_FRONT_AND_BACK, GL.GL_FILL)
+
+    for material in materials:
+        material.release()
+    geometry.release()
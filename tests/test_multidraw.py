@@ -0,0 +1,101 @@
+import numpy as np
+import OpenGL.GL as GL
+
+from graphics.core.multidraw import MeshPack
+from graphics.core.renderer import Renderer
+from graphics.core.scene_graph import Camera, Mesh, Scene
+from graphics.geometries import BoxGeometry, SphereGeometry
+from graphics.materials import SurfaceMaterial
+
+
+def read_pixels():
+    pixels = GL.glReadPixels(0, 0, 64, 64, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE)
+    return np.frombuffer(pixels, dtype=np.uint8).reshape(64, 64, 4)
+
+
+def render_single(renderer, scene, camera):
+    """Render with a draw call per mesh, which releases the packs of the renderer."""
+    renderer.multi_draw = False
+    renderer.render(scene, camera)
+    renderer.multi_draw = True
+    return read_pixels()
+
+
+def test_packs_follow_geometry_changes(gl_context):
+    renderer = Renderer(frustum_culling=False, multi_draw=True)
+    scene = Scene()
+    camera = Camera(aspect_ratio=1)
+    camera.translate(0, 0, 6)
+    scene.add(camera)
+
+    material = SurfaceMaterial({"useVertexColors": True})
+    geometries = [BoxGeometry(), SphereGeometry(0.6, 16, 8), BoxGeometry(0.5, 1.5, 0.5)]
+    for x, geometry in zip((-1.5, 0, 1.5), geometries):
+        mesh = Mesh(geometry, material)
+        mesh.translate(x, 0, 0)
+        scene.add(mesh)
+
+    renderer.render(scene, camera)
+    packed = read_pixels()
+    single = render_single(renderer, scene, camera)
+    assert np.array_equal(packed, single)
+
+    # pack the meshes again, then change vertices in place and replace a whole attribute
+    renderer.render(scene, camera)
+    box = geometries[0]
+    box.update_attribute("vertexPosition", box.attributes["vertexPosition"].data * 1.4)
+    geometries[2].set_attribute("vertexColor",
+                                np.ones((geometries[2].vertex_count, 3), dtype=np.float32))
+    renderer.render(scene, camera)
+    packed = read_pixels()
+    changed = render_single(renderer, scene, camera)
+    assert not np.array_equal(changed, single)
+    assert np.array_equal(packed, changed)
+
+    material.release()
+    for geometry in geometries:
+        geometry.release()
+
+
+def test_pack_is_outdated_after_its_geometry_changes(gl_context):
+    material = SurfaceMaterial()
+    geometry = BoxGeometry()
+    pack = MeshPack([Mesh(geometry, material), Mesh(geometry, material)])
+    assert not pack.outdated
+
+    geometry.update_attribute("vertexPosition", [(0, 0, 0)], start=3)
+    assert pack.outdated
+
+    pack.release()
+    material.release()
+    geometry.release()
+
+
+def test_packs_leave_their_material_unchanged(gl_context):
+    material = SurfaceMaterial({"useVertexColors": True})
+    camera = Camera(aspect_ratio=1)
+    camera.translate(0, 0, 6)
+
+    # a mesh drawn on its own by another renderer, with the material of the packed meshes
+    single = Renderer(frustum_culling=False)
+    lone_scene = Scene()
+    lone_scene.add(Mesh(BoxGeometry(), material))
+    single.render(lone_scene, camera)
+    expected = read_pixels()
+
+    renderer = Renderer(frustum_culling=False, multi_draw=True)
+    scene = Scene()
+    for x in (-1.5, 1.5):
+        mesh = Mesh(BoxGeometry(), material)
+        mesh.translate(x, 0, 0)
+        scene.add(mesh)
+    renderer.render(scene, camera)
+    assert renderer._packs
+    assert material.get_setting("useMultiDraw") is False
+
+    single.render(lone_scene, camera)
+    assert np.array_equal(read_pixels(), expected)
+
+    renderer.multi_draw = False
+    renderer.render(scene, camera)
+    material.release()
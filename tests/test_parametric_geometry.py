@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+
+from graphics.geometries.parametric_geometries import (
+    ConeGeometry, ParametricGeometry, SphereGeometry
+)
+
+
+def scalar_sphere(u, v):
+    """A surface function that only works with single numbers, as in older examples."""
+    return [math.sin(u) * math.cos(v), math.sin(v), math.cos(u) * math.cos(v)]
+
+
+def test_scalar_surface_functions_match_array_functions(gl_context):
+    resolution = (0, 2 * math.pi, 12, -math.pi / 2, math.pi / 2, 6)
+    scalar = ParametricGeometry(*resolution, scalar_sphere)
+    array = SphereGeometry(radius=1, radial_segments=12, height_segments=6)
+
+    for name in ("vertexPosition", "vertexUV", "vertexColor"):
+        assert np.allclose(scalar.attributes[name].data, array.attributes[name].data, atol=1e-6)
+    assert np.array_equal(scalar.indices, array.indices)
+    scalar.release()
+    array.release()
+
+
+def test_constant_coordinates_are_broadcast(gl_context):
+    geometry = ParametricGeometry(0, 1, 2, 0, 1, 3, lambda u, v: (u, v, 0))
+    positions = geometry.attributes["vertexPosition"].data
+
+    assert geometry.vertex_count == 3 * 4
+    assert len(geometry.indices) == 2 * 3 * 6
+    assert np.allclose(positions[:, 2], 0)
+    assert np.allclose(positions[-1], (1, 1, 0))
+    geometry.release()
+
+
+def test_unindexed_surfaces_color_each_triangle(gl_context):
+    indexed = SphereGeometry(radial_segments=8, height_segments=4)
+    geometry = SphereGeometry(radial_segments=8, height_segments=4, indexed=False)
+
+    assert geometry.indices is None
+    assert geometry.vertex_count == 6 * 8 * 4
+    colors = np.asarray(geometry.attributes["vertexColor"].data).reshape(-1, 6, 3)
+    assert np.array_equal(colors, np.broadcast_to(colors[0], colors.shape))
+    assert np.array_equal(colors[0], [[1, 0, 0], [0, 1, 0], [0, 0, 1],
+                                      [0, 1, 1], [1, 0, 1], [1, 1, 0]])
+    for name in ("vertexPosition", "vertexUV"):
+        expected = np.asarray(indexed.attributes[name].data)[indexed.indices]
+        assert np.allclose(geometry.attributes[name].data, expected)
+
+
+def test_unindexed_cylinders_expand_their_caps(gl_context):
+    indexed = ConeGeometry(radial_segments=6)
+    geometry = ConeGeometry(radial_segments=6, indexed=False)
+
+    assert geometry.indices is None
+    positions = np.asarray(indexed.attributes["vertexPosition"].data)[indexed.indices]
+    assert np.allclose(geometry.attributes["vertexPosition"].data, positions)
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from graphics.core.raycast import Ray, TriangleBVH, intersect_triangles, raycast
+from graphics.core.scene_graph import Mesh, Scene
+from graphics.geometries.basic_geometries import BoxGeometry
+from graphics.materials.basic_materials import SurfaceMaterial
+
+
+def brute_force(positions, origin, direction):
+    """Test every triangle against the ray and return the nearest distance and triangle."""
+    triangles = positions.reshape(-1, 3, 3)
+    distances, _, _ = intersect_triangles(origin, direction, triangles[:, 0],
+                                          triangles[:, 1] - triangles[:, 0],
+                                          triangles[:, 2] - triangles[:, 0])
+    nearest = np.argmin(distances)
+    return distances[nearest], nearest
+
+
+def random_triangles(rng, count):
+    centers = rng.uniform(-10, 10, (count, 1, 3))
+    return (centers + rng.uniform(-1, 1, (count, 3, 3))).reshape(-1, 3)
+
+
+def test_intersect_triangles_hits_from_either_side():
+    vertices = np.array([[0.0, 0, 0]])
+    edges1 = np.array([[1.0, 0, 0]])
+    edges2 = np.array([[0.0, 1, 0]])
+    for z in (1, -1):
+        distances, u, v = intersect_triangles(np.array((0.25, 0.25, z)), np.array((0, 0, -z)),
+                                              vertices, edges1, edges2)
+        assert distances[0] == pytest.approx(1)
+        assert (u[0], v[0]) == pytest.approx((0.25, 0.25))
+
+    distances, _, _ = intersect_triangles(np.array((2.0, 2, 1)), np.array((0, 0, -1)),
+                                          vertices, edges1, edges2)
+    assert distances[0] == np.inf
+
+
+def test_triangle_bvh_matches_brute_force():
+    rng = np.random.default_rng(11)
+    positions = random_triangles(rng, 500)
+    bvh = TriangleBVH(positions)
+    assert len(bvh) == 500
+
+    hits = 0
+    for _ in range(200):
+        origin = rng.uniform(-15, 15, 3)
+        direction = rng.uniform(-10, 10, 3) - origin
+        expected_distance, expected_triangle = brute_force(positions, origin, direction)
+        hit = bvh.intersect(origin, direction)
+        if expected_distance == np.inf:
+            assert hit is None
+            continue
+        hits += 1
+        distance, triangle, u, v = hit
+        assert distance == pytest.approx(expected_distance)
+        assert triangle == expected_triangle
+        # the barycentric coordinates must give back the point on the ray
+        corners = positions.reshape(-1, 3, 3)[triangle]
+        point = (1 - u - v) * corners[0] + u * corners[1] + v * corners[2]
+        assert np.allclose(point, origin + direction * distance)
+    assert hits > 0
+
+
+def test_triangle_bvh_respects_max_distance():
+    positions = np.array([[-1.0, -1, 0], [1, -1, 0], [0, 1, 0]])
+    bvh = TriangleBVH(positions)
+    origin, direction = np.array((0.0, 0, 5)), np.array((0.0, 0, -1))
+    assert bvh.intersect(origin, direction)[0] == pytest.approx(5)
+    assert bvh.intersect(origin, direction, max_distance=4) is None
+
+
+def test_raycast_finds_the_nearest_mesh(gl_context):
+    geometry = BoxGeometry()
+    material = SurfaceMaterial()
+    scene = Scene()
+    meshes = []
+    for z in (-6, -2, -4):
+        mesh = Mesh(geometry, material)
+        mesh.translate(0, 0, z)
+        scene.add(mesh)
+        meshes.append(mesh)
+
+    hit = raycast(scene, Ray((0.1, 0.2, 5), (0, 0, -1)))
+    assert hit.mesh is meshes[1]
+    assert hit.distance == pytest.approx(6.5)
+    assert np.allclose(hit.point, (0.1, 0.2, -1.5))
+
+    meshes[1].visible = False
+    assert raycast(scene, Ray((0.1, 0.2, 5), (0, 0, -1))).mesh is meshes[2]
+    assert raycast(scene, Ray((0.1, 0.2, 5), (0, 0, -1)), visible_only=False).mesh is meshes[1]
+    assert raycast(scene, Ray((0.1, 0.2, 5), (0, 0, -1)), max_distance=6) is None
+    assert raycast(scene, Ray((3, 0, 5), (0, 0, -1))) is None
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from graphics.core.bounds import frustum_planes, spheres_in_frustum, transform_spheres
+from graphics.core.bvh import SceneBVH
+from graphics.core.renderer import Renderer
+from graphics.core.scene_graph import Camera, Mesh, Scene
+from graphics.geometries import BoxGeometry
+from graphics.materials import SurfaceMaterial
+
+
+def build_scene(use_transform_store=False):
+    """A scene of boxes scattered around a camera, some of them hidden."""
+    rng = np.random.default_rng(5)
+    scene = Scene(use_transform_store)
+    camera = Camera(aspect_ratio=1)
+    camera.translate(0, 0, 10)
+    scene.add(camera)
+
+    geometry = BoxGeometry()
+    material = SurfaceMaterial()
+    for index in range(200):
+        mesh = Mesh(geometry, material)
+        mesh.translate(*rng.uniform(-40, 40, 3))
+        mesh.visible = index % 7 != 0
+        scene.add(mesh)
+    return scene, camera
+
+
+def brute_force(scene, camera):
+    """Test the bounding sphere of every visible mesh against the frustum one at a time."""
+    planes = frustum_planes(camera.view_projection_matrix)
+    inside = []
+    for mesh in scene.iter_visible_meshes():
+        center, radius = mesh.bounding_sphere
+        centers, radii = transform_spheres(mesh.world_matrix[np.newaxis], 
+                                           np.array([center]), np.array([radius]))
+        if spheres_in_frustum(planes, centers, radii)[0]:
+            inside.append(mesh)
+    return inside
+
+
+@pytest.mark.parametrize("use_transform_store", [False, True])
+def test_culling_keeps_the_visible_meshes_in_view(gl_context, use_transform_store):
+    scene, camera = build_scene(use_transform_store)
+    renderer = Renderer()
+    for _ in range(2):
+        expected = brute_force(scene, camera)
+        assert 0 < len(expected) < len(scene.mesh_list)
+        assert renderer._cull(scene, camera) == expected
+        assert renderer.culled_count == len(list(scene.iter_visible_meshes())) - len(expected)
+        scene.mesh_list[3].translate(0, 0, 30)
+        camera.rotate_y(0.4)
+
+
+def test_culling_follows_geometry_changes(gl_context):
+    scene, camera = build_scene()
+    renderer = Renderer()
+    renderer._cull(scene, camera)
+
+    geometry = scene.mesh_list[0].geometry
+    geometry.update_attribute("vertexPosition",
+                              np.asarray(geometry.attributes["vertexPosition"].data) * 10)
+    assert renderer._cull(scene, camera) == brute_force(scene, camera)
+
+
+@pytest.mark.parametrize("use_bvh", [False, True])
+def test_culled_count_only_counts_visible_meshes(gl_context, use_bvh):
+    scene, camera = build_scene()
+    if use_bvh:
+        scene.spatial_index = SceneBVH(scene)
+    renderer = Renderer()
+    renderer.render(scene, camera)
+    visible = list(scene.iter_visible_meshes())
+    if use_bvh:
+        in_view = scene.spatial_index.query_frustum(frustum_planes(camera.view_projection_matrix))
+    else:
+        in_view = brute_force(scene, camera)
+    assert renderer.culled_count == len(visible) - len(in_view)
+
+    for mesh in visible:
+        mesh.visible = False
+    renderer.render(scene, camera)
+    assert renderer.culled_count == 0
@@ -0,0 +1,126 @@
+from math import pi
+
+import numpy as np
+import pytest
+
+from graphics.core.matrix import Matrix
+from graphics.core.scene_graph import Object3D, Group, Scene, Camera
+
+
+def brute_force_world_matrix(node):
+    """Multiply the local transforms from the root down to a node without any caching."""
+    matrix = Matrix.identity()
+    while node is not None:
+        matrix = node._transform @ matrix
+        node = node.parent
+    return matrix
+
+
+def build_chain(length):
+    root = Group()
+    nodes = [root]
+    for index in range(length):
+        node = Group()
+        node.translate(1, index, 0)
+        node.rotate_y(0.3)
+        nodes[-1].add(node)
+        nodes.append(node)
+    return nodes
+
+
+def test_world_matrix_matches_product_of_ancestors():
+    nodes = build_chain(5)
+    nodes[0].rotate_x(pi / 4)
+    nodes[2].scale_uniform(2)
+    for node in nodes:
+        assert np.allclose(node.world_matrix, brute_force_world_matrix(node))
+
+
+def test_world_matrix_is_cached_until_transformed():
+    nodes = build_chain(3)
+    leaf = nodes[-1]
+    version = leaf.world_version
+    leaf.world_matrix
+    assert leaf.world_version == version
+    assert not leaf._world_dirty
+
+
+def test_moving_an_ancestor_marks_descendants_dirty():
+    nodes = build_chain(4)
+    versions = [node.world_version for node in nodes]
+    nodes[1].translate(0, 0, 5)
+
+    assert nodes[0].world_version == versions[0]
+    for node, version in zip(nodes[1:], versions[1:]):
+        assert node.world_version > version
+        assert np.allclose(node.world_matrix, brute_force_world_matrix(node))
+
+
+def test_moving_a_leaf_leaves_its_ancestors_clean():
+    nodes = build_chain(3)
+    versions = [node.world_version for node in nodes]
+    nodes[-1].rotate_z(1)
+    assert [node.world_version for node in nodes[:-1]] == versions[:-1]
+    assert nodes[-1].world_version > versions[-1]
+
+
+def test_reparenting_updates_the_world_matrix():
+    first, second = Group(), Group()
+    first.translate(1, 0, 0)
+    second.translate(0, 2, 0)
+    child = Group()
+    first.add(child)
+    child.world_matrix
+
+    first.remove(child)
+    second.add(child)
+    assert np.allclose(child.world_position, (0, 2, 0))
+
+
+@pytest.mark.parametrize("local", [True, False])
+def test_translate_matches_a_translation_matrix(local):
+    node = Group()
+    node.rotate_y(0.7)
+    node.scale_uniform(2)
+    translation = Matrix.translation(1, 2, 3)
+    expected = node._transform @ translation if local else translation @ node._transform
+    node.translate(1, 2, 3, local)
+    assert np.allclose(node._transform, expected)
+
+
+def test_descendant_list_is_cached_and_rebuilt_after_changes():
+    root = Group()
+    children = [Group() for _ in range(3)]
+    for child in children:
+        root.add(child)
+    grandchild = Group()
+    children[1].add(grandchild)
+
+    assert root.descendant_list == [root, children[0], children[1], grandchild, children[2]]
+    assert root._get_descendants() is root._get_descendants()
+
+    version = root.tree_version
+    children[1].remove(grandchild)
+    assert root.tree_version > version
+    assert root.descendant_list == [root] + children
+
+
+def test_camera_matrices_follow_their_versions():
+    scene = Scene()
+    camera = Camera(aspect_ratio=2)
+    scene.add(camera)
+    camera.translate(0, 1, 5)
+
+    assert np.allclose(camera.view_matrix, np.linalg.inv(camera.world_matrix))
+    view_projection = camera.view_projection_matrix.copy()
+    assert np.allclose(view_projection, camera.projection_matrix @ camera.view_matrix)
+
+    camera.aspect_ratio = 1
+    assert not np.allclose(camera.view_projection_matrix, view_projection)
+    assert np.allclose(camera.view_projection_matrix,
+                       camera.projection_matrix @ camera.view_matrix)
+
+
+def test_parent_must_be_an_object3d():
+    with pytest.raises(RuntimeError):
+        Object3D().parent = "not a node"
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from graphics.core.scene_graph import Group, Scene
+from graphics.core.transform_store import TransformStore
+
+
+def build_tree(scene, count, rng):
+    """Attach nodes to random earlier nodes so the tree has several levels."""
+    nodes = [scene]
+    for _ in range(count):
+        node = Group()
+        nodes[rng.integers(len(nodes))].add(node)
+        nodes.append(node)
+    return nodes[1:]
+
+
+def apply_random_transforms(nodes, rng):
+    for node in nodes:
+        node.translate(*rng.uniform(-2, 2, 3))
+        node.rotate_x(rng.uniform(-1, 1))
+        node.rotate_y(rng.uniform(-1, 1), local=False)
+        node.scale_uniform(rng.uniform(0.5, 1.5))
+
+
+def assert_same_world_matrices(stored_nodes, plain_nodes):
+    for stored, plain in zip(stored_nodes, plain_nodes):
+        assert np.allclose(stored.world_matrix, plain.world_matrix)
+
+
+def test_store_matches_plain_scene_graph():
+    stored_scene = Scene(use_transform_store=True)
+    plain_scene = Scene()
+    stored_nodes = build_tree(stored_scene, 50, np.random.default_rng(1))
+    plain_nodes = build_tree(plain_scene, 50, np.random.default_rng(1))
+
+    apply_random_transforms(stored_nodes, np.random.default_rng(2))
+    apply_random_transforms(plain_nodes, np.random.default_rng(2))
+    assert_same_world_matrices(stored_nodes, plain_nodes)
+
+    # move a few nodes after the world matrices have been calculated once
+    for index in (3, 17, 40):
+        stored_nodes[index].translate(0, 1, 0)
+        plain_nodes[index].translate(0, 1, 0)
+    assert_same_world_matrices(stored_nodes, plain_nodes)
+
+
+def test_nodes_are_registered_with_the_scene_store():
+    scene = Scene(use_transform_store=True)
+    store = scene.transform_store
+    parent, child = Group(), Group()
+    parent.add(child)
+    scene.add(parent)
+
+    assert len(store) == 3
+    assert store.index_of(child) != store.index_of(parent)
+
+    scene.remove(parent)
+    assert len(store) == 1
+    with pytest.raises(ValueError):
+        store.index_of(child)
+
+
+def test_vectorized_updates_after_invalidate():
+    scene = Scene(use_transform_store=True)
+    store = scene.transform_store
+    parent, child = Group(), Group()
+    scene.add(parent)
+    parent.add(child)
+    child.translate(1, 0, 0)
+    child.world_matrix
+
+    store.local_matrices[store.index_of(parent)][:3, 3] = (0, 5, 0)
+    store.invalidate()
+    assert np.allclose(child.world_matrix[:3, 3], (1, 5, 0))
+
+
+def test_store_grows_past_its_capacity():
+    store = TransformStore(capacity=2)
+    scene = Scene()
+    nodes = [Group() for _ in range(5)]
+    for index, node in enumerate(nodes):
+        node.translate(index, 0, 0)
+        scene.add(node)
+        store.register(node)
+
+    assert len(store) == 5
+    for index, node in enumerate(nodes):
+        assert np.allclose(store.world_matrix(store.index_of(node))[:3, 3], (index, 0, 0))
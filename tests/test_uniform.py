@@ -0,0 +1,62 @@
+import gc
+import weakref
+
+import numpy as np
+import OpenGL.GL as GL
+
+from graphics.core.openGL import Uniform
+from graphics.core.scene_graph import Camera, Mesh, Scene
+from graphics.geometries import BoxGeometry
+from graphics.materials import Material
+
+from test_material import VERTEX_SHADER_CODE, FRAGMENT_SHADER_CODE
+
+
+def test_upload_records_do_not_keep_uniforms_alive(gl_context):
+    material = Material(VERTEX_SHADER_CODE, FRAGMENT_SHADER_CODE)
+    GL.glUseProgram(material.program_ref)
+    uniform = Uniform("mat4", np.identity(4))
+    uniform.locate_variable(material.program_ref, "modelMatrix")
+    uniform.upload_data()
+
+    reference = weakref.ref(uniform)
+    del uniform
+    gc.collect()
+    assert reference() is None
+    GL.glUseProgram(0)
+    material.release()
+
+
+def test_camera_matrices_are_uploaded_only_when_they_change(gl_context):
+    scene = Scene()
+    camera = Camera()
+    camera.translate(0, 0, 5)
+    scene.add(camera)
+    geometry = BoxGeometry()
+    mesh = Mesh(geometry, Material(VERTEX_SHADER_CODE, FRAGMENT_SHADER_CODE))
+    scene.add(mesh)
+
+    def render():
+        mesh.render(camera.view_matrix, camera.projection_matrix, camera=camera)
+        uniforms = mesh.material._uniforms
+        return uniforms["viewMatrix"].version, uniforms["projectionMatrix"].version
+
+    first = render()
+    assert render() == first
+
+    camera.translate(1, 0, 0)
+    moved = render()
+    assert moved[0] > first[0] and moved[1] == first[1]
+
+    camera.aspect_ratio = 2
+    zoomed = render()
+    assert zoomed[0] == moved[0] and zoomed[1] > moved[1]
+
+    # without a camera to identify them, the matrices are uploaded for every draw
+    assert render() == zoomed
+    mesh.render(camera.view_matrix, camera.projection_matrix)
+    assert mesh.material._uniforms["viewMatrix"].version > zoomed[0]
+
+    mesh.material.release()
+    mesh.release()
+    geometry.release()